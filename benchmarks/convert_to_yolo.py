@@ -0,0 +1,71 @@
+"""
+Compares the per-object convert_to_yolo that used to live in Trainer.get_and_organize_data with YoloConverter.
+
+    python benchmarks/convert_to_yolo.py --tasks 2000 --boxes 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from converter import YoloConverter
+
+def legacy_convert_to_yolo(labels, annotation):
+    """ Convert Label Studio bbox annotation to YOLO format """
+    yolo_annotations = []
+    for obj in annotation:
+        obj = obj['value']
+        if "rectanglelabels" in obj:
+            label = labels.index(obj["rectanglelabels"][0])
+            x, y, w, h = obj["x"], obj["y"], obj["width"], obj["height"]
+            x_center, y_center = (x + w / 2) / 100, (y + h / 2) / 100
+            w, h = w / 100, h / 100
+            yolo_annotations.append(f"{label} {x_center} {y_center} {w} {h}\n")
+    return yolo_annotations
+
+def synthetic_results(num_tasks, boxes_per_task, labels, seed=0):
+    rng = random.Random(seed)
+    results = []
+    for _ in range(num_tasks):
+        result = []
+        for _ in range(boxes_per_task):
+            x, y = rng.uniform(0, 90), rng.uniform(0, 90)
+            result.append({'value': {
+                'x': x, 'y': y, 'width': rng.uniform(1, 100 - x), 'height': rng.uniform(1, 100 - y),
+                'rectanglelabels': [rng.choice(labels)]
+            }})
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--boxes", type=int, default=200)
+    parser.add_argument("--classes", type=int, default=80)
+    args = parser.parse_args()
+
+    labels = [f"class_{i}" for i in range(args.classes)]
+    results = synthetic_results(args.tasks, args.boxes, labels)
+    total_boxes = args.tasks * args.boxes
+
+    start = time.perf_counter()
+    legacy = ["".join(legacy_convert_to_yolo(labels, result)) for result in results]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = YoloConverter(labels).convert_many(results)
+    batched_seconds = time.perf_counter() - start
+
+    # Same boxes and classes, only the float formatting differs
+    assert [len(content.splitlines()) for content in legacy] == [len(content.splitlines()) for content in batched]
+
+    print(f"{args.tasks} tasks x {args.boxes} boxes, {args.classes} classes")
+    print(f"legacy convert_to_yolo : {legacy_seconds:.3f}s ({total_boxes / legacy_seconds:,.0f} boxes/s)")
+    print(f"YoloConverter          : {batched_seconds:.3f}s ({total_boxes / batched_seconds:,.0f} boxes/s)")
+    print(f"speedup                : {legacy_seconds / batched_seconds:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+In-process fake of the parts of the LabelStudio API the service uses: project and webhook listings, project details,
+Data Manager task queries with the filters TaskIndex sends, task images, and outgoing webhooks. Requests are counted
+per endpoint so scenarios can report how much they asked of LabelStudio.
+"""
+import json
+import logging
+import threading
+import requests
+from collections import Counter
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, abort, jsonify, request
+from werkzeug.serving import make_server
+
+from typing import Dict, List
+
+from synthetic import SyntheticProject
+
+def parse_time(value:str)->datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def matches(task:dict, item:dict)->bool:
+    field = item['filter'].split(":")[-1]
+    value = task.get(field)
+    if item['operator'] == 'empty':
+        return (value is None) == bool(item['value'])
+    if item['operator'] == 'greater_or_equal':
+        return value is not None and parse_time(value) >= parse_time(item['value'])
+    raise ValueError(f"Filter operator {item['operator']} is not faked")
+
+class FakeLabelStudio:
+    def __init__(self, projects:List[SyntheticProject], api_key:str="benchmark-token", tracked:List[int]=None):
+        """
+        Parameters:
+            projects: synthetic projects to serve.
+            api_key: token every API request must carry.
+            tracked: projects that have a webhook, all of them by default.
+        """
+        self.projects: Dict[int, SyntheticProject] = {project.id: project for project in projects}
+        self.api_key = api_key
+        self.tracked = set(self.projects if tracked is None else tracked)
+        self.requests = Counter()
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.app = self.__build()
+
+    def __count(self, endpoint:str):
+        with self.__lock:
+            self.requests[endpoint] += 1
+
+    def __project(self, project_id:int)->SyntheticProject:
+        if project_id not in self.projects:
+            abort(404)
+        return self.projects[project_id]
+
+    def __build(self)->Flask:
+        app = Flask("fake-label-studio")
+
+        @app.before_request
+        def authenticate():
+            if request.path.startswith("/api/") and request.headers.get("Authorization") != f"Token {self.api_key}":
+                abort(401)
+
+        @app.route("/api/version")
+        def version():
+            self.__count('version')
+            return jsonify({'label-studio-os-package': {'version': "1.13.0"}, 'release': "1.13.0"})
+
+        @app.route("/api/projects", strict_slashes=False)
+        def list_projects():
+            self.__count('projects')
+            page = request.args.get('page', 1, type=int)
+            page_size = request.args.get('page_size', 100, type=int)
+            projects = list(self.projects.values())[(page - 1) * page_size:page * page_size]
+            return jsonify({'count': len(self.projects), 'results': [project.details() for project in projects]})
+
+        @app.route("/api/projects/<int:project_id>", strict_slashes=False)
+        def get_project(project_id):
+            self.__count('project')
+            return jsonify(self.__project(project_id).details())
+
+        @app.route("/api/webhooks", strict_slashes=False)
+        def list_webhooks():
+            self.__count('webhooks')
+            return jsonify([{
+                'id': project_id,
+                'project': project_id,
+                'url': "http://127.0.0.1/update",
+                'send_payload': True,
+                'send_for_all_actions': True,
+                'is_active': True,
+                'actions': []
+            } for project_id in sorted(self.tracked)])
+
+        @app.route("/api/tasks", strict_slashes=False)
+        def list_tasks():
+            self.__count('tasks')
+            project = self.__project(request.args.get('project', type=int))
+            page = request.args.get('page', 1, type=int)
+            page_size = request.args.get('page_size', 100, type=int)
+            query = json.loads(request.args.get('query', "{}"))
+
+            tasks = list(project.tasks.values())
+            filters = query.get('filters')
+            if filters and filters.get('items'):
+                combine = all if filters.get('conjunction', "and") == "and" else any
+                tasks = [task for task in tasks if combine(matches(task, item) for item in filters['items'])]
+            selected = query.get('selectedItems', {})
+            if selected and not selected.get('all', True):
+                included = set(selected.get('included', []))
+                tasks = [task for task in tasks if task['id'] in included]
+
+            start = (page - 1) * page_size
+            if start >= len(tasks) and page > 1:
+                abort(404)
+            page_tasks = tasks[start:start + page_size]
+            if request.args.get('include') == "id":
+                page_tasks = [{'id': task['id']} for task in page_tasks]
+            return jsonify({'tasks': page_tasks, 'total': len(tasks), 'total_annotations': 0, 'total_predictions': 0})
+
+        @app.route("/data/upload/<int:project_id>/<int:task_id>.jpg")
+        def image(project_id, task_id):
+            self.__count('images')
+            project = self.__project(project_id)
+            if task_id not in project.tasks:
+                abort(404)
+            return Response(project.image_bytes(task_id), mimetype="image/jpeg")
+
+        return app
+
+    def start(self, host:str="127.0.0.1", port:int=0)->str:
+        """ Serves the fake in a background thread and returns its base url """
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.__server = make_server(host, port, self.app, threaded=True)
+        threading.Thread(target=self.__server.serve_forever, name="fake-label-studio", daemon=True).start()
+        return self.url
+
+    @property
+    def url(self)->str:
+        return f"http://{self.__server.host}:{self.__server.port}"
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+
+    def webhook_payload(self, project_id:int, action:str="ANNOTATION_CREATED")->dict:
+        details = self.projects[project_id].details()
+        return {'action': action, 'project': details}
+
+    def send_webhooks(self, target_url:str, project_ids:List[int], count:int, concurrency:int=16, annotate:bool=True)->List[float]:
+        """
+        Posts count webhooks spread over the projects, like annotators saving at once. With annotate, every webhook
+        follows a newly labeled task. Returns the latency of every request in seconds.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+
+        def send(i):
+            project_id = project_ids[i % len(project_ids)]
+            if annotate:
+                self.projects[project_id].annotate(1)
+            started = datetime.now()
+            response = session.post(target_url, json=self.webhook_payload(project_id), timeout=60)
+            response.raise_for_status()
+            return (datetime.now() - started).total_seconds()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(send, range(count)))
@@ -0,0 +1,285 @@
+"""
+End-to-end benchmarks against an in-process fake LabelStudio serving synthetic projects. Results are written as JSON
+under benchmarks/results/ so runs on different commits can be compared:
+
+    python benchmarks/run_suite.py --tasks 2000 --boxes 20 --image-size 640
+    python benchmarks/run_suite.py --scenarios full_sync incremental_sync --format packed
+    python benchmarks/run_suite.py --scenarios full_sync --image-size 3840 --ingest-resize 640
+    python benchmarks/run_suite.py --compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+
+Scenarios:
+    full_sync             task fetch, split, label conversion and image download into an empty gym and image cache
+    incremental_sync      the same pipeline again after --increment more tasks were annotated
+    webhook_storm         --webhooks webhooks from --concurrency annotators against the service's /update route
+    concurrent_trainings  manual trainings of every project at once through the Scheduler, one epoch each
+
+The last two run the real service and are skipped when torch or ultralytics are not installed. Everything runs in a
+temporary working directory, the service's ./memory, ./gym and caches are left alone.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARK_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from label_studio_sdk.client import LabelStudio
+from label_studio_sdk import Client
+
+from synthetic import SyntheticProject
+from fake_label_studio import FakeLabelStudio
+
+SCENARIOS = ("full_sync", "incremental_sync", "webhook_storm", "concurrent_trainings")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def latency_summary(seconds:list)->dict:
+    milliseconds = [value * 1000 for value in seconds]
+    return {
+        'p50_ms': percentile(milliseconds, 0.50),
+        'p95_ms': percentile(milliseconds, 0.95),
+        'p99_ms': percentile(milliseconds, 0.99),
+        'max_ms': max(milliseconds)
+    }
+
+def git_commit()->str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class Stopwatch:
+    def __init__(self):
+        self.stages = {}
+        self.attributes = {}
+
+    @contextmanager
+    def span(self, stage:str, **attributes):
+        """ Span of stage_dataset, sums the seconds of every stage and keeps its latest attributes """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0) + time.perf_counter() - start
+            self.attributes[stage] = attributes
+
+def sync_dataset(fake:FakeLabelStudio, project_id:int)->dict:
+    """ The data half of a training cycle, staged by the same stage_dataset a Trainer calls, without the model """
+    from staging import stage_dataset
+    from service import Service
+
+    watch = Stopwatch()
+    requests_before = dict(fake.requests)
+
+    ls = LabelStudio(base_url=fake.url, api_key=fake.api_key)
+    ls_client = Client(url=fake.url, api_key=fake.api_key)
+    project = ls.projects.get(id=project_id)
+    labels = list(list(project.get_label_interface().labels)[0].keys())
+
+    staged = stage_dataset(project_id, ls_client.get_project(id=project_id), labels, Service(), span=watch.span)
+    if 'preprocess_images' in watch.attributes:
+        staged['download']['preprocess'] = {key: value for key, value in watch.attributes['preprocess_images'].items() if key != 'images'}
+
+    total = sum(watch.stages.values())
+    return {
+        'seconds': total,
+        'stages': watch.stages,
+        'tasks': staged['counts']['total'],
+        'changes': staged['changes'],
+        'download': staged['download'],
+        'images_per_second': watch.attributes['image_download']['images'] / max(total, 1e-9),
+        'label_studio_requests': {endpoint: count - requests_before.get(endpoint, 0) for endpoint, count in fake.requests.items() if count != requests_before.get(endpoint, 0)}
+    }
+
+def run_full_sync(fake, args, service):
+    return {project_id: sync_dataset(fake, project_id) for project_id in fake.projects}
+
+def run_incremental_sync(fake, args, service):
+    results = {}
+    for project_id, project in fake.projects.items():
+        # The scenario builds on full_sync, and does one itself when that was not selected
+        if not os.path.exists(f"./memory/project-{project_id}/task_index.json"):
+            sync_dataset(fake, project_id)
+        project.annotate(args.increment)
+        results[project_id] = sync_dataset(fake, project_id)
+    return results
+
+def configure_service(fake:FakeLabelStudio, args):
+    """ Points the Service settings at the fake LabelStudio and the temporary working directory, before anything reads them """
+    os.environ.update({
+        'LABEL_STUDIO_URL': fake.url,
+        'API_KEY': fake.api_key,
+        'STATE_DB_PATH': "./memory/state.db",
+        'IMAGE_CACHE_DIR': "./cache/images",
+        'CHECKPOINT_DIR': "./checkpoints",
+        'REPLICATION_TARGETS': "local",
+        'REPLICATION_STAGING_DIR': "./staging",
+        'DATASET_FORMAT': args.format,
+        'SHARD_TASKS': str(args.shard_tasks),
+        'INGEST_RESIZE': str(bool(args.ingest_resize)),
+        'IMAGE_SIZE': str(args.ingest_resize or 640),
+        'DOWNLOAD_WORKERS': str(args.workers),
+        'TRACE_PATH': "./traces.jsonl",
+        'COLD_START_EPOCHS': "1",
+        'WARM_START_EPOCHS': "1",
+        'ASYNC_PROCESSES_ALLOWED': str(len(fake.projects)),
+        'MINUTES_TO_WAIT_FOR_NEXT_ANNOTATION': str(args.debounce_minutes)
+    })
+
+def start_service(fake:FakeLabelStudio, args):
+    """ Imports the Flask app, serves it on a free port and returns its url and the Scheduler """
+    from werkzeug.serving import make_server
+    from app import app, SCHEDULER
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="service", daemon=True).start()
+    return f"http://127.0.0.1:{server.port}", SCHEDULER
+
+def run_webhook_storm(fake, args, service):
+    url, _ = service()
+    start = time.perf_counter()
+    latencies = fake.send_webhooks(f"{url}/update", list(fake.projects), args.webhooks, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+    return {'webhooks': args.webhooks, 'concurrency': args.concurrency, 'requests_per_second': args.webhooks / elapsed, **latency_summary(latencies)}
+
+def run_concurrent_trainings(fake, args, service):
+    _, scheduler = service()
+    start = time.perf_counter()
+    for project_id in fake.projects:
+        scheduler.request_training(project_id).result(timeout=60)
+    # A project leaves training_dict once its callback ran
+    while scheduler.training_queue or scheduler.training_dict:
+        time.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    return {
+        'projects': len(fake.projects),
+        'seconds': elapsed,
+        'stages': stage_totals(scheduler.telemetry.render())
+    }
+
+def stage_totals(metrics:str)->dict:
+    """ Total seconds per stage from the rendered ml_workflow_stage_seconds histogram """
+    totals = {}
+    for line in metrics.splitlines():
+        if line.startswith('ml_workflow_stage_seconds_sum{'):
+            labels, value = line.split(" ")
+            totals[labels.split('"')[1]] = float(value)
+    return totals
+
+def flatten(result, prefix="")->dict:
+    if isinstance(result, dict):
+        flat = {}
+        for key, value in result.items():
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    return {prefix: result} if isinstance(result, (int, float)) and not isinstance(result, bool) else {}
+
+def compare(before_path:str, after_path:str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['commit']} ({before['timestamp']}) -> {after['commit']} ({after['timestamp']})")
+    old, new = flatten(before['scenarios']), flatten(after['scenarios'])
+    width = max((len(key) for key in old if key in new), default=10)
+    for key in sorted(old):
+        if key not in new:
+            continue
+        ratio = f"{new[key] / old[key]:.2f}x" if old[key] else "-"
+        print(f"{key:<{width}}  {old[key]:>14,.3f}  {new[key]:>14,.3f}  {ratio:>8}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--projects", type=int, default=2)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--labeled", type=int, default=None, help="tasks annotated at the start, all by default")
+    parser.add_argument("--boxes", type=int, default=10)
+    parser.add_argument("--image-size", type=int, default=640)
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--increment", type=int, default=50, help="tasks annotated before the incremental sync")
+    parser.add_argument("--format", choices=("files", "packed"), default="files")
+    parser.add_argument("--shard-tasks", type=int, default=512)
+    parser.add_argument("--ingest-resize", type=int, default=0, help="resize images to this imgsz after download, 0 keeps the originals")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--webhooks", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--debounce-minutes", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results"))
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    labeled = args.labeled if args.labeled is not None else args.tasks - args.increment
+    projects = [SyntheticProject(project_id, args.tasks, labeled, args.boxes, args.image_size, args.classes, args.seed)
+                for project_id in range(1, args.projects + 1)]
+    fake = FakeLabelStudio(projects)
+    fake.start()
+    configure_service(fake, args)
+
+    runners = {
+        'full_sync': run_full_sync,
+        'incremental_sync': run_incremental_sync,
+        'webhook_storm': run_webhook_storm,
+        'concurrent_trainings': run_concurrent_trainings
+    }
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        'scenarios': {},
+        'skipped': {}
+    }
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="ml-workflow-bench-")
+    service = {}
+
+    def get_service():
+        if not service:
+            service['url'], service['scheduler'] = start_service(fake, args)
+        return service['url'], service['scheduler']
+
+    try:
+        os.chdir(workdir)
+        for name in args.scenarios:
+            print(f"[INFO]: Running {name}")
+            try:
+                results['scenarios'][name] = runners[name](fake, args, get_service)
+            except ImportError as e:
+                print(f"[WARN]: Skipped {name}: {e}")
+                results['skipped'][name] = str(e)
+    finally:
+        if service:
+            service['scheduler'].shutdown()
+        fake.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{results['commit']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(json.dumps(results['scenarios'], indent=2, default=str))
+    print(f"[INFO]: Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compares the file server upload of the old ModelTransporter saves with the Replicator copying staged artifacts to its
+SmbTarget, the path every trained model takes now. Needs a reachable SMB share, a throwaway Samba container works as
+a stand-in:
+
+    docker run -d -p 445:445 dperson/samba -u "bench;bench" -s "bench;/share;yes;no;no;bench"
+    python benchmarks/smb_upload.py --server 127.0.0.1 --share bench --username bench --password bench
+
+Every save uploads a weights file and a fresh directory of synthetic metrics files, like one training. Replicator
+copies are chunked, read back and checked against the staged sha256 before they replace the previous version, the
+old saves only wrote the files.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import smbclient
+import smbclient.shutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+def legacy_save(server, share, username, password, weights_path, metrics_path, save_path):
+    """ File server branches of the previous save_model and save_metrics_directory, a new session per save """
+    smbclient.register_session(server, username=username, password=password)
+    remote_path = f"//{server}/" + os.path.join(share, "ml-workflow", save_path)
+    for folder, files in (("weights", [weights_path]), ("metrics", [os.path.join(metrics_path, file) for file in os.listdir(metrics_path)])):
+        smbclient.makedirs(os.path.join(remote_path, folder), exist_ok=True)
+        for file in files:
+            with open(file, "rb") as src, smbclient.open_file(os.path.join(remote_path, folder, os.path.basename(file)), mode="wb") as dest:
+                shutil.copyfileobj(src, dest)
+
+def synthetic_files(directory, weights_mb, files, file_kb):
+    metrics_path = os.path.join(directory, "metrics")
+    os.makedirs(metrics_path, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(metrics_path, f"metric_{i}.png"), "wb") as f:
+            f.write(os.urandom(file_kb * 1024))
+    weights_path = os.path.join(directory, "best.pt")
+    with open(weights_path, "wb") as f:
+        f.write(os.urandom(weights_mb * 1024**2))
+    return weights_path, metrics_path
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", required=True)
+    parser.add_argument("--port", type=int, default=445)
+    parser.add_argument("--share", required=True)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--saves", type=int, default=5)
+    parser.add_argument("--weights-mb", type=int, default=50)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--file-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="smb-upload-")
+    # Replicator and its targets read their settings from the Service singleton
+    os.environ.update({
+        'FILE_SERVER_IP': args.server,
+        'FILE_SERVER_PORT': str(args.port),
+        'SHARED_FOLDER': args.share,
+        'USERNAME': args.username,
+        'PASSWORD': args.password,
+        'REPLICATION_TARGETS': "smb",
+        'REPLICATION_STAGING_DIR': os.path.join(tmp, "staging"),
+        'REPLICATION_MAX_ATTEMPTS': "1"
+    })
+    from replication import Replicator
+    from probes import StorageProbe
+
+    try:
+        weights_path, metrics_path = synthetic_files(os.path.join(tmp, "source"), args.weights_mb, args.files, args.file_kb)
+        total_mb = args.saves * (args.weights_mb + args.files * args.file_kb / 1024)
+
+        start = time.perf_counter()
+        for i in range(args.saves):
+            # A new connection per save, like a fresh training worker did
+            smbclient.reset_connection_cache()
+            legacy_save(args.server, args.share, args.username, args.password, weights_path, metrics_path, os.path.join("bench-legacy", f"run-{i}"))
+        legacy_seconds = time.perf_counter() - start
+        smbclient.reset_connection_cache()
+
+        StorageProbe().refresh()
+        replicator = Replicator()
+        for i in range(args.saves):
+            # Staging moves the run directory, every save gets its own
+            run_path = os.path.join(tmp, f"run-{i}")
+            shutil.copytree(metrics_path, run_path)
+            replicator.stage(i, os.path.join("bench-replicated", f"run-{i}"), None, "best.pt", run_path, weights_path=weights_path)
+        start = time.perf_counter()
+        replicator.start()
+        while replicator.counts().get('pending', 0) + replicator.counts().get('uploading', 0):
+            time.sleep(0.05)
+        replicated_seconds = time.perf_counter() - start
+        failed = replicator.counts().get('failed', 0)
+
+        share_root = replicator.targets['smb'].pool.share_root()
+        for folder in ("bench-legacy", "bench-replicated"):
+            smbclient.shutil.rmtree(os.path.join(share_root, "ml-workflow", folder), ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    target = replicator.targets['smb']
+    print(f"{args.saves} saves x ({args.weights_mb} MiB weights + {args.files} x {args.file_kb} KiB metrics), "
+          f"{target.file_workers} files in flight, {target.chunk_size // 1024**2} MiB chunks, {failed} failed")
+    print(f"legacy upload : {legacy_seconds:.3f}s ({total_mb / legacy_seconds:,.1f} MiB/s)")
+    print(f"Replicator    : {replicated_seconds:.3f}s ({total_mb / replicated_seconds:,.1f} MiB/s), with checksum read-back")
+    print(f"speedup       : {legacy_seconds / replicated_seconds:.2f}x")
+
+if __name__ == "__main__":
+    main()
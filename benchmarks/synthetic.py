@@ -0,0 +1,117 @@
+"""
+Synthetic LabelStudio projects for the benchmarks: rectangle-labeled image tasks whose count, boxes per image and
+image size are chosen by the scenario. Everything is derived from a seed, so runs on different commits see the
+same data.
+"""
+import io
+import random
+from datetime import datetime, timedelta, timezone
+
+from PIL import Image, ImageDraw
+
+def now_iso(age:timedelta=timedelta(0))->str:
+    return (datetime.now(timezone.utc) - age).isoformat()
+
+class SyntheticProject:
+    def __init__(self, project_id:int, tasks:int=500, labeled:int=None, boxes:int=10, image_size:int=640, classes:int=5, seed:int=0, distinct_images:int=32):
+        """
+        Parameters:
+            project_id: id the fake LabelStudio serves the project under.
+            tasks: number of tasks in the project.
+            labeled: tasks with an annotation at the start, all of them by default. These are dated a day back, so
+                incremental syncs only see what is annotated later.
+            boxes: rectangles per annotation.
+            image_size: width and height of every image.
+            classes: number of labels in the label config.
+            distinct_images: images actually rendered, every task gets one of them with its id appended after the
+                JPEG end marker, so each task still has unique content for the image cache.
+        """
+        self.id = project_id
+        self.title = f"Synthetic project {project_id}"
+        self.labels = [f"class_{i}" for i in range(classes)]
+        self.boxes = boxes
+        self.image_size = image_size
+        self.rng = random.Random(seed * 1000 + project_id)
+
+        self.images = [self.__render(i) for i in range(min(distinct_images, max(tasks, 1)))]
+        self.tasks = {}
+        created = now_iso(timedelta(days=1))
+        for task_id in range(project_id * 1_000_000 + 1, project_id * 1_000_000 + tasks + 1):
+            self.tasks[task_id] = {
+                'id': task_id,
+                'data': {'image': f"/data/upload/{project_id}/{task_id}.jpg"},
+                'annotations': [],
+                'created_at': created,
+                'updated_at': created,
+                'completed_at': None
+            }
+        self.annotate(tasks if labeled is None else labeled, age=timedelta(days=1))
+
+    def __render(self, index:int)->bytes:
+        image = Image.new("RGB", (self.image_size, self.image_size), tuple(self.rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x, y = self.rng.randrange(self.image_size), self.rng.randrange(self.image_size)
+            size = self.rng.randrange(8, max(9, self.image_size // 4))
+            draw.rectangle((x, y, x + size, y + size), fill=tuple(self.rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+
+    def __result(self)->list:
+        result = []
+        for _ in range(self.boxes):
+            x, y = self.rng.uniform(0, 90), self.rng.uniform(0, 90)
+            result.append({
+                'from_name': "label",
+                'to_name': "image",
+                'type': "rectanglelabels",
+                'original_width': self.image_size,
+                'original_height': self.image_size,
+                'value': {
+                    'x': x, 'y': y,
+                    'width': self.rng.uniform(1, 100 - x), 'height': self.rng.uniform(1, 100 - y),
+                    'rotation': 0,
+                    'rectanglelabels': [self.rng.choice(self.labels)]
+                }
+            })
+        return result
+
+    def annotate(self, count:int, age:timedelta=timedelta(0))->list:
+        """ Labels up to count unlabeled tasks, returns their ids """
+        annotated = []
+        for task in self.tasks.values():
+            if len(annotated) >= count:
+                break
+            if task['annotations']:
+                continue
+            stamp = now_iso(age)
+            task['annotations'] = [{'id': task['id'], 'result': self.__result(), 'created_at': stamp}]
+            task['updated_at'] = stamp
+            task['completed_at'] = stamp
+            annotated.append(task['id'])
+        return annotated
+
+    def image_bytes(self, task_id:int)->bytes:
+        return self.images[task_id % len(self.images)] + f"task-{task_id}".encode()
+
+    def label_config(self)->str:
+        labels = "".join(f'<Label value="{label}"/>' for label in self.labels)
+        return f'<View><Image name="image" value="$image"/><RectangleLabels name="label" toName="image">{labels}</RectangleLabels></View>'
+
+    def details(self)->dict:
+        """ Project fields as the LabelStudio API returns them """
+        labeled = sum(1 for task in self.tasks.values() if task['annotations'])
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': "",
+            'label_config': self.label_config(),
+            'parsed_label_config': {
+                'label': {'type': "RectangleLabels", 'to_name': ["image"], 'inputs': [{'type': "Image", 'value': "image"}], 'labels': self.labels}
+            },
+            'task_number': len(self.tasks),
+            'num_tasks_with_annotations': labeled,
+            'total_annotations_number': labeled,
+            'created_at': now_iso()
+        }
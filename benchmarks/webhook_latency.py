@@ -0,0 +1,89 @@
+"""
+Load test of the /update webhook while trainings run. Start the service (Flask or ASGI), then:
+
+    python benchmarks/webhook_latency.py --url http://127.0.0.1:8000 --projects 1 2 --train 1 --requests 2000 --concurrency 32
+
+--train starts manual trainings first, their requests are timed too. Webhooks carry made-up annotation counts of the
+given projects, which must exist in the Scheduler. --sse keeps that many dashboards subscribed to /events during the
+run, an open stream must not hold up the webhooks.
+"""
+import time
+import random
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def listen(url, received, connected, stop):
+    """ One dashboard reading /events, counts the events it receives until stop is set """
+    with requests.get(f"{url}/events", stream=True, timeout=(10, 60)) as response:
+        connected.release()
+        for line in response.iter_lines():
+            if stop.is_set():
+                return
+            if line.startswith(b"event:"):
+                received.append(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--projects", type=int, nargs="+", required=True)
+    parser.add_argument("--train", type=int, nargs="*", default=[])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sse", type=int, default=0, help="dashboards streaming /events during the run")
+    args = parser.parse_args()
+
+    received, connected, stop = [], threading.Semaphore(0), threading.Event()
+    for _ in range(args.sse):
+        threading.Thread(target=listen, args=(args.url, received, connected, stop), daemon=True).start()
+    for _ in range(args.sse):
+        if not connected.acquire(timeout=10):
+            raise SystemExit("/events did not answer within 10 s")
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    for project_id in args.train:
+        start = time.perf_counter()
+        response = session.get(f"{args.url}/train-{project_id}", timeout=600)
+        print(f"/train-{project_id}: HTTP {response.status_code} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(0)
+    counts = {project_id: 0 for project_id in args.projects}
+    payloads = []
+    for _ in range(args.requests):
+        project_id = rng.choice(args.projects)
+        counts[project_id] += 1
+        payloads.append({'action': "ANNOTATION_CREATED", 'project': {'id': project_id, 'num_tasks_with_annotations': counts[project_id]}})
+
+    def send(payload):
+        start = time.perf_counter()
+        response = session.post(f"{args.url}/update", json=payload, timeout=60)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, payloads))
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    latencies = [seconds * 1000 for seconds, _ in results]
+    errors = sum(1 for _, status in results if status >= 400)
+    print(f"{args.requests} webhooks, {args.concurrency} concurrent, {len(args.train)} trainings started, {errors} errors")
+    if args.sse:
+        print(f"sse        : {args.sse} streams open, {len(received)} events received")
+    print(f"throughput : {args.requests / elapsed:,.0f} req/s")
+    print(f"p50        : {percentile(latencies, 0.50):.1f} ms")
+    print(f"p95        : {percentile(latencies, 0.95):.1f} ms")
+    print(f"p99        : {percentile(latencies, 0.99):.1f} ms")
+    print(f"max        : {max(latencies):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import shutil
+import subprocess
+from datetime import datetime
+
+from typing import List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from service import Service
+
+PRIORITY_AUTO = 0
+PRIORITY_MANUAL = 10
+
+class ResourceMonitor:
+    """ Measures the cores, RAM and GPU memory of the machine. """
+
+    def cpus(self)->int:
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+
+    def ram(self)->Tuple[Optional[int], Optional[int]]:
+        """ (available, total) bytes of RAM, None when it cannot be measured """
+        if psutil is not None:
+            memory = psutil.virtual_memory()
+            return memory.available, memory.total
+        try:
+            info = {}
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    key, value = line.split(":", 1)
+                    info[key] = int(value.split()[0]) * 1024
+            return info["MemAvailable"], info["MemTotal"]
+        except (OSError, KeyError, ValueError):
+            return None, None
+
+    def gpu(self)->Tuple[Optional[int], Optional[int]]:
+        """ (free, total) bytes of GPU memory summed over all GPUs, None on CPU-only machines """
+        # nvidia-smi avoids creating a CUDA context in the scheduler process
+        if shutil.which("nvidia-smi"):
+            try:
+                output = subprocess.run(
+                    ["nvidia-smi", "--query-gpu=memory.free,memory.total", "--format=csv,noheader,nounits"],
+                    capture_output=True, text=True, timeout=5, check=True).stdout
+                rows = [[int(v) * 1024**2 for v in line.split(",")] for line in output.strip().splitlines() if line.strip()]
+                if rows:
+                    return sum(row[0] for row in rows), sum(row[1] for row in rows)
+            except (OSError, subprocess.SubprocessError, ValueError):
+                pass
+        return None, None
+
+    def snapshot(self)->dict:
+        ram_free, ram_total = self.ram()
+        gpu_free, gpu_total = self.gpu()
+        return {'cpus': self.cpus(), 'ram': ram_free, 'ram_total': ram_total, 'gpu': gpu_free, 'gpu_total': gpu_total}
+
+class AdmissionController:
+    # Rough GPU memory of a YOLO11 variant training at imgsz 640 with a batch of 16
+    GPU_BYTES_BY_SCALE = {'n': 2.5 * 1024**3, 's': 4 * 1024**3, 'm': 7 * 1024**3, 'l': 9 * 1024**3, 'x': 13 * 1024**3}
+    BASE_RAM_BYTES = 2 * 1024**3
+    RAM_BYTES_PER_IMAGE = 256 * 1024
+
+    def __init__(self, service:Service, monitor:ResourceMonitor=None):
+        """
+        Parameters:
+            service: shared service configuration (ASYNC_PROCESSES_ALLOWED, ADMISSION_AGING_MINUTES).
+            monitor: source of the machine's resources.
+
+        Decides which queued trainings may start. A job is admitted only when its estimated footprint fits into the
+        measured free resources minus what running jobs reserved. Jobs are ranked by priority plus aging so large
+        projects that do not fit right away are not starved by smaller ones.
+        """
+        self.service = service
+        self.monitor = monitor or ResourceMonitor()
+        self.reservations = {}
+
+    def estimate_footprint(self, num_tasks:int, model_name:str="yolo11n.pt", imgsz:int=640)->dict:
+        scale = os.path.splitext(os.path.basename(model_name))[0][-1:]
+        gpu = self.GPU_BYTES_BY_SCALE.get(scale, self.GPU_BYTES_BY_SCALE['n']) * (imgsz / 640) ** 2
+        ram = self.BASE_RAM_BYTES + num_tasks * self.RAM_BYTES_PER_IMAGE
+        return {'ram': int(ram), 'gpu': int(gpu)}
+
+    def effective_priority(self, job:dict, now:datetime)->float:
+        waited_minutes = (now - job['enqueued_at']).total_seconds() / 60
+        return job['priority'] + waited_minutes / max(self.service.admission_aging_minutes, 1e-9)
+
+    def rank(self, jobs:List[dict])->List[dict]:
+        now = datetime.now()
+        return sorted(jobs, key=lambda job: (-self.effective_priority(job, now), job['enqueued_at']))
+
+    def __fits(self, footprint:dict, resources:dict)->bool:
+        if resources['ram'] is not None and footprint['ram'] > resources['ram']:
+            return False
+        if resources['gpu'] is not None and footprint['gpu'] > resources['gpu']:
+            return False
+        return True
+
+    def has_room(self)->bool:
+        """ Whether another job could start, without measuring the machine """
+        return len(self.reservations) < self.service.async_processes_allowed
+
+    def admit(self, jobs:List[dict], resources:dict=None)->List[Tuple[int, dict]]:
+        """
+        Parameters:
+            jobs: queued jobs as dicts with 'project_id', 'priority', 'enqueued_at' and 'num_tasks'.
+            resources: snapshot of the monitor taken by the caller, measured now when None.
+
+        Returns the (project_id, footprint) of the jobs that may start now, the footprint is reserved until release().
+        """
+        if not jobs or not self.has_room():
+            return []
+        resources = dict(resources) if resources is not None else self.monitor.snapshot()
+        # Freshly admitted jobs have not allocated their memory yet, so their reservation is subtracted as well
+        for key in ('ram', 'gpu'):
+            total = resources[f'{key}_total']
+            if resources[key] is not None and total is not None:
+                reserved = sum(footprint[key] for footprint in self.reservations.values())
+                resources[key] = min(resources[key], total - reserved)
+        if resources['gpu'] is None:
+            threads = max(1, resources['cpus'] // max(1, self.service.async_processes_allowed))
+        else:
+            threads = None
+
+        admitted = []
+        now = datetime.now()
+        for job in self.rank(jobs):
+            if not self.has_room():
+                break
+            footprint = self.estimate_footprint(job['num_tasks'], self.service.base_model, self.service.image_size)
+            footprint['threads'] = threads
+            # An idle machine always runs its first job, estimates must not lock it up
+            if self.reservations and not self.__fits(footprint, resources):
+                # Past one aging step a job that does not fit blocks smaller ones instead of being overtaken forever
+                if self.effective_priority(job, now) - job['priority'] >= 1:
+                    break
+                continue
+            self.reservations[job['project_id']] = footprint
+            admitted.append((job['project_id'], footprint))
+            for key in ('ram', 'gpu'):
+                if resources[key] is not None:
+                    resources[key] -= footprint[key]
+        return admitted
+
+    def release(self, project_id:int):
+        self.reservations.pop(project_id, None)
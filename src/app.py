@@ -1,22 +1,46 @@
 import os
-import asyncio
 import traceback
-import pandas as pd
 from datetime import datetime
 
 from dotenv import load_dotenv, set_key
 
 from scheduler import Scheduler
 from service import Service
-from transporter import ModelTransporter
+from probes import StorageProbe
 from memoryHandler import MemoryHandler
+from trainingLog import TrainingLog, SEGMENT_PATTERN
+from logger import Logger
+from replication import Replicator
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 
 app = Flask(__name__)
 
 SERVICE = Service()
 SCHEDULER = Scheduler(service=SERVICE)
+PROBE = StorageProbe(service=SERVICE)
+
+# Handlers wait this long at most for the Scheduler's loop, which never runs training itself
+SCHEDULER_TIMEOUT_SECONDS = 10
+
+def get_devices():
+    # Get device availability from the cached background probes
+    return [{
+        'name': 'Local Storage',
+        'available': True,
+        'priority': 3
+    }, {
+        'name': f'File Server @ {os.getenv("FILE_SERVER_IP")}',
+        'available': PROBE.file_server_available(),
+        'priority': 2
+    }, {
+        'name': 'USB Device',
+        'available': PROBE.usb_mount() != None,
+        'priority': 1
+    }]
+
+# Storage devices appearing or disappearing are pushed to the dashboards
+PROBE.subscribe(lambda name, old, new: SCHEDULER.publish('devices', devices=get_devices()))
 
 @app.route("/")
 def check_environment():
@@ -72,9 +96,51 @@ def project_overview(project_id):
 
 @app.route("/get-latest-results-for-<project_id>")
 def get_latest_results_for(project_id):
-    results_data = MemoryHandler().pull_latest_results_for(project_id)
+    """
+    Query parameters:
+        run: run number, 'latest' (default) or 'all'.
+        start, end: epoch range.
+        columns: comma separated metrics to return.
+        points: maximum number of rows, longer ranges are downsampled.
+    """
+    columns = request.args.get('columns')
+    try:
+        results_data = MemoryHandler().query_results_for(
+            int(project_id),
+            run=request.args.get('run', 'latest'),
+            start=request.args.get('start', type=float),
+            end=request.args.get('end', type=float),
+            columns=columns.split(',') if columns else None,
+            max_points=request.args.get('points', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify(results_data), 200
 
+@app.route("/live-metrics-for-<project_id>")
+def get_live_metrics_for(project_id):
+    """
+    Query parameters:
+        since: sequence number of the last sample the client has, only newer samples are returned.
+        kind: 'batch' or 'epoch' to only return those samples.
+    """
+    project_id = int(project_id)
+    samples = SCHEDULER.metrics_bus.read(project_id, since=request.args.get('since', 0, type=int), kind=request.args.get('kind'))
+    return jsonify({'samples': samples, 'training': project_id in SCHEDULER.training_dict}), 200
+
+@app.route("/replication-status-for-<project_id>")
+def get_replication_status_for(project_id):
+    # Latest artifacts of the project with the status of every target
+    return jsonify(Replicator(SERVICE).status(int(project_id), limit=request.args.get('limit', 10, type=int))), 200
+
+@app.route("/retry-replication-<artifact_id>")
+def retry_replication(artifact_id):
+    Replicator(SERVICE).retry(artifact_id)
+    return jsonify({'success': True}), 200
+
+@app.route("/get-runs-for-<project_id>")
+def get_runs_for(project_id):
+    return jsonify(MemoryHandler().runs_for(int(project_id))), 200
+
 @app.route("/link-<project_id>")
 def link_project(project_id):
     try:
@@ -93,8 +159,7 @@ def link_project(project_id):
                 'PROJECT_UPDATED'
             ]
         )
-        SCHEDULER.projects[int(project_id)]['tracked'] = True
-        SCHEDULER.update_csv_memory()
+        SCHEDULER.set_tracked(int(project_id), True)
         return jsonify({"message": "Link made successfully!"}), 200
     except Exception as e:
         print(e)
@@ -110,41 +175,31 @@ def unlink_project(project_id):
                 print("deleted ", project_id)
                 SCHEDULER.ls.webhooks.delete(wh.id)
         
-        SCHEDULER.projects[int(project_id)]['tracked'] = False
-        SCHEDULER.update_csv_memory()
+        SCHEDULER.set_tracked(int(project_id), False)
         return jsonify({"message": "Link broken successfully!"}), 200
     except Exception as e:
         print(e)
         return jsonify({"error": f"Error breaking linking: {str(e)}"}), 500
 
 @app.route('/train-<project_id>')
-async def train_project(project_id):
+def train_project(project_id):
     try:
         project_id = int(project_id)
-        await SCHEDULER.check_and_train(overrided_project=int(project_id))
-        location_of_metrics = SCHEDULER.projects[project_id]['location_of_metrics']
-        json_data = {}
-        if location_of_metrics != '':
-            df = pd.read_csv(location_of_metrics + '/results.csv')
-            json_data = df.to_dict(orient="records")  # Convert rows to a list of dictionaries
+        # Only waits for the queue decision, the training runs on the Scheduler's loop
+        SCHEDULER.request_training(project_id).result(timeout=SCHEDULER_TIMEOUT_SECONDS)
+        # Metrics may have moved to a USB device or the file server, the service memory keeps a copy
+        json_data = MemoryHandler().pull_latest_results_for(project_id)
         return jsonify(json_data), 200
     except Exception as e:
         print(traceback.format_exc())
         return jsonify({"error": f"Error in manual train init: {str(e)}"}), 500
 
 @app.route('/stop-<project_id>')
-async def stop_project_from_training(project_id):
-    # Check if project is in training queue
-    project_id = int(project_id)
-    if project_id in SCHEDULER.training_queue_set:
-        SCHEDULER.training_queue_set.remove(project_id)
-        SCHEDULER.training_queue.remove(project_id)
-        return {'success': True}, 200
-    elif project_id in SCHEDULER.training_dict:
-        await SCHEDULER.stop_project_in_training(project_id)
-        return {'success': True}, 200
-    else:
+def stop_project_from_training(project_id):
+    outcome = SCHEDULER.request_stop(int(project_id)).result(timeout=SCHEDULER_TIMEOUT_SECONDS)
+    if outcome == 'not_found':
         return {'warn': "Project not found"}, 404
+    return {'success': True}, 200
 
 @app.route('/listen-for-<project_id>')
 def listen_for_id(project_id):
@@ -153,9 +208,31 @@ def listen_for_id(project_id):
     project['training_duration'] = str(datetime.now() - project['date_time_last_trained']) if type(project['date_time_last_trained']) is not str  else project['training_duration']
     project['in-queue'] = SCHEDULER.training_queue.index(int(project_id)) if int(project_id) in SCHEDULER.training_queue_set else -1
     project['training'] = int(project_id) in SCHEDULER.training_dict
+    project['progress'] = SCHEDULER.trainer_dict[project_id].progress if project_id in SCHEDULER.trainer_dict else {}
 
     return project, 201
 
+@app.route('/metrics')
+def export_metrics():
+    # Prometheus scrape target, gauges of the current queue are taken at scrape time
+    telemetry = SCHEDULER.telemetry
+    telemetry.set('ml_workflow_queue_length', len(SCHEDULER.training_queue))
+    telemetry.set('ml_workflow_trainings_running', len(SCHEDULER.training_dict))
+    counts = SCHEDULER.replicator.counts()
+    for status in ('pending', 'uploading', 'done', 'failed'):
+        telemetry.set('ml_workflow_replication_outbox', counts.get(status, 0), status=status)
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/events')
+def stream_events():
+    # Server-Sent Events replacing the dashboards' polling, ?project=<id> limits the stream to one project
+    project_id = request.args.get('project', type=int)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(
+        SCHEDULER.events.stream(last_event_id=last_event_id, project_id=project_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/update-settings', methods=['POST'])
 def update_settings():
     try:
@@ -192,22 +269,7 @@ def update_settings():
 
 @app.route("/get-data", methods=['GET'])
 def get_data():
-    # Get device availability
-    checker = ModelTransporter('', service=SERVICE)
-    
-    devices = [{
-        'name': 'Local Storage',
-        'available': True,
-        'priority': 3
-    }, {
-        'name': f'File Server @ {os.getenv("FILE_SERVER_IP")}',
-        'available': checker.is_file_server_available(),
-        'priority': 2
-    }, {
-        'name': 'USB Device',
-        'available': checker.scan_for_available_usb_device() != None,
-        'priority': 1
-    }]
+    devices = get_devices()
 
     # Get monitored projects
     projects = [{
@@ -221,8 +283,8 @@ def get_data():
                 0
     } for id, values in SCHEDULER.projects.items()]
 
-    # Get logs
-    log_files = os.listdir(os.path.join(os.getcwd(),"logs"))
+    # Get logs, structured segments and the plain text logs written before them
+    log_files = [file for file in os.listdir(os.path.join(os.getcwd(),"logs")) if SEGMENT_PATTERN.match(file) or file.endswith('.txt')]
     log_files.sort()
     log_files.reverse()
     logs = [{'name': file} for file in log_files if file != 'example.txt']
@@ -237,38 +299,53 @@ def get_data():
 
 @app.route('/get-log-content', methods=['GET'])
 def get_log_content():
+    """
+    Query parameters:
+        name: log segment to read, every segment when omitted.
+        project, outcome: only entries of this project / with this outcome (success, error, cancelled).
+        since, until: ISO date-times bounding the entries.
+        offset, limit: page of the matching entries, newest first.
+        format: 'text' renders the reports (default), 'json' returns the structured entries.
+    """
     log_name = request.args.get('name')
 
-    log_path = os.path.join(os.getcwd(),"logs", log_name)
+    # Plain text logs written before the structured log
+    if log_name is not None and log_name.endswith('.txt'):
+        log_path = os.path.join(os.getcwd(), "logs", os.path.basename(log_name))
+        if not os.path.exists(log_path):
+            return jsonify({'error': 'Log file not found'}), 404
+        with open(log_path, 'r') as log_file:
+            return jsonify({'content': log_file.readlines()})
 
-    if not os.path.exists(log_path):
+    if log_name is not None and not os.path.exists(os.path.join(os.getcwd(), "logs", os.path.basename(log_name))):
         return jsonify({'error': 'Log file not found'}), 404
 
     try:
-        with open(log_path, 'r') as log_file:
-            content = log_file.readlines()
-
-        return jsonify({'content': content})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        since = request.args.get('since')
+        until = request.args.get('until')
+        entries, total = TrainingLog(os.path.join(os.getcwd(), "logs")).read(
+            segment=log_name,
+            project_id=request.args.get('project', type=int),
+            outcome=request.args.get('outcome'),
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None,
+            offset=request.args.get('offset', 0, type=int),
+            limit=min(request.args.get('limit', 20, type=int), 200))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('format') == 'json':
+        return jsonify({'entries': entries, 'total': total})
+    return jsonify({'content': [Logger.render(entry) for entry in entries], 'total': total})
 
 @app.route("/update", methods=['POST'])
-async def update_made_to_labelstudio():
-    data = request.get_json()
-    project_id = data['project']['id']
-    num_annotations = int(data['project']['num_tasks_with_annotations'])
-    
-    # Receive webhook and update tracking information
-    SCHEDULER.project_tasks_dif[project_id] = abs(num_annotations - SCHEDULER.project_finished_tasks_dict[project_id])
-    
-    print(project_id, num_annotations, SCHEDULER.project_finished_tasks_dict[project_id], SCHEDULER.project_tasks_dif[project_id])
-    
-    # Check to start training
-    await SCHEDULER.check_and_train()
+def update_made_to_labelstudio():
+    # Receive webhook and update tracking information, training is decided once the project's events settle
+    SCHEDULER.record_webhook(request.get_json())
 
     print("NUMBER OF TRAIN CALLS MADE: ", SCHEDULER.train_calls)
     
-    return {"success": "Called"}, 201
+    return {"success": "Queued"}, 201
 
 if __name__ == "__main__":
 
@@ -0,0 +1,102 @@
+import os
+import sys
+import errno
+import shutil
+
+from typing import List
+
+# ioctl that clones the extents of a file on btrfs, XFS and other copy-on-write filesystems
+FICLONE = 0x40049409
+
+class ArtifactPublisher:
+    def __init__(self, buffer_size:int=8 * 1024**2, allow_hardlink:bool=True):
+        """
+        Parameters:
+            buffer_size: read size of plain copies, used when neither linking nor sendfile is possible.
+            allow_hardlink: let copies share the inode of their source. Only safe for files nobody rewrites in
+                place, which holds for finished run outputs and staged artifacts.
+
+        Publishes training outputs without writing their bytes again whenever the filesystem allows it. Moves are
+        atomic renames on the same filesystem. Copies are reflinks or hardlinks on the same filesystem, and sendfile
+        or large-buffer copies across devices.
+        """
+        self.buffer_size = buffer_size
+        self.allow_hardlink = allow_hardlink
+
+    @staticmethod
+    def __reflink(source:str, destination:str)->bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        import fcntl
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+            return False
+
+    def __stream(self, source:str, destination:str)->str:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            size = os.fstat(src.fileno()).st_size
+            try:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return 'sendfile'
+            except (OSError, AttributeError):
+                # No sendfile between these files, start over with a buffered copy
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                shutil.copyfileobj(src, dst, self.buffer_size)
+                return 'copy'
+
+    def copy(self, source:str, destination:str)->str:
+        """ Copies a file, returns how: 'reflink', 'hardlink', 'sendfile' or 'copy' """
+        if os.path.lexists(destination):
+            os.remove(destination)
+        if self.__reflink(source, destination):
+            return 'reflink'
+        if self.allow_hardlink:
+            try:
+                os.link(source, destination)
+                return 'hardlink'
+            except OSError:
+                # Other device, or a filesystem without links such as a FAT formatted USB drive
+                pass
+        return self.__stream(source, destination)
+
+    def move(self, source:str, destination:str)->str:
+        """ Moves a file, returns 'rename' or how it was copied across devices """
+        try:
+            os.replace(source, destination)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        partial = destination + ".part"
+        method = self.__stream(source, partial)
+        os.replace(partial, destination)
+        os.remove(source)
+        return method
+
+    def publish_directory(self, source_dir:str, destination_dir:str, move:bool=True)->List[str]:
+        """ Moves or copies the files of a directory, subdirectories are skipped. Returns the published paths """
+        os.makedirs(destination_dir, exist_ok=True)
+        published = []
+        for file in sorted(os.listdir(source_dir)):
+            source = os.path.join(source_dir, file)
+            if not os.path.isfile(source):
+                continue
+            destination = os.path.join(destination_dir, file)
+            if move:
+                self.move(source, destination)
+            else:
+                self.copy(source, destination)
+            published.append(destination)
+        return published
@@ -0,0 +1,77 @@
+"""
+ASGI entry point, serves the dashboard and webhook routes from any ASGI server (uvicorn, hypercorn, or mounted in a
+Starlette or Quart application):
+
+    uvicorn asgi:application --app-dir src --workers 1
+
+The Scheduler keeps its own long-lived event loop, so requests only hand work to it and return. One worker process
+is expected, every worker would otherwise schedule trainings of its own.
+
+Flask views run on a pool of ASGI_THREADS threads, so concurrent webhooks and dashboard requests do not wait on
+each other. /events is streamed on the event loop itself: an open dashboard never holds one of those threads, which
+asgiref's WsgiToAsgi did by running every request on a single thread behind the first never-ending stream.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+from app import app, SCHEDULER, SERVICE
+
+flask_application = WSGIMiddleware(app, workers=SERVICE.asgi_threads)
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+async def stream_events(scope, receive, send):
+    """ Native counterpart of the Flask /events route """
+    project_id = parse_int(parse_qs(scope['query_string'].decode('latin-1')).get('project', [None])[0])
+    last_event_id = parse_int(dict(scope['headers']).get(b'last-event-id', b'').decode('latin-1'))
+
+    async def respond():
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]})
+        async for chunk in SCHEDULER.events.stream_async(last_event_id=last_event_id, project_id=project_id):
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        # The client was dropped for falling behind, it reconnects with its Last-Event-ID
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    streaming = asyncio.ensure_future(respond())
+    listening = asyncio.ensure_future(disconnected())
+    try:
+        done, _ = await asyncio.wait({streaming, listening}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Cancelling the stream unsubscribes the client from the EventBus
+        for task in (streaming, listening):
+            task.cancel()
+        await asyncio.gather(streaming, listening, return_exceptions=True)
+    if streaming in done:
+        streaming.result()
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/events':
+        await stream_events(scope, receive, send)
+        return
+    if scope['type'] != 'lifespan':
+        await flask_application(scope, receive, send)
+        return
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Trainings are cancelled and logged instead of being orphaned by the server's exit
+            SCHEDULER.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
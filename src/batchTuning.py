@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+import platform
+import threading
+from datetime import datetime
+
+import torch
+
+from typing import Optional
+
+def hardware_fingerprint()->dict:
+    """ What the batch size AutoBatch picks depends on: the accelerators, their memory and the torch build """
+    if torch.cuda.is_available():
+        devices = []
+        for i in range(torch.cuda.device_count()):
+            properties = torch.cuda.get_device_properties(i)
+            devices.append({'name': properties.name, 'memory': properties.total_memory})
+        return {'device': "cuda", 'devices': devices, 'cuda': torch.version.cuda, 'torch': torch.__version__}
+    memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') if hasattr(os, 'sysconf') else None
+    return {'device': "cpu", 'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count(), 'memory': memory, 'torch': torch.__version__}
+
+class BatchTuningCache:
+    def __init__(self, path:str="./memory/batch_tuning.json"):
+        """
+        Parameters:
+            path: JSON file holding the tuned batch sizes.
+
+        Remembers the batch size AutoBatch chose for a model variant and image size, and the training throughput
+        measured with it, so later trainings start with that batch instead of profiling memory again. Entries are
+        only valid for the hardware they were measured on, the whole file is dropped when the fingerprint changes.
+        """
+        self.path = path
+        self.fingerprint = hardware_fingerprint()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def variant(model_name:str)->str:
+        """ Model variant of a weights file, warm starts share the tuning of their base model """
+        return os.path.splitext(os.path.basename(model_name))[0]
+
+    def key(self, model_name:str, imgsz:int)->str:
+        fingerprint = hashlib.sha1(json.dumps(self.fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+        return f"{fingerprint}:{self.variant(model_name)}:{imgsz}"
+
+    def __load(self)->dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get('fingerprint') != self.fingerprint:
+            print("[INFO]: Hardware changed since batch sizes were tuned, AutoBatch will profile again")
+            return {}
+        return stored.get('entries', {})
+
+    def __save(self, entries:dict):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'fingerprint': self.fingerprint, 'entries': entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, model_name:str, imgsz:int)->Optional[dict]:
+        """ Tuned batch size and throughput of a model variant at imgsz on this hardware, None when not tuned yet """
+        with self.__lock:
+            return self.__load().get(self.key(model_name, imgsz))
+
+    def store(self, model_name:str, imgsz:int, batch_size:int, images_per_second:float=None):
+        with self.__lock:
+            entries = self.__load()
+            entries[self.key(model_name, imgsz)] = {
+                'model': self.variant(model_name),
+                'imgsz': imgsz,
+                'batch_size': batch_size,
+                'images_per_second': images_per_second,
+                'measured_at': datetime.now().isoformat(timespec="seconds")
+            }
+            self.__save(entries)
+
+    def invalidate(self, model_name:str, imgsz:int):
+        """ Forgets a tuned batch size, for instance after it ran out of memory """
+        with self.__lock:
+            entries = self.__load()
+            if entries.pop(self.key(model_name, imgsz), None) is not None:
+                self.__save(entries)
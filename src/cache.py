@@ -0,0 +1,127 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+from typing import Optional
+
+class ImageCache:
+    def __init__(self, root:str="./cache/images", max_bytes:int=20 * 1024**3):
+        """
+        Parameters:
+            root: directory holding the cached images and their index.
+            max_bytes: size cap of the cache, least recently used images are evicted past it.
+
+        Persistent content-addressed store of downloaded task images. Images are kept once per content hash under
+        blobs/ and looked up by their LabelStudio URL, so a gym can be filled with links instead of downloads.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.staging_dir = os.path.join(root, "staging")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False, timeout=30)
+        with self.__lock, self.__db:
+            self.__db.execute("PRAGMA journal_mode=WAL")
+            self.__db.execute("CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)")
+            self.__db.execute("CREATE TABLE IF NOT EXISTS entries (url TEXT PRIMARY KEY, sha256 TEXT NOT NULL)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS entries_sha256 ON entries (sha256)")
+
+    def blob_path(self, sha256:str)->str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    def staging_path(self, url:str)->str:
+        """ Temporary download location on the same filesystem as the blobs """
+        name = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.staging_dir, f"{name}.{threading.get_ident()}")
+
+    def lookup(self, url:str)->Optional[str]:
+        """ Returns the cached image path of url and marks it as recently used, or None on a miss """
+        with self.__lock, self.__db:
+            row = self.__db.execute("SELECT sha256 FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            path = self.blob_path(row[0])
+            if not os.path.exists(path):
+                self.__db.execute("DELETE FROM entries WHERE sha256 = ?", (row[0],))
+                self.__db.execute("DELETE FROM blobs WHERE sha256 = ?", (row[0],))
+                return None
+            self.__db.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), row[0]))
+        return path
+
+    def put(self, url:str, file_path:str)->str:
+        """ Moves a downloaded file into the cache and returns its blob path """
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(file_path)
+        if os.path.exists(path):
+            os.remove(file_path)  # Same content already stored under another URL
+        else:
+            os.replace(file_path, path)
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "INSERT INTO blobs (sha256, size, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET last_access = excluded.last_access",
+                (digest, size, time.time()))
+            self.__db.execute("INSERT OR REPLACE INTO entries (url, sha256) VALUES (?, ?)", (url, digest))
+        return path
+
+    @staticmethod
+    def link(blob_path:str, output_path:str):
+        """ Places a cached image in the gym by hardlink, falling back to a symlink and then a copy """
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(blob_path, output_path)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(blob_path), output_path)
+            except OSError:
+                shutil.copyfile(blob_path, output_path)
+
+    def size(self)->int:
+        with self.__lock:
+            return self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self, keep_since:float=None, max_bytes:int=None)->int:
+        """
+        Parameters:
+            keep_since: images used at or after this timestamp are never evicted.
+            max_bytes: overrides the configured size cap.
+
+        Removes least recently used images until the cache fits its size cap, returning the bytes freed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        freed = 0
+        with self.__lock, self.__db:
+            total = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            victims = self.__db.execute("SELECT sha256, size, last_access FROM blobs ORDER BY last_access").fetchall()
+            for digest, size, last_access in victims:
+                if total - freed <= max_bytes or (keep_since is not None and last_access >= keep_since):
+                    break
+                path = self.blob_path(digest)
+                if os.path.exists(path):
+                    os.remove(path)
+                self.__db.execute("DELETE FROM entries WHERE sha256 = ?", (digest,))
+                self.__db.execute("DELETE FROM blobs WHERE sha256 = ?", (digest,))
+                freed += size
+        if freed:
+            print(f"[INFO]: Evicted {freed / 1e6:.1f} MB from the image cache")
+        return freed
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
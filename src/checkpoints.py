@@ -0,0 +1,111 @@
+import os
+import copy
+import json
+import shutil
+import threading
+from datetime import datetime
+
+from ultralytics import YOLO
+
+from typing import List, Optional
+from artifacts import ArtifactPublisher
+
+class CheckpointRegistry:
+    def __init__(self, root:str="./checkpoints"):
+        """
+        Parameters:
+            root: directory holding the last best weights of every project.
+
+        Keeps each project's last best.pt with the label set and base model it was trained on, so the next cycle
+        fine-tunes from it instead of starting over from the base weights. A checkpoint is only offered when the
+        project's labels and base model are unchanged, otherwise the model head would not match the dataset.
+        """
+        self.root = root
+
+    def __directory(self, project_id:int)->str:
+        return os.path.join(self.root, f"project-{project_id}")
+
+    def __read_meta(self, project_id:int)->Optional[dict]:
+        meta_path = os.path.join(self.__directory(project_id), "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def record(self, project_id:int, weights_path:str, labels:List[str], base_model:str, metrics:dict=None):
+        """ Keeps a copy of a run's best weights, replacing the project's previous checkpoint """
+        directory = self.__directory(project_id)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, "best.pt.tmp")
+        # Linked when possible, the run's best.pt is not written again after training
+        ArtifactPublisher().copy(weights_path, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, "best.pt"))
+
+        meta = {
+            'labels': list(labels),
+            'base_model': base_model,
+            'saved_at': datetime.now().isoformat(timespec="seconds"),
+            'metrics': metrics or {}
+        }
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    def warm_start(self, project_id:int, labels:List[str], base_model:str)->Optional[str]:
+        """ Path of the project's checkpoint when it can be fine-tuned for these labels, None otherwise """
+        meta = self.__read_meta(project_id)
+        weights_path = os.path.join(self.__directory(project_id), "best.pt")
+        if meta is None or not os.path.exists(weights_path):
+            return None
+        if meta['labels'] != list(labels) or meta['base_model'] != base_model:
+            print(f"[INFO]: Labels or base model of project {project_id} changed, training from the base weights")
+            return None
+        return weights_path
+
+    def invalidate(self, project_id:int):
+        shutil.rmtree(self.__directory(project_id), ignore_errors=True)
+
+class ModelCache:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(ModelCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, max_models:int=4):
+        """
+        Parameters:
+            max_models: number of loaded weight files kept in memory.
+
+        In-process cache of loaded YOLO models. Every Trainer gets its own deep copy, since training and callbacks
+        modify the model, but the weights are only read from disk once per file version.
+
+        Only trainings in the same process share it. With TRAINING_EXECUTOR=inline every training runs in the
+        scheduler's process and hits the cache; with the default 'process' executor each training is a freshly
+        spawned worker that starts with an empty cache, so every load reads the weights from disk. There the page
+        cache is what keeps repeated loads cheap.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.max_models = max_models
+        self.__lock = threading.Lock()
+        self.__models = {}
+
+    def load(self, weights_path:str):
+        key = (os.path.abspath(weights_path), os.stat(weights_path).st_mtime_ns)
+        with self.__lock:
+            model = self.__models.pop(key, None)
+            if model is None:
+                model = YOLO(weights_path)
+                # Other versions of the same file are stale
+                for old_key in [old_key for old_key in self.__models if old_key[0] == key[0]]:
+                    del self.__models[old_key]
+            # Most recently used last, the least recently used model is dropped first
+            self.__models[key] = model
+            while len(self.__models) > self.max_models:
+                del self.__models[next(iter(self.__models))]
+            return copy.deepcopy(model)
@@ -0,0 +1,66 @@
+import time
+
+from typing import Callable, Union
+from jobs import JobRunner
+
+class WebhookCoalescer:
+    def __init__(self, on_settled, window_seconds:Union[float, Callable[[], float]], max_wait_seconds:float=None, runner:JobRunner=None):
+        """
+        Parameters:
+            on_settled: coroutine function called with (project_id, merged_events) once a project's events settle.
+            window_seconds: quiet period after the last event of a project before it settles, or a callable returning it.
+            max_wait_seconds: settles a project that keeps receiving events after this long, None waits indefinitely.
+            runner: loop the timers and on_settled run on, the Scheduler shares its own. A private one is made when None.
+
+        Merges LabelStudio webhook events per project behind a trailing-edge debounce timer, so a burst of
+        annotations results in a single call to on_settled. Timers run on a long-lived event loop in a background
+        thread, so webhook handlers only enqueue and return.
+        """
+        self.on_settled = on_settled
+        self.window_seconds = window_seconds
+        self.max_wait_seconds = max_wait_seconds
+
+        self.runner = runner if runner is not None else JobRunner("webhook-coalescer")
+        self.loop = self.runner.loop
+
+        # Only touched from the loop's thread
+        self.__pending = {}
+        self.__timers = {}
+
+    def __window(self)->float:
+        return self.window_seconds() if callable(self.window_seconds) else self.window_seconds
+
+    def submit(self, project_id:int, event:dict):
+        """ Thread-safe, records an event and restarts the project's debounce timer """
+        self.loop.call_soon_threadsafe(self.__merge, project_id, event, time.monotonic())
+
+    def __merge(self, project_id, event, received_at):
+        pending = self.__pending.setdefault(project_id, {'events': 0, 'actions': set(), 'first_at': received_at})
+        pending['events'] += 1
+        if event.get('action'):
+            pending['actions'].add(event['action'])
+        pending['last_event'] = event
+        pending['last_at'] = received_at
+
+        timer = self.__timers.pop(project_id, None)
+        if timer is not None:
+            timer.cancel()
+        delay = self.__window()
+        if self.max_wait_seconds is not None:
+            delay = min(delay, max(0, pending['first_at'] + self.max_wait_seconds - received_at))
+        self.__timers[project_id] = self.loop.call_later(delay, self.__settle, project_id)
+
+    def __settle(self, project_id):
+        self.__timers.pop(project_id, None)
+        merged = self.__pending.pop(project_id, None)
+        if merged is None:
+            return
+        self.run_in_loop(self.on_settled(project_id, merged))
+
+    def run_in_loop(self, coroutine):
+        """ Starts a coroutine on the coalescer's loop, must be called from that loop """
+        return self.runner.spawn(coroutine)
+
+    def is_pending(self, project_id:int)->bool:
+        """ True while a project's events are still waiting for their debounce timer """
+        return project_id in self.__pending
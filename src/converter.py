@@ -0,0 +1,123 @@
+import numpy as np
+
+from typing import Iterable, List, Tuple
+
+class YoloConverter:
+    MODES = ('detect', 'segment', 'pose')
+
+    def __init__(self, labels:List[str], mode:str='detect', keypoint_labels:List[str]=None):
+        """
+        Parameters:
+            labels: class names in the order of their YOLO ids.
+            mode: 'detect' writes boxes, 'segment' writes polygons and 'pose' writes boxes followed by their keypoints.
+            keypoint_labels: keypoint names in the order of the pose keypoints, only used in 'pose' mode.
+
+        Converts LabelStudio annotation results (rectanglelabels, polygonlabels and keypointlabels) to YOLO label files.
+        Label names are resolved through a precomputed map and boxes of a whole batch are computed as one NumPy array.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}")
+        self.labels = list(labels)
+        self.label_ids = {name: i for i, name in enumerate(self.labels)}
+        self.mode = mode
+        self.keypoint_labels = list(keypoint_labels or [])
+        self.keypoint_ids = {name: i for i, name in enumerate(self.keypoint_labels)}
+        self.skipped = 0
+
+    def __class_id(self, names):
+        if not names or names[0] not in self.label_ids:
+            self.skipped += 1
+            return None
+        return self.label_ids[names[0]]
+
+    @staticmethod
+    def __format_blocks(table:np.ndarray, owners:np.ndarray, count:int)->List[str]:
+        """ Formats the rows of each result with a single % operation, rows of a result are contiguous """
+        row_format = "%d" + " %.6f" * (table.shape[1] - 1) + "\n"
+        values = table.ravel().tolist()
+        width = table.shape[1]
+        blocks = [""] * count
+        ends = np.cumsum(np.bincount(owners, minlength=count))
+        start = 0
+        for owner, end in enumerate(ends.tolist()):
+            if end > start:
+                blocks[owner] = (row_format * (end - start)) % tuple(values[start * width:end * width])
+            start = end
+        return blocks
+
+    def __polygon_line(self, class_id, points)->str:
+        coords = np.clip(np.asarray(points, dtype=np.float64).reshape(-1) / 100, 0, 1)
+        return f"{class_id} " + " ".join(f"{v:.6f}" for v in coords) + "\n"
+
+    def convert_many(self, results:Iterable[list])->List[str]:
+        """ Converts several annotation results at once, returning the content of each label file """
+        boxes = []          # (result index, class id, x, y, width, height) in LabelStudio percentages
+        keypoints = {}      # (result index, rectangle region id) -> [(keypoint id, x, y)]
+        box_regions = []    # (result index, region id) of each row of boxes
+        extra_lines = []    # (result index, line) for polygons
+        count = 0
+
+        for index, result in enumerate(results):
+            count += 1
+            for obj in result:
+                value = obj.get('value', {})
+                if "rectanglelabels" in value:
+                    class_id = self.__class_id(value["rectanglelabels"])
+                    if class_id is None:
+                        continue
+                    boxes.append((index, class_id, value["x"], value["y"], value["width"], value["height"]))
+                    box_regions.append((index, obj.get('id')))
+                elif "polygonlabels" in value:
+                    class_id = self.__class_id(value["polygonlabels"])
+                    if class_id is None or not value.get("points"):
+                        continue
+                    points = np.asarray(value["points"], dtype=np.float64)
+                    if self.mode == 'segment':
+                        extra_lines.append((index, self.__polygon_line(class_id, points)))
+                    else:
+                        x0, y0 = points.min(axis=0)
+                        x1, y1 = points.max(axis=0)
+                        boxes.append((index, class_id, x0, y0, x1 - x0, y1 - y0))
+                        box_regions.append((index, obj.get('id')))
+                elif "keypointlabels" in value and self.mode == 'pose':
+                    names = value["keypointlabels"]
+                    if obj.get('parentID') is None or not names or names[0] not in self.keypoint_ids:
+                        continue
+                    keypoints.setdefault((index, obj['parentID']), []).append((self.keypoint_ids[names[0]], value["x"], value["y"]))
+
+        if boxes:
+            rows = np.asarray(boxes, dtype=np.float64)
+            owners = rows[:, 0].astype(np.int64)
+            x, y, w, h = rows[:, 2], rows[:, 3], rows[:, 4], rows[:, 5]
+
+            if self.mode == 'segment':
+                # Boxes become 4 corner polygons so segment datasets are not mixed with box rows
+                x0, y0, x1, y1 = x / 100, y / 100, (x + w) / 100, (y + h) / 100
+                table = np.column_stack((rows[:, 1], x0, y0, x1, y0, x1, y1, x0, y1))
+                table[:, 1:] = np.clip(table[:, 1:], 0, 1)
+            else:
+                table = np.column_stack((rows[:, 1], (x + w / 2) / 100, (y + h / 2) / 100, w / 100, h / 100))
+                if self.mode == 'pose':
+                    kpts = np.zeros((len(rows), len(self.keypoint_labels), 3))
+                    for row, region in enumerate(box_regions):
+                        for kpt_id, kx, ky in keypoints.get(region, []):
+                            kpts[row, kpt_id] = (kx / 100, ky / 100, 2)
+                    table = np.column_stack((table, kpts.reshape(len(rows), -1)))
+            contents = self.__format_blocks(table, owners, count)
+        else:
+            contents = [""] * count
+
+        for owner, line in extra_lines:
+            contents[owner] += line
+        return contents
+
+    def convert(self, result:list)->str:
+        return self.convert_many([result])[0]
+
+    def write_many(self, pairs:Iterable[Tuple[str, list]]):
+        """ Writes (label_path, result) pairs in one batch """
+        pairs = list(pairs)
+        contents = self.convert_many(result for _, result in pairs)
+        for (label_path, _), content in zip(pairs, contents):
+            with open(label_path, "w") as f:
+                f.write(content)
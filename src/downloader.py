@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+import requests
+from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+from typing import Callable, List, Optional, Tuple
+from cache import ImageCache
+
+class DatasetDownloader:
+    def __init__(self, api_key:str, workers:int=8, retries:int=3, backoff:float=0.5, timeout:float=30, cache:ImageCache=None):
+        """
+        Parameters:
+            api_key: LabelStudio token sent with every request.
+            workers: number of downloads allowed in flight at once.
+            retries: attempts made after the first failure of a single file.
+            backoff: base delay (seconds) of the exponential backoff between retries.
+            timeout: socket timeout (seconds) for each request.
+            cache: persistent image cache, hits are linked into place and misses are stored in it.
+
+        Downloads task images through one pooled keep-alive session. Completed files are recorded in a
+        manifest so an interrupted sync can resume where it stopped instead of starting from zero.
+        """
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Token {api_key}"})
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.__manifest_lock = threading.Lock()
+
+    def __load_manifest(self, manifest_path):
+        # Each line is "<url>\t<path>\t<size>"; later lines win
+        completed = {}
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3:
+                        completed[parts[0]] = (parts[1], int(parts[2]))
+        return completed
+
+    def __record(self, manifest_path, url, path, size):
+        if not manifest_path:
+            return
+        with self.__manifest_lock:
+            with open(manifest_path, "a") as f:
+                f.write(f"{url}\t{path}\t{size}\n")
+
+    def __resume(self, url, output_path, completed)->Optional[int]:
+        """ Returns the size of an already downloaded file for url, moving it to output_path if needed """
+        if url not in completed:
+            return None
+        previous_path, size = completed[url]
+        if not os.path.exists(previous_path) or os.path.getsize(previous_path) != size:
+            return None
+        if previous_path != output_path:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            os.replace(previous_path, output_path)
+        return size
+
+    def download_file(self, url, output_path)->int:
+        """ Downloads url to output_path with retries, returning the number of bytes written """
+        part_path = output_path + ".part"
+        for attempt in range(self.retries + 1):
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    size = 0
+                    with open(part_path, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=1 << 16):
+                            f.write(chunk)
+                            size += len(chunk)
+                os.replace(part_path, output_path)
+                return size
+            except (requests.RequestException, OSError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                # Client errors other than rate limiting will not fix themselves
+                if status is not None and 400 <= status < 500 and status != 429:
+                    raise
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    def download_all(self, jobs:List[Tuple[str, str]], manifest_path:str=None, should_stop:Callable[[], bool]=None)->dict:
+        """
+        Parameters:
+            jobs: (url, output_path) pairs to download. With a cache, output_path may be None to only make sure the
+                image is cached.
+            manifest_path: file used to remember completed downloads; enables resuming.
+            should_stop: polled between downloads, pending downloads are dropped once it returns True.
+
+        Returns a report with the number of downloaded, resumed, cached and failed files and the throughput.
+        """
+        completed = self.__load_manifest(manifest_path)
+        report = {"downloaded": 0, "resumed": 0, "cached": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+        start = time.monotonic()
+
+        pending = []
+        for url, output_path in jobs:
+            if output_path is not None and self.__resume(url, output_path, completed) is not None:
+                report["resumed"] += 1
+                continue
+            cached = self.cache.lookup(url) if self.cache is not None else None
+            if cached is not None:
+                if output_path is not None:
+                    self.cache.link(cached, output_path)
+                report["cached"] += 1
+            else:
+                pending.append((url, output_path))
+
+        def work(url, output_path):
+            if should_stop and should_stop():
+                return None
+            if self.cache is not None:
+                staging_path = self.cache.staging_path(url)
+                size = self.download_file(url, staging_path)
+                blob_path = self.cache.put(url, staging_path)
+                if output_path is None:
+                    return size
+                self.cache.link(blob_path, output_path)
+            else:
+                size = self.download_file(url, output_path)
+            self.__record(manifest_path, url, output_path, size)
+            return size
+
+        with tqdm(total=len(pending), unit="img") as progress:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(work, url, path): url for url, path in pending}
+                for future in as_completed(futures):
+                    try:
+                        size = future.result()
+                        if size is not None:
+                            report["downloaded"] += 1
+                            report["bytes"] += size
+                    except Exception as e:
+                        report["failed"] += 1
+                        print(f"Failed to download {futures[future]}: {e}")
+                    progress.update(1)
+                    elapsed = max(time.monotonic() - start, 1e-9)
+                    progress.set_postfix(MBps=f"{report['bytes'] / elapsed / 1e6:.2f}")
+
+        report["seconds"] = time.monotonic() - start
+        elapsed = max(report["seconds"], 1e-9)
+        print(
+            f"[INFO]: Downloaded {report['downloaded']} images ({report['bytes'] / 1e6:.1f} MB) in {report['seconds']:.1f}s "
+            f"({report['downloaded'] / elapsed:.1f} img/s, {report['bytes'] / elapsed / 1e6:.2f} MB/s), "
+            f"resumed {report['resumed']}, from cache {report['cached']}, failed {report['failed']}"
+        )
+        return report
+
+    def close(self):
+        self.session.close()
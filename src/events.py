@@ -0,0 +1,161 @@
+import json
+import queue
+import asyncio
+import threading
+from collections import deque
+
+from typing import AsyncIterator, Iterator, Optional
+
+# Put in the buffer of a client that fell behind, ends its stream so the browser reconnects and catches up
+DROPPED = object()
+
+class AsyncSubscriber(queue.Queue):
+    def __init__(self, maxsize:int, loop:asyncio.AbstractEventLoop):
+        """
+        Parameters:
+            maxsize: events buffered before the client is dropped.
+            loop: event loop the client's stream runs on.
+
+        Buffer of a client streamed from an event loop. Publishers keep calling put_nowait from any thread, the
+        stream is woken through the loop instead of parking a thread per client in a blocking get.
+        """
+        super().__init__(maxsize=maxsize)
+        self.__loop = loop
+        self.__ready = asyncio.Event()
+
+    def put_nowait(self, item):
+        super().put_nowait(item)
+        try:
+            self.__loop.call_soon_threadsafe(self.__ready.set)
+        except RuntimeError:
+            # The loop closed, the client is gone and unsubscribes when its stream is finalized
+            pass
+
+    async def get_async(self, timeout:float):
+        """ Waits at most timeout seconds for an event, raising queue.Empty like get """
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            self.__ready.clear()
+            # An event put between the check and the clear would otherwise wait for the next one
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                await asyncio.wait_for(self.__ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise queue.Empty
+
+class EventBus:
+    def __init__(self, history:int=256, subscriber_buffer:int=1024):
+        """
+        Parameters:
+            history: number of recent events kept so reconnecting clients can catch up from their Last-Event-ID.
+            subscriber_buffer: events buffered per client before a client that stopped reading is dropped.
+
+        Publishes scheduler state changes (queued, training, epoch, saved, failed, ...) to every connected client
+        as Server-Sent Events, so dashboards receive deltas instead of polling the full state.
+        """
+        self.__lock = threading.Lock()
+        self.__subscribers = set()
+        self.__history = deque(maxlen=history)
+        self.__next_id = 1
+        self.subscriber_buffer = subscriber_buffer
+
+    def publish(self, event:str, data:dict):
+        """ Thread-safe, delivers an event to every subscriber """
+        with self.__lock:
+            message = {'id': self.__next_id, 'event': event, 'data': data}
+            self.__next_id += 1
+            self.__history.append(message)
+            subscribers = list(self.__subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self.__drop(subscriber)
+
+    def __drop(self, subscriber:queue.Queue):
+        """ Disconnects a client that stopped reading, its buffered events are replayed from history when it reconnects """
+        self.unsubscribe(subscriber)
+        while True:
+            try:
+                subscriber.put_nowait(DROPPED)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def subscribe(self, last_event_id:Optional[int]=None, subscriber:queue.Queue=None)->queue.Queue:
+        if subscriber is None:
+            subscriber = queue.Queue(maxsize=self.subscriber_buffer)
+        with self.__lock:
+            if last_event_id is not None:
+                for message in self.__history:
+                    if message['id'] > last_event_id:
+                        subscriber.put_nowait(message)
+            self.__subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber:queue.Queue):
+        with self.__lock:
+            self.__subscribers.discard(subscriber)
+
+    @staticmethod
+    def __render(message:dict, project_id:Optional[int])->Optional[str]:
+        """ text/event-stream frame of an event, None when the client filters it out """
+        message_project = message['data'].get('project_id')
+        if project_id is not None and message_project is not None and message_project != project_id:
+            return None
+        return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message['data'], default=str)}\n\n"
+
+    def stream(self, last_event_id:Optional[int]=None, project_id:Optional[int]=None, heartbeat:float=15)->Iterator[str]:
+        """
+        Parameters:
+            last_event_id: id of the last event the client received, missed events are replayed.
+            project_id: only send events about this project (and events about no project in particular).
+            heartbeat: seconds between keep-alive comments on an idle stream.
+
+        Yields the text/event-stream body of one client.
+        """
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is DROPPED:
+                    # EventSource reconnects after the retry delay, sending the id of the last event it received
+                    return
+                frame = self.__render(message, project_id)
+                if frame is not None:
+                    yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def stream_async(self, last_event_id:Optional[int]=None, project_id:Optional[int]=None, heartbeat:float=15)->AsyncIterator[str]:
+        """ Same body as stream, for servers with an event loop, an idle client holds no thread """
+        subscriber = self.subscribe(last_event_id, AsyncSubscriber(self.subscriber_buffer, asyncio.get_running_loop()))
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await subscriber.get_async(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is DROPPED:
+                    return
+                frame = self.__render(message, project_id)
+                if frame is not None:
+                    yield frame
+        finally:
+            self.unsubscribe(subscriber)
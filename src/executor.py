@@ -0,0 +1,151 @@
+import os
+import queue
+import asyncio
+import threading
+import traceback
+import multiprocessing
+
+from service import Service
+
+TERMINAL_EVENTS = ('finished', 'cancelled', 'failed')
+
+def run_trainer_process(project_id:int, messages, cancel_event, service_settings:dict, threads:int=None, project_details:dict=None):
+    """
+    Entry point of a training worker process. The LabelStudio clients and the YOLO model are rebuilt here since
+    they cannot be sent to another process, everything else travels back over the messages queue. project_details
+    are the title and labels from the Scheduler's metadata cache, so the worker does not fetch them again.
+    """
+    if threads:
+        # Must be set before torch is imported to size its thread pools
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    import torch
+    from label_studio_sdk.client import LabelStudio
+    from label_studio_sdk import Client
+    from trainer import Trainer
+
+    service = Service()
+    service.__dict__.update(service_settings)
+
+    def send(event, **data):
+        messages.put({'event': event, 'project_id': project_id, **data})
+
+    trainer = None
+    try:
+        ls = LabelStudio(base_url=service.label_studio_url, api_key=service.label_studio_api_key)
+        ls_client = Client(url=service.label_studio_url, api_key=service.label_studio_api_key)
+        trainer = Trainer(project_id, ls, ls_client, service)
+        trainer.project_details = project_details
+        trainer.on_event = send
+        if threads:
+            torch.set_num_threads(threads)
+            trainer.threads = threads
+
+        def watch_for_cancellation():
+            cancel_event.wait()
+            trainer.will_cancel = True
+        threading.Thread(target=watch_for_cancellation, daemon=True).start()
+
+        async def callback(id, train_output):
+            send('finished', state=trainer.export_state())
+
+        try:
+            asyncio.run(trainer.train(callback=callback))
+        except asyncio.CancelledError:
+            send('cancelled', state=trainer.export_state())
+    except BaseException as e:
+        traceback.print_exc()
+        send('failed', error=f"{type(e).__name__}: {e}", state=trainer.export_state() if trainer else {})
+
+class TrainingExecutor:
+    def __init__(self, service:Service):
+        """
+        Parameters:
+            service: shared service configuration, TRAINING_EXECUTOR picks 'process' (default) or 'inline'.
+
+        Runs each Trainer in its own worker process so model.train never blocks the Scheduler's event loop.
+        Progress, results and cancellation travel between the scheduler and the worker over IPC.
+        """
+        self.service = service
+        self.__context = multiprocessing.get_context("spawn")
+        self.__cancel_events = {}
+
+    def cancel(self, project_id:int):
+        if project_id in self.__cancel_events:
+            self.__cancel_events[project_id].set()
+
+    def is_running(self, project_id:int)->bool:
+        return project_id in self.__cancel_events
+
+    @staticmethod
+    def __next_message(messages, process):
+        """ Blocks until the worker sends something, reporting a failure if it dies without a final message """
+        while True:
+            try:
+                return messages.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():
+                    try:
+                        return messages.get_nowait()
+                    except queue.Empty:
+                        return {'event': 'failed', 'error': f"Training process exited with code {process.exitcode}", 'state': {}}
+
+    async def train(self, trainer, callback=None, on_message=None):
+        """
+        Parameters:
+            trainer: the scheduler's Trainer for the project, updated with the worker's results.
+            callback: awaited with (project_id, return_dict) once training ends without being cancelled.
+            on_message: called with every progress message of the worker.
+
+        Same contract as Trainer.train: raises asyncio.CancelledError when the training is cancelled.
+        """
+        if self.service.training_executor == 'inline':
+            if on_message:
+                trainer.on_event = lambda event, **data: on_message({'event': event, 'project_id': trainer.project_id, **data})
+            # model.train blocks, it runs on a thread so the scheduler's loop keeps serving meanwhile
+            loop = asyncio.get_running_loop()
+            async def on_done(project_id, return_dict):
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(callback(project_id, return_dict), loop))
+            await loop.run_in_executor(None, lambda: asyncio.run(trainer.train(callback=on_done if callback else None)))
+            return
+
+        if trainer.will_cancel:
+            raise asyncio.CancelledError
+
+        loop = asyncio.get_running_loop()
+        # Resolved from the Scheduler's cache, which PROJECT_UPDATED webhooks keep current, a miss is fetched off the loop
+        project_details = await loop.run_in_executor(None, trainer.record_project_details)
+        messages = self.__context.Queue()
+        cancel_event = self.__context.Event()
+        settings = {key: value for key, value in vars(self.service).items() if not key.startswith('_')}
+        process = self.__context.Process(
+            target=run_trainer_process,
+            args=(trainer.project_id, messages, cancel_event, settings, trainer.threads, project_details),
+            name=f"trainer-{trainer.project_id}")
+
+        self.__cancel_events[trainer.project_id] = cancel_event
+        if trainer.will_cancel:
+            cancel_event.set()
+        trainer.is_active = True
+        try:
+            process.start()
+            while True:
+                message = await loop.run_in_executor(None, self.__next_message, messages, process)
+                if message['event'] in TERMINAL_EVENTS:
+                    break
+                if message['event'] != 'span':
+                    trainer.progress = message
+                if on_message:
+                    on_message(message)
+            await loop.run_in_executor(None, process.join)
+        finally:
+            self.__cancel_events.pop(trainer.project_id, None)
+
+        trainer.import_state(message.get('state', {}))
+        if message['event'] == 'failed':
+            print(f"[ERROR]: Training process for project {trainer.project_id} failed: {message['error']}")
+        if message['event'] == 'cancelled':
+            raise asyncio.CancelledError
+        if callback and callable(callback):
+            await callback(trainer.project_id, trainer.return_dict)
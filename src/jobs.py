@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import traceback
+import concurrent.futures
+
+from typing import Callable, Coroutine
+
+class JobRunner:
+    def __init__(self, name:str="scheduler"):
+        """
+        Parameters:
+            name: name of the thread running the loop.
+
+        One long-lived event loop in a background thread that owns the Scheduler's state and background jobs.
+        Web handlers, whatever server runs them, hand work to the loop and return, so trainings and debounce
+        timers never belong to the request that started them.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__run_forever, name=name, daemon=True)
+        self.__thread.start()
+
+        # Only touched from the loop's thread
+        self.__tasks = set()
+
+    def __run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop(self)->bool:
+        return threading.current_thread() is self.__thread
+
+    def spawn(self, coroutine:Coroutine)->asyncio.Task:
+        """ Starts a background job on the loop, must be called from the loop's thread """
+        task = self.loop.create_task(coroutine)
+        self.__tasks.add(task)
+        def done(task):
+            self.__tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                traceback.print_exception(task.exception())
+        task.add_done_callback(done)
+        return task
+
+    def submit(self, coroutine:Coroutine)->concurrent.futures.Future:
+        """ Thread-safe, runs a coroutine on the loop and returns a future of its result """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call(self, function:Callable, *args)->concurrent.futures.Future:
+        """ Thread-safe, runs a function on the loop and returns a future of its result """
+        future = concurrent.futures.Future()
+        def run():
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                traceback.print_exc()
+                future.set_exception(e)
+        self.loop.call_soon_threadsafe(run)
+        return future
+
+    def running(self)->int:
+        """ Number of background jobs that have not finished """
+        return len(self.__tasks)
+
+    def stop(self, timeout:float=5):
+        """ Cancels the background jobs and stops the loop """
+        async def cancel_all():
+            tasks = list(self.__tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            self.submit(cancel_all()).result(timeout=timeout)
+        except Exception as e:
+            print(f"[INFO]: Background jobs did not stop in time: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join(timeout=timeout)
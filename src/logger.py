@@ -4,19 +4,37 @@ import torch
 
 from datetime import datetime
 
+from service import Service
+from trainingLog import TrainingLog
+
 class Logger:
     def __init__(self):
-        pass
-
-    def __write_to_log_file(self, log_file, log_entry):
-        log_file_exists = os.path.exists(log_file)
-        with open(log_file, "r+" if log_file_exists else "w") as f:
-            if log_file_exists:
-                old_content = f.read()
-                f.seek(0)                                                               
-            f.write(log_entry + "\n")
-            if log_file_exists:
-                f.write(old_content)
+        service = Service()
+        self.training_log = TrainingLog(os.path.join(os.getcwd(), "logs"), int(service.log_max_mb * 1024**2))
+
+    def __session(self, trainer, outcome):
+        """ Fields shared by every entry of a training session """
+        return {
+            'time': datetime.now().isoformat(timespec="seconds"),
+            'outcome': outcome,
+            'project_id': trainer.project_id,
+            'project_name': trainer.title,
+            'data_count_map': trainer.data_count_map,
+            'labels': trainer.labels,
+            'model': trainer.model_name,
+            'warm_start': trainer.warm_start_path is not None,
+            'epochs': trainer.return_dict["epochs"],
+            'batch_size': trainer.tuning['batch_size'],
+            'image_size': trainer.tuning['image_size'],
+            'images_per_second': trainer.tuning['images_per_second'],
+            'batch_tuned': trainer.tuning['cached'],
+            'device': "cuda" if torch.cuda.is_available() else "cpu"
+        }
+
+    def __write(self, entry, trainer):
+        entry_id = self.training_log.append(entry)
+        trainer.return_dict["latest_report"] = self.render(entry)
+        return entry_id
 
     def log_training_error(self, error, trainer):
 
@@ -30,139 +48,120 @@ class Logger:
             }
             return suggestions.get(error_type, "Check the stack trace for more details.")
 
-        log_file = os.path.join(os.getcwd(), "logs",f"{datetime.now().strftime('%Y-%m-%d')}.txt")
-    
+        entry = self.__session(trainer, 'error')
         error_type = type(error).__name__
-        error_message = str(error)
-        stack_trace = traceback.format_exc()
-        
-        log_entry = f"""
-=======================================
-🚨 Training Error - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-=======================================
-🔹 **Project Name**: {trainer.project.title}
-🔹 **Project ID**: {trainer.project_id}
-🔹 **Total Data Points**: {trainer.data_count_map['total']}
-🔹 **Training Samples**: {trainer.data_count_map['train']}
-🔹 **Validation Samples**: {trainer.data_count_map['val']}
-🔹 **Test Samples**: {trainer.data_count_map['test']}
-🔹 **Number of Classes**: {len(trainer.labels)}
-🔹 **Classes**: {trainer.labels}
-
-📌 **Training Configuration**
-- **Model**: {trainer.model.model_name}
-- **Epochs Attempted**: {500}
-- **Batch Size**: {-1}
-- **Image Size**: {640}
-- **Device**: {"cuda" if torch.cuda.is_available() else "cpu"}
-
-❌ **Error Details**
-- **Error Type**: {error_type}
-- **Error Message**: {error_message}
-- **Stack Trace**:
-{stack_trace}
+        entry['error'] = {
+            'type': error_type,
+            'message': str(error),
+            'stack_trace': traceback.format_exc(),
+            'recovery': suggest_recovery(error_type)
+        }
 
-🔄 **Recovery Actions Taken**
-- {suggest_recovery(error_type)}
+        entry_id = self.__write(entry, trainer)
+        print(f"Logged error to {entry_id}")
 
----------------------------------------------------
-    """
-
-        # Write to log file
-        self.__write_to_log_file(log_file, log_entry)
-        
-        trainer.return_dict["latest_report"] = log_entry
-        print(f"Logged error to {log_file}")
-    
     def log_training_success(self,results, trainer, footer=""):
-        log_file = os.path.join(os.getcwd(),"logs",f"{datetime.now().strftime('%Y-%m-%d')}.txt")
-    
+        entry = self.__session(trainer, 'success')
+
         # Extract YOLO training results
-        precision = results.results_dict.get("metrics/precision(B)", "N/A")
-        recall = results.results_dict.get("metrics/recall(B)", "N/A")
-        map50 = results.results_dict.get("metrics/mAP50(B)", "N/A")
-        map50_95 = results.results_dict.get("metrics/mAP50-95(B)", "N/A")
-        
+        entry['metrics'] = {
+            'precision': results.results_dict.get("metrics/precision(B)", "N/A"),
+            'recall': results.results_dict.get("metrics/recall(B)", "N/A"),
+            'map50': results.results_dict.get("metrics/mAP50(B)", "N/A"),
+            'map50_95': results.results_dict.get("metrics/mAP50-95(B)", "N/A")
+        }
+
         # Class-wise accuracy
+        entry['class_maps'] = {class_name: float(results.maps[i]) for i, class_name in enumerate(trainer.labels)}
         trainer.return_dict["class_acc_string"] = ",".join(
-            [f"{class_name}:{results.maps[i]}" 
-            for i, class_name in enumerate(trainer.labels)]
-        )
-        class_wise_metrics = "\n".join(
-            [f"- {class_name}: {results.maps[i]}" 
+            [f"{class_name}:{results.maps[i]}"
             for i, class_name in enumerate(trainer.labels)]
         )
+        entry['footer'] = footer
 
-        # Create log entry
-        log_entry = f"""
+        entry_id = self.__write(entry, trainer)
+        print(f"Logged training session to {entry_id}")
+
+    def log_training_cancellation(self, trainer):
+        entry = self.__session(trainer, 'cancelled')
+        entry['cancellation'] = {
+            'cancelled_by': "User Request",
+            'reason': "Manual interruption"
+        }
+
+        entry_id = self.__write(entry, trainer)
+        print(f"Logged cancellation to {entry_id}")
+
+    @staticmethod
+    def render(entry:dict)->str:
+        """ Human-readable report of a structured log entry """
+        time = datetime.fromisoformat(entry['time']).strftime('%Y-%m-%d %H:%M:%S')
+        counts = entry['data_count_map']
+        header = {
+            'error': f"🚨 Training Error - {time}",
+            'success': f"Training Session - {time}",
+            'cancelled': f" ⚠️ Training Cancelled - {time}"
+        }[entry['outcome']]
+
+        report = f"""
 =======================================
-Training Session - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{header}
 =======================================
-🔹 **Project Name**: {trainer.project.title}
-🔹 **Project ID**: {trainer.project_id}
-🔹 **Total Data Points**: {trainer.data_count_map['total']}
-🔹 **Training Samples**: {trainer.data_count_map['train']}
-🔹 **Validation Samples**: {trainer.data_count_map['val']}
-🔹 **Test Samples**: {trainer.data_count_map['test']}
-🔹 **Number of Classes**: {len(trainer.labels)}
-🔹 **Classes**: {trainer.labels}
+🔹 **Project Name**: {entry['project_name']}
+🔹 **Project ID**: {entry['project_id']}
+🔹 **Total Data Points**: {counts['total']}
+🔹 **Training Samples**: {counts['train']}
+🔹 **Validation Samples**: {counts['val']}
+🔹 **Test Samples**: {counts['test']}
+🔹 **Number of Classes**: {len(entry['labels'])}
+🔹 **Classes**: {entry['labels']}
 
 📌 **Training Configuration**
-- **Model**: {trainer.model.model_name}
-- **Epochs Attempted**: {trainer.return_dict["epochs"]}
-- **Batch Size**: {-1}
-- **Image Size**: {640}
-- **Device**: {"cuda" if torch.cuda.is_available() else "cpu"}
+- **Model**: {entry['model']}{" (warm start)" if entry.get('warm_start') else ""}
+- **Epochs Attempted**: {entry['epochs']}
+- **Batch Size**: {entry['batch_size']}{" (tuned earlier)" if entry.get('batch_tuned') else " (AutoBatch)" if entry['batch_size'] != -1 else ""}
+- **Image Size**: {entry['image_size']}
+- **Throughput**: {f"{entry['images_per_second']:.1f} images/s" if entry.get('images_per_second') else "N/A"}
+- **Device**: {entry['device']}
+"""
 
+        if entry['outcome'] == 'error':
+            error = entry['error']
+            report += f"""
+❌ **Error Details**
+- **Error Type**: {error['type']}
+- **Error Message**: {error['message']}
+- **Stack Trace**:
+{error['stack_trace']}
+
+🔄 **Recovery Actions Taken**
+- {error['recovery']}
+
+---------------------------------------------------
+"""
+        elif entry['outcome'] == 'success':
+            metrics = entry['metrics']
+            class_wise_metrics = "\n".join([f"- {class_name}: {value}" for class_name, value in entry['class_maps'].items()])
+            report += f"""
 📊 **Training Metrics**
-- **Final Training Precision**: {precision}
-- **Final Training Recall**: {recall}
-- **Best mAP@50**: {map50}
-- **Best mAP@50-95**: {map50_95}
+- **Final Training Precision**: {metrics['precision']}
+- **Final Training Recall**: {metrics['recall']}
+- **Best mAP@50**: {metrics['map50']}
+- **Best mAP@50-95**: {metrics['map50_95']}
 
 📈 **Class-wise Performance**
 {class_wise_metrics}
 
 ✅ **Training Completed Successfully**
-{footer}
+{entry['footer']}
 ---------------------------------------------------
 """
-        
-        # Write to log file
-        self.__write_to_log_file(log_file, log_entry)
-        
-        trainer.return_dict["latest_report"] = log_entry
-        print(f"Logged training session to {log_file}")
-    
-    def log_training_cancellation(self, trainer):
-        log_file = os.path.join(os.getcwd(), "logs",f"{datetime.now().strftime('%Y-%m-%d')}.txt")
-        time_cancelled = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_entry = f"""
-=======================================
- ⚠️ Training Cancelled - {time_cancelled}
-=======================================
-🔹 **Project Name**: {trainer.project.title}
-🔹 **Project ID**: {trainer.project_id}
-🔹 **Total Data Points**: {trainer.data_count_map['total']}
-🔹 **Training Samples**: {trainer.data_count_map['train']}
-🔹 **Validation Samples**: {trainer.data_count_map['val']}
-🔹 **Test Samples**: {trainer.data_count_map['test']}
-🔹 **Number of Classes**: {len(trainer.labels)}
-🔹 **Classes**: {trainer.labels}
-
-📌 **Training Configuration**  
-- **Model**: {trainer.model.model_name}
-- **Epochs Attempted**: {500}
-- **Batch Size**: {-1}
-- **Image Size**: {640}
-- **Device**: {"cuda" if torch.cuda.is_available() else "cpu"}
-
-⚠️ **Cancellation Details**  
-- **Cancelled By**: User Request  
-- **Timestamp**: {time_cancelled}  
-- **Reason**: Manual interruption
+        else:
+            cancellation = entry['cancellation']
+            report += f"""
+⚠️ **Cancellation Details**
+- **Cancelled By**: {cancellation['cancelled_by']}
+- **Timestamp**: {time}
+- **Reason**: {cancellation['reason']}
 """
-        # Write to log file
-        self.__write_to_log_file(log_file, log_entry)
-        trainer.return_dict["latest_report"] = log_entry
-        print(f"Logged cancellation to {log_file}")
\ No newline at end of file
+        return report
@@ -1,21 +1,21 @@
 import os
-import pandas as pd
+
+from metricsStore import MetricsStore
 
 class MemoryHandler:
     def __init__(self):
-        pass
+        self.metrics = MetricsStore('./memory')
 
     def commit_results_to_memory(self, project_id, metrics_path):
+        # Every run is kept, new epochs are appended to the project's metrics store
         results = os.path.join(metrics_path, 'results.csv')
-        memory_path = f'./memory/project-{project_id}'
-        os.makedirs(memory_path, exist_ok=True)
-        result_save_path = os.path.join(memory_path, 'results.csv')
-        df = pd.read_csv(results)  # Load existing results
-        df.to_csv(result_save_path, index=False)
-    
+        self.metrics.append_run(project_id, results, source=str(metrics_path))
+
     def pull_latest_results_for(self, project_id)->list:
-        if os.path.exists(f'./memory/project-{project_id}/results.csv'):
-            df = pd.read_csv(f'./memory/project-{project_id}/results.csv')
-            return df.to_dict(orient="records")
-        else:
-            return []
+        return self.metrics.query(project_id)
+
+    def query_results_for(self, project_id, run="latest", start=None, end=None, columns=None, max_points=None)->list:
+        return self.metrics.query(project_id, run=run, start=start, end=end, columns=columns, max_points=max_points)
+
+    def runs_for(self, project_id)->list:
+        return self.metrics.runs(project_id)
@@ -0,0 +1,43 @@
+import time
+import threading
+from collections import deque
+
+from typing import List
+
+class MetricsBus:
+    def __init__(self, capacity:int=4096):
+        """
+        Parameters:
+            capacity: samples kept per project and kind, the oldest are dropped past it.
+
+        In-memory ring buffer of the live metrics of running trainings, fed by the Trainer's Ultralytics callbacks.
+        Every sample gets an increasing sequence number so clients only fetch what they have not seen yet. Batch and
+        epoch samples have separate buffers so frequent batch samples never push out the epochs of a long run.
+        """
+        self.capacity = capacity
+        self.__lock = threading.Lock()
+        self.__buffers = {}
+        self.__next_seq = 1
+
+    def publish(self, project_id:int, kind:str, **data)->dict:
+        """ Thread-safe, records a 'batch' or 'epoch' sample of a project """
+        with self.__lock:
+            sample = {'seq': self.__next_seq, 'time': time.time(), 'kind': kind, **data}
+            self.__next_seq += 1
+            buffers = self.__buffers.setdefault(project_id, {})
+            if kind not in buffers:
+                buffers[kind] = deque(maxlen=self.capacity)
+            buffers[kind].append(sample)
+        return sample
+
+    def read(self, project_id:int, since:int=0, kind:str=None)->List[dict]:
+        """ Samples of a project with a sequence number above since, oldest first """
+        with self.__lock:
+            buffers = self.__buffers.get(project_id, {})
+            samples = [sample for name, buffer in buffers.items() if kind is None or name == kind for sample in buffer if sample['seq'] > since]
+        return sorted(samples, key=lambda sample: sample['seq'])
+
+    def clear(self, project_id:int):
+        """ Forgets the samples of a project's previous run """
+        with self.__lock:
+            self.__buffers.pop(project_id, None)
@@ -0,0 +1,219 @@
+import os
+import csv
+import json
+import math
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+import numpy as np
+
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class MetricsStore:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(MetricsStore, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, root:str="./memory"):
+        """
+        Parameters:
+            root: service memory directory, metrics of a project live in <root>/project-<id>/metrics.
+
+        Columnar store of the per-epoch metrics of every training run. Each metric is a flat file of float64
+        values that only grows, runs are appended as row ranges and meta.json is replaced last, so a crash during
+        an append never exposes a partial run. Decoded columns are cached until meta.json changes on disk, since
+        the training worker processes append while the web server reads.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.root = root
+        self.__lock = threading.Lock()
+        self.__cache = {}
+
+    def __directory(self, project_id)->str:
+        return os.path.join(self.root, f"project-{project_id}", "metrics")
+
+    @staticmethod
+    def __column_file(directory:str, column:str)->str:
+        return os.path.join(directory, column.replace("/", "__") + ".f8")
+
+    def __read_meta(self, directory:str)->dict:
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return {'columns': [], 'rows': 0, 'runs': []}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def __write_meta(self, directory:str, meta:dict):
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    @staticmethod
+    def __parse_csv(csv_path:str)->Dict[str, List[float]]:
+        with open(csv_path, newline='') as f:
+            reader = csv.reader(f)
+            # YOLO pads its column names with spaces
+            header = [name.strip() for name in next(reader)]
+            columns = {name: [] for name in header}
+            for row in reader:
+                for name, value in zip(header, row):
+                    try:
+                        columns[name].append(float(value))
+                    except ValueError:
+                        columns[name].append(math.nan)
+        return columns
+
+    @contextmanager
+    def __exclusive(self, directory:str):
+        """ Holds the metrics directory against other threads and processes """
+        os.makedirs(directory, exist_ok=True)
+        with self.__lock, open(os.path.join(directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append_run(self, project_id, csv_path:str, source:str=None)->int:
+        """ Appends the epochs of a YOLO results.csv as a new run and returns the run number """
+        directory = self.__directory(project_id)
+        with self.__exclusive(directory):
+            return self.__append(directory, csv_path, source)
+
+    def __append(self, directory:str, csv_path:str, source:str=None)->int:
+        """ Appends a run, the caller holds the directory """
+        values = self.__parse_csv(csv_path)
+        num_rows = max((len(column) for column in values.values()), default=0)
+
+        meta = self.__read_meta(directory)
+        rows = meta['rows']
+        run = meta['runs'][-1]['run'] + 1 if meta['runs'] else 1
+
+        # Metrics seen for the first time are back-filled so every column keeps the same length
+        for column in values:
+            if column not in meta['columns']:
+                with open(self.__column_file(directory, column), "wb") as f:
+                    np.full(rows, np.nan).tofile(f)
+                meta['columns'].append(column)
+
+        for column in meta['columns']:
+            data = np.asarray(values.get(column, []), dtype=np.float64)
+            data = np.pad(data, (0, num_rows - len(data)), constant_values=np.nan)
+            column_file = self.__column_file(directory, column)
+            with open(column_file, "r+b" if os.path.exists(column_file) else "wb") as f:
+                # Drop bytes of an append that crashed before its meta.json was written
+                f.truncate(rows * 8)
+                f.seek(rows * 8)
+                data.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta['rows'] = rows + num_rows
+        meta['runs'].append({
+            'run': run,
+            'start': rows,
+            'end': rows + num_rows,
+            'committed_at': datetime.now().isoformat(timespec="seconds"),
+            'source': source or os.path.dirname(os.path.abspath(csv_path))
+        })
+        self.__write_meta(directory, meta)
+        return run
+
+    def __load(self, project_id)->Optional[dict]:
+        directory = self.__directory(project_id)
+        meta_path = os.path.join(directory, "meta.json")
+        legacy_path = os.path.join(self.root, f"project-{project_id}", "results.csv")
+        if not os.path.exists(meta_path):
+            if not os.path.exists(legacy_path):
+                return None
+            # Results of the single run kept before the store existed, imported by the first reader only
+            with self.__exclusive(directory):
+                if not os.path.exists(meta_path):
+                    self.__append(directory, legacy_path, source=legacy_path)
+
+        version = os.stat(meta_path).st_mtime_ns
+        with self.__lock:
+            cached = self.__cache.get(project_id)
+            if cached is not None and cached['version'] == version:
+                return cached
+            meta = self.__read_meta(directory)
+            columns = {}
+            for column in meta['columns']:
+                if meta['rows']:
+                    columns[column] = np.memmap(self.__column_file(directory, column), dtype=np.float64, mode="r", shape=(meta['rows'],))
+                else:
+                    columns[column] = np.empty(0)
+            cached = {'version': version, 'meta': meta, 'columns': columns}
+            self.__cache[project_id] = cached
+        return cached
+
+    def runs(self, project_id)->List[dict]:
+        loaded = self.__load(project_id)
+        return loaded['meta']['runs'] if loaded else []
+
+    def query(self, project_id, run="latest", start:float=None, end:float=None, columns:List[str]=None,
+              max_points:int=None)->List[dict]:
+        """
+        Parameters:
+            run: run number, 'latest' or 'all'.
+            start, end: inclusive epoch range.
+            columns: metrics to return, all when None. 'epoch' is always included and 'run' for run='all'.
+            max_points: evenly downsamples the rows to at most this many, the last epoch is always kept.
+
+        Returns the selected rows as records, like pandas' to_dict(orient="records").
+        """
+        loaded = self.__load(project_id)
+        if loaded is None or not loaded['meta']['runs']:
+            return []
+        meta, data = loaded['meta'], loaded['columns']
+
+        if run == "all":
+            selected = meta['runs']
+        elif run == "latest":
+            selected = meta['runs'][-1:]
+        else:
+            selected = [entry for entry in meta['runs'] if entry['run'] == int(run)]
+
+        run_numbers = np.concatenate([np.full(entry['end'] - entry['start'], entry['run']) for entry in selected]) if selected else np.empty(0)
+        indices = np.concatenate([np.arange(entry['start'], entry['end']) for entry in selected]) if selected else np.empty(0, dtype=int)
+        if 'epoch' in data and (start is not None or end is not None):
+            epochs = data['epoch'][indices]
+            mask = np.ones(len(indices), dtype=bool)
+            if start is not None:
+                mask &= epochs >= start
+            if end is not None:
+                mask &= epochs <= end
+            indices, run_numbers = indices[mask], run_numbers[mask]
+
+        if max_points is not None and len(indices) > max_points > 0:
+            keep = np.unique(np.linspace(0, len(indices) - 1, max_points).round().astype(int))
+            indices, run_numbers = indices[keep], run_numbers[keep]
+
+        names = [name for name in meta['columns'] if columns is None or name in columns or name == 'epoch']
+        picked = {name: data[name][indices] for name in names}
+        records = []
+        for i in range(len(indices)):
+            record = {name: (None if math.isnan(picked[name][i]) else float(picked[name][i])) for name in names}
+            if 'epoch' in record and record['epoch'] is not None:
+                record['epoch'] = int(record['epoch'])
+            if run == "all":
+                record['run'] = int(run_numbers[i])
+            records.append(record)
+        return records
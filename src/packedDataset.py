@@ -0,0 +1,101 @@
+import cv2
+import math
+import numpy as np
+
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.ops import segments2boxes
+
+from shards import ShardReader
+
+class PackedYOLODataset(YOLODataset):
+    """
+    YOLODataset reading a split packed by ShardPacker. Labels and image shapes come from the shard index instead of
+    label files and image headers, and images are decoded straight from the memory mapped shards.
+    """
+
+    def get_img_files(self, img_path):
+        self.reader = ShardReader(img_path)
+        files = self.reader.files()
+        if self.fraction < 1:
+            files = files[: round(len(files) * self.fraction)]
+        return files
+
+    def get_labels(self):
+        labels = []
+        for file in self.im_files:
+            sample = self.reader.samples[file]
+            rows = [line.split() for line in sample['label'].splitlines() if line.strip()]
+            segments = []
+            if any(len(row) > 6 for row in rows):
+                # Polygons, their boxes are derived like Ultralytics does for segment label files
+                classes = np.array([row[0] for row in rows], dtype=np.float32)
+                segments = [np.array(row[1:], dtype=np.float32).reshape(-1, 2) for row in rows]
+                rows = np.concatenate((classes.reshape(-1, 1), segments2boxes(segments)), 1)
+            rows = np.array(rows, dtype=np.float32).reshape(-1, 5)
+            labels.append({
+                'im_file': file,
+                'shape': tuple(sample['shape']),
+                'cls': rows[:, 0:1],
+                'bboxes': rows[:, 1:],
+                'segments': segments,
+                'keypoints': None,
+                'normalized': True,
+                'bbox_format': "xywh"
+            })
+        return labels
+
+    def load_image(self, i, rect_mode=True):
+        if self.ims[i] is not None:
+            return self.ims[i], self.im_hw0[i], self.im_hw[i]
+
+        im = cv2.imdecode(np.frombuffer(self.reader.read(self.im_files[i]), dtype=np.uint8), getattr(self, 'cv2_flag', cv2.IMREAD_COLOR))
+        if im is None:
+            raise FileNotFoundError(f"Image Not Found {self.im_files[i]}")
+
+        # Same resizing and buffering as BaseDataset.load_image
+        h0, w0 = im.shape[:2]
+        if rect_mode:
+            r = self.imgsz / max(h0, w0)
+            if r != 1:
+                w, h = (min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz))
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        elif not (h0 == w0 == self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+        if im.ndim == 2:
+            im = im[..., None]
+
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return im, (h0, w0), im.shape[:2]
+
+class PackedDetectionTrainer(DetectionTrainer):
+    """ DetectionTrainer whose train and val datasets are packed splits, passed as model.train(trainer=...) """
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        model = getattr(self.model, 'module', self.model)
+        stride = max(int(model.stride.max() if model else 0), 32)
+        return PackedYOLODataset(
+            img_path=img_path,
+            imgsz=self.args.imgsz,
+            batch_size=batch,
+            augment=mode == "train",
+            hyp=self.args,
+            rect=self.args.rect or mode == "val",
+            # Samples have no files of their own, so images can only be cached in memory
+            cache="ram" if self.args.cache == "ram" else None,
+            single_cls=self.args.single_cls or False,
+            stride=stride,
+            pad=0.0 if mode == "train" else 0.5,
+            prefix=colorstr(f"{mode}: "),
+            task=self.args.task,
+            classes=self.args.classes,
+            data=self.data,
+            fraction=self.args.fraction if mode == "train" else 1.0
+        )
@@ -0,0 +1,134 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image, ImageOps
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+def resize_image(source_path:str, target_path:str, imgsz:int, quality:int=95)->Tuple[str, str]:
+    """
+    Decodes an image, applies its EXIF rotation and scales its long side down to imgsz, keeping the aspect ratio.
+    Returns the status ('resized', 'kept' or 'corrupt') and the error of a corrupt image. Kept images are already
+    small, upright RGB JPEGs and are used as they are.
+    """
+    try:
+        with Image.open(source_path) as image:
+            original_format = image.format
+            # Drafting shrinks image.size, whether the source is small enough to keep depends on its stored size
+            original_size = image.size
+            if max(original_size) > imgsz:
+                # JPEGs are decoded at the smallest power-of-two scale still larger than imgsz, a 4K capture is
+                # never decoded at full resolution
+                image.draft("RGB", (imgsz, imgsz))
+            # Decoding the whole image is what finds truncated or corrupt files
+            image.load()
+            rotated = image.getexif().get(0x0112, 1) != 1
+            if not rotated and original_format == "JPEG" and image.mode == "RGB" and max(original_size) <= imgsz:
+                return 'kept', ""
+            upright = ImageOps.exif_transpose(image) if rotated else image
+            if upright.mode != "RGB":
+                upright = upright.convert("RGB")
+            width, height = upright.size
+            ratio = imgsz / max(width, height)
+            if ratio < 1:
+                # No letterbox padding, YOLO labels are relative to the image and stay valid after scaling
+                upright = upright.resize((max(1, round(width * ratio)), max(1, round(height * ratio))), Image.Resampling.BILINEAR, reducing_gap=2.0)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            tmp_path = f"{target_path}.{threading.get_ident()}.tmp"
+            upright.save(tmp_path, format="JPEG", quality=quality)
+            os.replace(tmp_path, target_path)
+        return 'resized', ""
+    except Exception as e:
+        return 'corrupt', f"{type(e).__name__}: {e}"
+
+class ImagePreprocessor:
+    def __init__(self, root:str, imgsz:int=640, workers:int=None, quality:int=95):
+        """
+        Parameters:
+            root: directory of the resized images, one subdirectory per imgsz.
+            imgsz: long side of the resized images, the training image size.
+            workers: threads decoding and encoding images, defaults to the number of CPUs. Pillow releases the GIL
+                while it decodes, resizes and encodes, so threads scale with the cores.
+            quality: JPEG quality of the re-encoded images.
+
+        Resizes downloaded images to the training resolution once at ingest, so a 4K capture is not staged into the
+        gym and decoded at full size by every epoch's dataloader. Sources are content-addressed cache blobs, results
+        are stored under the source's name and reused by later runs. Images that cannot be decoded are flagged and
+        remembered instead of failing the run.
+        """
+        self.root = os.path.join(root, str(imgsz))
+        self.imgsz = imgsz
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.quality = quality
+
+    def target_path(self, source_path:str)->str:
+        name = os.path.basename(source_path)
+        return os.path.join(self.root, name[:2], f"{name}.jpg")
+
+    def __marker(self, source_path:str, status:str)->str:
+        """ Kept and corrupt images have no resized copy, an empty or error-holding marker remembers them """
+        return f"{self.target_path(source_path)}.{status}"
+
+    def __mark(self, source_path:str, status:str, content:str=""):
+        os.makedirs(os.path.dirname(self.target_path(source_path)), exist_ok=True)
+        with open(self.__marker(source_path, status), "w") as f:
+            f.write(content)
+
+    def prepare(self, source_paths:List[str])->Tuple[Dict[str, Optional[str]], dict]:
+        """
+        Returns the image to train on for every source, None for corrupt ones, and a report with the number of
+        resized, kept, reused and corrupt images and the errors of the corrupt ones.
+        """
+        report = {'resized': 0, 'kept': 0, 'reused': 0, 'corrupt': 0, 'errors': {}}
+        results = {}
+        pending = []
+        for source_path in dict.fromkeys(source_paths):
+            if os.path.exists(self.target_path(source_path)):
+                results[source_path] = self.target_path(source_path)
+                report['reused'] += 1
+            elif os.path.exists(self.__marker(source_path, 'kept')):
+                results[source_path] = source_path
+                report['reused'] += 1
+            elif os.path.exists(self.__marker(source_path, 'corrupt')):
+                results[source_path] = None
+                report['corrupt'] += 1
+                with open(self.__marker(source_path, 'corrupt')) as f:
+                    report['errors'][source_path] = f.read()
+            else:
+                pending.append(source_path)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = {pool.submit(resize_image, source_path, self.target_path(source_path), self.imgsz, self.quality): source_path
+                           for source_path in pending}
+                for future in as_completed(futures):
+                    source_path = futures[future]
+                    status, error = future.result()
+                    report[status] += 1
+                    if status == 'resized':
+                        results[source_path] = self.target_path(source_path)
+                    elif status == 'kept':
+                        results[source_path] = source_path
+                        self.__mark(source_path, 'kept')
+                    else:
+                        results[source_path] = None
+                        report['errors'][source_path] = error
+                        self.__mark(source_path, 'corrupt', error)
+
+        print(f"[INFO]: Preprocessed images to {self.imgsz}px: {report['resized']} resized, {report['kept']} kept, "
+              f"{report['reused']} reused, {report['corrupt']} corrupt")
+        return results, report
+
+    def prune(self, exists:Callable[[str], bool])->int:
+        """ Removes resized images whose source left the image cache, returning the number removed """
+        removed = 0
+        if not os.path.isdir(self.root):
+            return 0
+        for folder in os.listdir(self.root):
+            for file in os.listdir(os.path.join(self.root, folder)):
+                name = file.split(".")[0]
+                if not exists(name):
+                    os.remove(os.path.join(self.root, folder, file))
+                    removed += 1
+        return removed
@@ -0,0 +1,103 @@
+import os
+import glob
+import time
+import socket
+import threading
+
+from typing import Callable, Optional
+from service import Service
+
+class StorageProbe:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(StorageProbe, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, service:Service=None):
+        """
+        Parameters:
+            service: shared service configuration, STORAGE_PROBE_SECONDS sets how long a probe result stays fresh.
+
+        Checks USB and file server availability in a background thread and caches the results, so dashboards and
+        the Replicator's targets read them without touching the network or the filesystem. Subscribers are notified
+        when a device appears or disappears.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.service = service if service is not None else Service()
+        self.__lock = threading.Lock()
+        self.__status = {}
+        self.__checked_at = {}
+        self.__subscribers = []
+
+        self.__thread = threading.Thread(target=self.__refresh_forever, name="storage-probe", daemon=True)
+        self.__thread.start()
+
+    def subscribe(self, callback:Callable[[str, object, object], None]):
+        """ callback(name, old_value, new_value) is called from the probe thread whenever a status changes """
+        self.__subscribers.append(callback)
+
+    def __probe_usb(self)->Optional[str]:
+        for mount in glob.glob("/media/*/*"):
+            key_file_path = os.path.join(mount, self.service.usb_key_file_name)
+            if os.path.exists(key_file_path):
+                with open(key_file_path, "r") as f:
+                    key_content = f.read().strip()
+                if key_content == self.service.label_studio_api_key:
+                    return mount  # Return the first valid USB mount point
+        return None
+
+    def __probe_file_server(self)->bool:
+        try:
+            # The timeout only applies to this socket, unlike socket.setdefaulttimeout
+            with socket.create_connection((self.service.file_server_ip, int(self.service.file_server_port)), timeout=3):
+                return True
+        except (OSError, ValueError):
+            return False
+
+    def __update(self, name, probe):
+        try:
+            value = probe()
+        except Exception as e:
+            print(f"[INFO]: Probing {name} failed: {e}")
+            value = None if name == 'usb' else False
+        with self.__lock:
+            old_value = self.__status.get(name)
+            changed = name in self.__status and old_value != value
+            self.__status[name] = value
+            self.__checked_at[name] = time.monotonic()
+        if changed:
+            for callback in list(self.__subscribers):
+                try:
+                    callback(name, old_value, value)
+                except Exception as e:
+                    print(f"[INFO]: Storage probe subscriber failed: {e}")
+        return value
+
+    def refresh(self):
+        self.__update('usb', self.__probe_usb)
+        self.__update('file_server', self.__probe_file_server)
+
+    def __refresh_forever(self):
+        while True:
+            self.refresh()
+            time.sleep(self.service.storage_probe_seconds)
+
+    def __read(self, name, probe, max_age):
+        max_age = self.service.storage_probe_seconds * 2 if max_age is None else max_age
+        with self.__lock:
+            fresh = name in self.__status and time.monotonic() - self.__checked_at[name] <= max_age
+            value = self.__status.get(name)
+        # Only probe inline when the background result is missing or too old
+        return value if fresh else self.__update(name, probe)
+
+    def usb_mount(self, max_age:float=None)->Optional[str]:
+        """ Mount point of the USB device holding the key file, None if there is none """
+        return self.__read('usb', self.__probe_usb, max_age)
+
+    def file_server_available(self, max_age:float=None)->bool:
+        return self.__read('file_server', self.__probe_file_server, max_age)
@@ -0,0 +1,61 @@
+import time
+import threading
+
+from typing import List
+
+from label_studio_sdk.client import LabelStudio
+from label_studio_sdk import Client
+
+class ProjectMetadataCache:
+    def __init__(self, ls:LabelStudio, ls_client:Client, ttl_seconds:float=300):
+        """
+        Parameters:
+            ls: LabelStudio client used for project details and label configs.
+            ls_client: legacy LabelStudio client whose Project objects fetch tasks.
+            ttl_seconds: how long fetched metadata is reused before asking LabelStudio again.
+
+        Caches what a Trainer needs to know about a project, so creating one for a queued job costs no requests.
+        PROJECT_UPDATED webhooks invalidate a project's entry right away, the TTL covers changes made without one.
+        """
+        self.ls = ls
+        self.ls_client = ls_client
+        self.ttl_seconds = ttl_seconds
+        self.__lock = threading.Lock()
+        self.__entries = {}
+        self.__clients = {}
+
+    def __entry(self, project_id:int)->dict:
+        with self.__lock:
+            entry = self.__entries.get(project_id)
+            if entry is not None and time.monotonic() - entry['fetched_at'] <= self.ttl_seconds:
+                return entry
+        # Fetched outside the lock so a slow request does not hold up other projects
+        project = self.ls.projects.get(id=project_id)
+        entry = {
+            'project': project,
+            'labels': list(list(project.get_label_interface().labels)[0].keys()),
+            'fetched_at': time.monotonic()
+        }
+        with self.__lock:
+            self.__entries[project_id] = entry
+        return entry
+
+    def project(self, project_id:int):
+        return self.__entry(project_id)['project']
+
+    def labels(self, project_id:int)->List[str]:
+        return self.__entry(project_id)['labels']
+
+    def project_client(self, project_id:int):
+        """ Legacy Project object of the project, created on first use. Only its id is used, it is kept past the TTL """
+        with self.__lock:
+            client = self.__clients.get(project_id)
+        if client is None:
+            client = self.ls_client.get_project(id=project_id)
+            with self.__lock:
+                self.__clients[project_id] = client
+        return client
+
+    def invalidate(self, project_id:int):
+        with self.__lock:
+            self.__entries.pop(project_id, None)
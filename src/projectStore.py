@@ -0,0 +1,135 @@
+import os
+import csv
+import time
+import sqlite3
+import threading
+
+from typing import Dict, Iterable, List
+
+COLUMNS = ["finished_tasks", "total_tasks", "tracked", "title", "date_time_last_trained", "training_duration", "epochs",
+           "locations_saved", "location_of_metrics", "class_acc_string", "latest_report"]
+
+class ProjectStore:
+    def __init__(self, path:str="./memory/state.db"):
+        """
+        Parameters:
+            path: SQLite database holding the scheduler's per-project state.
+
+        Durable replacement of project_tasks.csv. Every change is a single row upsert in its own transaction, so a
+        crash never loses the other projects. trained_tasks keeps the annotation count of the last training, which
+        is the baseline the Scheduler compares webhook counts against.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.__db.row_factory = sqlite3.Row
+        with self.__lock, self.__db:
+            self.__db.execute("PRAGMA journal_mode=WAL")
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "id INTEGER PRIMARY KEY, "
+                "finished_tasks INTEGER NOT NULL DEFAULT 0, "
+                "total_tasks INTEGER NOT NULL DEFAULT 0, "
+                "trained_tasks INTEGER, "
+                "tracked INTEGER NOT NULL DEFAULT 0, "
+                "state INTEGER NOT NULL DEFAULT 0, "
+                "title TEXT NOT NULL DEFAULT '', "
+                "date_time_last_trained TEXT NOT NULL DEFAULT '', "
+                "training_duration TEXT NOT NULL DEFAULT '', "
+                "epochs TEXT NOT NULL DEFAULT '', "
+                "locations_saved TEXT NOT NULL DEFAULT '', "
+                "location_of_metrics TEXT NOT NULL DEFAULT '', "
+                "class_acc_string TEXT NOT NULL DEFAULT '', "
+                "latest_report TEXT NOT NULL DEFAULT '', "
+                "updated_at REAL NOT NULL)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS projects_tracked ON projects (tracked)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS projects_state ON projects (state)")
+
+    @staticmethod
+    def __to_row(project:dict)->dict:
+        row = {}
+        for column in COLUMNS:
+            value = project.get(column)
+            if column == "tracked":
+                row[column] = int(bool(value))
+            elif column in ("finished_tasks", "total_tasks"):
+                row[column] = int(value or 0)
+            else:
+                row[column] = "" if value is None else str(value)
+        return row
+
+    def load(self)->Dict[int, dict]:
+        """ All projects as {id: project} with trained_tasks and state included """
+        with self.__lock:
+            rows = self.__db.execute("SELECT * FROM projects").fetchall()
+        projects = {}
+        for row in rows:
+            project = {column: row[column] for column in COLUMNS}
+            project['tracked'] = bool(row['tracked'])
+            project['trained_tasks'] = row['trained_tasks'] if row['trained_tasks'] is not None else row['finished_tasks']
+            project['state'] = row['state']
+            projects[row['id']] = project
+        return projects
+
+    def __upsert(self, project_id:int, project:dict, trained_tasks:int=None, state:int=None):
+        row = self.__to_row(project)
+        columns = list(row) + ['trained_tasks', 'state', 'updated_at']
+        values = list(row.values()) + [trained_tasks, state if state is not None else 0, time.time()]
+        # Fields that were not given keep their stored value on conflict
+        updates = [f"{column} = excluded.{column}" for column in row] + ["updated_at = excluded.updated_at"]
+        if trained_tasks is not None:
+            updates.append("trained_tasks = excluded.trained_tasks")
+        if state is not None:
+            updates.append("state = excluded.state")
+        self.__db.execute(
+            f"INSERT INTO projects (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {', '.join(updates)}",
+            [project_id] + values)
+
+    def save(self, project_id:int, project:dict, trained_tasks:int=None, state:int=None):
+        """ Atomically writes one project """
+        with self.__lock, self.__db:
+            self.__upsert(project_id, project, trained_tasks, state)
+
+    def save_many(self, projects:Dict[int, dict], trained_tasks:Dict[int, int]=None, states:Dict[int, int]=None):
+        """ Writes several projects in a single transaction """
+        trained_tasks = trained_tasks or {}
+        states = states or {}
+        with self.__lock, self.__db:
+            for project_id, project in projects.items():
+                self.__upsert(project_id, project, trained_tasks.get(project_id), states.get(project_id))
+
+    def set_state(self, project_id:int, state:int):
+        with self.__lock, self.__db:
+            self.__db.execute("UPDATE projects SET state = ?, updated_at = ? WHERE id = ?", (state, time.time(), project_id))
+
+    def delete(self, project_ids:Iterable[int]):
+        with self.__lock, self.__db:
+            self.__db.executemany("DELETE FROM projects WHERE id = ?", [(project_id,) for project_id in project_ids])
+
+    def tracked_ids(self)->List[int]:
+        with self.__lock:
+            return [row[0] for row in self.__db.execute("SELECT id FROM projects WHERE tracked = 1")]
+
+    def ids_in_state(self, *states:int)->List[int]:
+        with self.__lock:
+            return [row[0] for row in self.__db.execute(
+                f"SELECT id FROM projects WHERE state IN ({', '.join('?' * len(states))})", states)]
+
+    def import_csv(self, csv_path:str="project_tasks.csv")->int:
+        """ One-time migration of the legacy project_tasks.csv, the file is renamed once imported """
+        if not os.path.exists(csv_path):
+            return 0
+        with open(csv_path, 'r') as file:
+            rows = list(csv.DictReader(file))
+        projects = {int(row["id"]): {**row, 'tracked': row["tracked"] == 'True'} for row in rows}
+        # The legacy file only knew the annotation count at the time of its last write
+        self.save_many(projects, trained_tasks={id: int(project["finished_tasks"] or 0) for id, project in projects.items()})
+        os.replace(csv_path, csv_path + ".migrated")
+        return len(projects)
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import torch
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import Callable, Dict, List, Optional
+from service import Service
+from probes import StorageProbe
+from smbPool import SmbSessionPool
+from artifacts import ArtifactPublisher
+from telemetry import Telemetry
+
+CHUNK_SIZE = 1024 * 1024
+
+class LocalTarget:
+    name = 'local'
+    chunk_size = CHUNK_SIZE
+    file_workers = 1
+
+    def __init__(self, service:Service, base:str="./local-saves"):
+        self.service = service
+        self.base = base
+
+    def root(self)->Optional[str]:
+        """ Directory artifacts are replicated into, None while the target is unavailable """
+        return self.base
+
+    def makedirs(self, path:str):
+        os.makedirs(path, exist_ok=True)
+
+    def open(self, path:str, mode:str):
+        return open(path, mode)
+
+    def replace(self, source:str, destination:str):
+        os.replace(source, destination)
+
+class UsbTarget(LocalTarget):
+    name = 'usb'
+
+    def root(self)->Optional[str]:
+        mount = StorageProbe(self.service).usb_mount()
+        return os.path.join(mount, "ml-workflow") if mount else None
+
+class SmbTarget:
+    name = 'smb'
+
+    def __init__(self, service:Service):
+        self.service = service
+        self.pool = SmbSessionPool(service)
+        self.chunk_size = self.pool.buffer_size
+        self.file_workers = self.pool.upload_workers
+
+    def root(self)->Optional[str]:
+        if not StorageProbe(self.service).file_server_available():
+            return None
+        return os.path.join(self.pool.session(), "ml-workflow")
+
+    def makedirs(self, path:str):
+        self.pool.makedirs(path)
+
+    def open(self, path:str, mode:str):
+        return self.pool.open(path, mode)
+
+    def replace(self, source:str, destination:str):
+        self.pool.replace(source, destination)
+
+class Replicator:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Replicator, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, service:Service=None):
+        """
+        Parameters:
+            service: shared service configuration (REPLICATION_TARGETS, REPLICATION_STAGING_DIR, REPLICATION_WORKERS,
+                REPLICATION_MAX_ATTEMPTS).
+
+        Replicates trained models and their metrics to every configured target (usb, smb, local). An artifact is
+        staged once into a local staging directory and recorded in a persistent outbox, then copied to all
+        targets in parallel by background threads. Local copies are reflinked or hardlinked when the filesystem
+        allows it, other copies are chunked, read back and compared to the staged checksum before they replace the
+        previous version. Failed or unavailable targets are retried with backoff,
+        also after a restart.
+
+        Any process may stage artifacts, only the scheduler's process calls start() and uploads them, so a training
+        worker is done as soon as its artifact is staged.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.service = service if service is not None else Service()
+        self.staging_dir = self.service.replication_staging_dir
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.publisher = ArtifactPublisher()
+        self.targets = {target.name: target for target in (LocalTarget(self.service), UsbTarget(self.service), SmbTarget(self.service))}
+
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(os.path.join(self.staging_dir, "outbox.db"), check_same_thread=False, timeout=30)
+        with self.__lock, self.__db:
+            self.__db.execute("PRAGMA journal_mode=WAL")
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts (artifact_id TEXT PRIMARY KEY, project_id INTEGER NOT NULL, "
+                "manifest TEXT NOT NULL, created_at REAL NOT NULL)")
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox (artifact_id TEXT NOT NULL, target TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT NOT NULL DEFAULT '', location TEXT NOT NULL DEFAULT '', "
+                "next_attempt_at REAL NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (artifact_id, target))")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, next_attempt_at)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS artifacts_project ON artifacts (project_id, created_at)")
+
+        self.__subscribers = []
+        self.__wake = threading.Event()
+        self.__pool = None
+        self.__thread = None
+
+    def subscribe(self, callback:Callable[[int, str, str, str, str], None]):
+        """ callback(project_id, artifact_id, target, status, location) is called from the upload threads """
+        self.__subscribers.append(callback)
+
+    def __notify(self, project_id, artifact_id, target, status, location=''):
+        for callback in list(self.__subscribers):
+            try:
+                callback(project_id, artifact_id, target, status, location)
+            except Exception as e:
+                print(f"[INFO]: Replication subscriber failed: {e}")
+
+    def configured_targets(self)->List[str]:
+        names = [name.strip() for name in self.service.replication_targets.split(",")]
+        return [name for name in names if name in self.targets]
+
+    @staticmethod
+    def __sha256(path:str)->str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def stage(self, project_id:int, save_folder:str, model, weights_name:str, metrics_path:str, weights_path:str=None)->str:
+        """
+        Parameters:
+            save_folder: folder of the project on every target, weights/ and metrics/ are created inside it.
+            model: serialized with torch.save into the staging directory, only when there is no weights_path.
+            metrics_path: training run directory, its files are moved into the staging directory.
+            weights_path: weights file Ultralytics already wrote, staged as is by reflink, hardlink or copy.
+
+        Returns the artifact id, the artifact is replicated once a started Replicator picks it up.
+        """
+        artifact_id = f"{save_folder}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        artifact_dir = os.path.join(self.staging_dir, artifact_id)
+        os.makedirs(os.path.join(artifact_dir, "weights"), exist_ok=True)
+        os.makedirs(os.path.join(artifact_dir, "metrics"), exist_ok=True)
+
+        staged_weights = os.path.join(artifact_dir, "weights", weights_name)
+        if weights_path is not None and os.path.isfile(weights_path):
+            self.publisher.copy(weights_path, staged_weights)
+        else:
+            torch.save(model.state_dict(), staged_weights)
+        if metrics_path is not None and os.path.isdir(metrics_path):
+            self.publisher.publish_directory(metrics_path, os.path.join(artifact_dir, "metrics"))
+
+        files = {}
+        for folder in ("weights", "metrics"):
+            for file in sorted(os.listdir(os.path.join(artifact_dir, folder))):
+                path = os.path.join(artifact_dir, folder, file)
+                files[f"{folder}/{file}"] = {'size': os.path.getsize(path), 'sha256': self.__sha256(path)}
+        manifest = {'save_folder': save_folder, 'weights_name': weights_name, 'files': files}
+
+        now = time.time()
+        with self.__lock, self.__db:
+            self.__db.execute("INSERT INTO artifacts (artifact_id, project_id, manifest, created_at) VALUES (?, ?, ?, ?)",
+                              (artifact_id, project_id, json.dumps(manifest), now))
+            for target in self.configured_targets():
+                self.__db.execute("INSERT INTO outbox (artifact_id, target, status, next_attempt_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                                  (artifact_id, target, now, now))
+        self.__wake.set()
+        return artifact_id
+
+    def start(self):
+        """ Uploads staged artifacts in the background, called once by the process that owns the outbox """
+        if self.__thread is not None:
+            return
+        with self.__lock, self.__db:
+            # Uploads interrupted by a restart start over
+            self.__db.execute("UPDATE outbox SET status = 'pending' WHERE status = 'uploading'")
+        self.__pool = ThreadPoolExecutor(max_workers=self.service.replication_workers, thread_name_prefix="replication")
+        self.__thread = threading.Thread(target=self.__run_forever, name="replication", daemon=True)
+        self.__thread.start()
+
+    def __run_forever(self):
+        while True:
+            # Artifacts staged by worker processes are noticed on the next poll
+            self.__wake.wait(timeout=2)
+            self.__wake.clear()
+            with self.__lock, self.__db:
+                due = self.__db.execute(
+                    "SELECT artifact_id, target FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?",
+                    (time.time(),)).fetchall()
+                self.__db.executemany(
+                    "UPDATE outbox SET status = 'uploading', updated_at = ? WHERE artifact_id = ? AND target = ?",
+                    [(time.time(), artifact_id, target) for artifact_id, target in due])
+            for artifact_id, target in due:
+                self.__pool.submit(self.__replicate, artifact_id, target)
+
+    def __copy(self, target, source:str, destination:str, sha256:str):
+        target.makedirs(os.path.dirname(destination))
+        partial = destination + ".part"
+        if isinstance(target, LocalTarget):
+            # Linked files share the staged bytes, there is nothing to read back
+            if self.publisher.copy(source, partial) in ('reflink', 'hardlink'):
+                target.replace(partial, destination)
+                return
+        else:
+            with open(source, "rb") as src, target.open(partial, "wb") as dst:
+                for chunk in iter(lambda: src.read(target.chunk_size), b""):
+                    dst.write(chunk)
+        # Verify what the target stored before it replaces the previous version
+        digest = hashlib.sha256()
+        with target.open(partial, "rb") as f:
+            for chunk in iter(lambda: f.read(target.chunk_size), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != sha256:
+            raise IOError(f"Checksum mismatch for {destination}")
+        target.replace(partial, destination)
+
+    def __replicate(self, artifact_id:str, target_name:str):
+        with self.__lock:
+            project_id, manifest = self.__db.execute(
+                "SELECT project_id, manifest FROM artifacts WHERE artifact_id = ?", (artifact_id,)).fetchone()
+        manifest = json.loads(manifest)
+        target = self.targets[target_name]
+        self.__notify(project_id, artifact_id, target_name, 'uploading')
+        started = time.monotonic()
+
+        try:
+            root = target.root()
+            if root is None:
+                raise ConnectionError(f"{target_name} is not available")
+            location = os.path.join(root, manifest['save_folder'])
+            copies = [(target, os.path.join(self.staging_dir, artifact_id, relative_path), os.path.join(location, relative_path), info['sha256'])
+                      for relative_path, info in manifest['files'].items()]
+            if target.file_workers > 1 and len(copies) > 1:
+                # Network targets keep several files in flight over their shared session
+                with ThreadPoolExecutor(max_workers=min(target.file_workers, len(copies)), thread_name_prefix=f"replication-{target_name}") as files:
+                    list(files.map(lambda copy: self.__copy(*copy), copies))
+            else:
+                for copy in copies:
+                    self.__copy(*copy)
+        except Exception as e:
+            with self.__lock, self.__db:
+                attempts = self.__db.execute("SELECT attempts FROM outbox WHERE artifact_id = ? AND target = ?",
+                                             (artifact_id, target_name)).fetchone()[0] + 1
+                status = 'failed' if attempts >= self.service.replication_max_attempts else 'pending'
+                retry_in = min(3600, 30 * 2 ** (attempts - 1))
+                self.__db.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ? "
+                    "WHERE artifact_id = ? AND target = ?",
+                    (status, attempts, f"{type(e).__name__}: {e}", time.time() + retry_in, time.time(), artifact_id, target_name))
+            print(f"[INFO]: Replicating {artifact_id} to {target_name} failed ({status}, attempt {attempts}): {e}")
+            Telemetry().observe('ml_workflow_replication_seconds', time.monotonic() - started, target=target_name, status='error')
+            self.__notify(project_id, artifact_id, target_name, status)
+            return
+
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "UPDATE outbox SET status = 'done', location = ?, last_error = '', updated_at = ? WHERE artifact_id = ? AND target = ?",
+                (location, time.time(), artifact_id, target_name))
+            remaining = self.__db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE artifact_id = ? AND status != 'done'", (artifact_id,)).fetchone()[0]
+        print(f"[INFO]: Replicated {artifact_id} to {target_name}: {location}")
+        Telemetry().observe('ml_workflow_replication_seconds', time.monotonic() - started, target=target_name, status='done')
+        Telemetry().inc('ml_workflow_replication_bytes_total', sum(info['size'] for info in manifest['files'].values()), target=target_name)
+        self.__notify(project_id, artifact_id, target_name, 'done', location)
+
+        # The staged copy is kept until every target has the artifact
+        if remaining == 0:
+            shutil.rmtree(os.path.join(self.staging_dir, artifact_id), ignore_errors=True)
+
+    def retry(self, artifact_id:str):
+        """ Schedules the failed targets of an artifact again """
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE artifact_id = ? AND status = 'failed'",
+                (time.time(), artifact_id))
+        self.__wake.set()
+
+    def status(self, project_id:int=None, limit:int=10)->List[dict]:
+        """ Latest artifacts, newest first, with the status of every target """
+        with self.__lock:
+            query = "SELECT artifact_id, project_id, created_at FROM artifacts"
+            arguments = ()
+            if project_id is not None:
+                query += " WHERE project_id = ?"
+                arguments = (project_id,)
+            artifacts = self.__db.execute(query + " ORDER BY created_at DESC LIMIT ?", arguments + (limit,)).fetchall()
+            result = []
+            for artifact_id, artifact_project, created_at in artifacts:
+                targets = {}
+                for target, status, attempts, last_error, location, next_attempt_at in self.__db.execute(
+                        "SELECT target, status, attempts, last_error, location, next_attempt_at FROM outbox WHERE artifact_id = ?",
+                        (artifact_id,)):
+                    targets[target] = {
+                        'status': status,
+                        'attempts': attempts,
+                        'last_error': last_error,
+                        'location': location,
+                        'next_attempt_at': datetime.fromtimestamp(next_attempt_at).isoformat(timespec="seconds") if status == 'pending' else None
+                    }
+                result.append({
+                    'artifact_id': artifact_id,
+                    'project_id': artifact_project,
+                    'created_at': datetime.fromtimestamp(created_at).isoformat(timespec="seconds"),
+                    'targets': targets
+                })
+        return result
+
+    def counts(self)->Dict[str, int]:
+        """ Number of artifact copies per outbox status """
+        with self.__lock:
+            return dict(self.__db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def locations(self, project_id:int)->Dict[str, str]:
+        """ {target: location} of the targets holding the project's latest artifact """
+        latest = self.status(project_id, limit=1)
+        if not latest:
+            return {}
+        return {target: info['location'] for target, info in latest[0]['targets'].items() if info['status'] == 'done'}
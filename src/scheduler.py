@@ -1,7 +1,7 @@
 import os
-import csv
 import time
 import asyncio
+import traceback
 from threading import Thread
 from datetime import datetime
 
@@ -13,6 +13,16 @@ from label_studio_sdk.client import LabelStudio
 from label_studio_sdk import Client
 
 from trainer import Trainer
+from executor import TrainingExecutor
+from admission import AdmissionController, PRIORITY_AUTO, PRIORITY_MANUAL
+from coalescer import WebhookCoalescer
+from jobs import JobRunner
+from events import EventBus
+from metricsBus import MetricsBus
+from projectStore import ProjectStore
+from projectCache import ProjectMetadataCache
+from replication import Replicator
+from telemetry import Telemetry
 from service import Service
 from logger import Logger
 
@@ -50,6 +60,15 @@ class Scheduler:
         self.ls_client = Client(url=__LABEL_STUDIO_URL, api_key=__API_KEY)
 
         self.service = Service()
+        self.executor = TrainingExecutor(self.service)
+        self.project_metadata = ProjectMetadataCache(self.ls, self.ls_client, self.service.project_cache_seconds)
+        self.admission = AdmissionController(self.service)
+        self.events = EventBus()
+        self.telemetry = Telemetry(self.service.trace_path or None)
+        self.metrics_bus = MetricsBus()
+        self.persisted_states = {}
+        # When /link- and /unlink- last changed a project, so a refresh that started earlier does not undo them
+        self.tracking_changed_at = {}
         
         self.projects = {}
         self.project_finished_tasks_dict = {}
@@ -58,190 +77,409 @@ class Scheduler:
         self.trainer_dict = {}
         self.training_queue_set = set()
         self.training_queue = []
+        self.queue_info = {}
+        self.latest_annotation_count = {}
+
+        # Queue decisions, trainings and debounce timers all run on one long-lived loop owned by the Scheduler
+        self.runner = JobRunner()
+        self.stopping = False
+
+        # Webhook bursts are merged per project and settle after MINUTES_TO_WAIT_FOR_NEXT_ANNOTATION without events
+        self.coalescer = WebhookCoalescer(
+            self.__on_annotations_settled,
+            window_seconds=lambda: self.service.minutes_to_wait_for_next_annotation * 60,
+            runner=self.runner)
 
         self.project_to_time_of_threshold_reached = {}
 
-        # Create dict of projects and latest completed batch size
-        # Check if project_tasks.csv exists and is populated
-        if os.path.exists("project_tasks.csv"):
-            with open("project_tasks.csv", 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    self.project_finished_tasks_dict[int(row["id"])] = int(row["finished_tasks"])  
-                    self.projects[int(row["id"])] = {
-                        'finished_tasks': row["finished_tasks"],
-                        'total_tasks': row["total_tasks"],
-                        'tracked': row["tracked"] == 'True',
-                        'title': row["title"],
-                        'date_time_last_trained': row["date_time_last_trained"],
-                        'training_duration': row["training_duration"],
-                        'epochs': row["epochs"],
-                        'locations_saved': row["locations_saved"],
-                        'location_of_metrics': row["location_of_metrics"],
-                        'class_acc_string': row["class_acc_string"],
-                        'latest_report': row["latest_report"]
-                    } 
-        else: # Load finished_task data from LabelStudio
-            with open("project_tasks.csv", "w", newline='') as file:
-                writer = csv.DictWriter(file, fieldnames=["id","finished_tasks","total_tasks","tracked","title","date_time_last_trained","training_duration","epochs","locations_saved","location_of_metrics","class_acc_string","latest_report"])
-                writer.writeheader()
-
-                projects = self.ls.projects.list()
-                webhooks_set = set([webhook.project for webhook in self.ls.webhooks.list()])
-                
-                for project in projects:
-                    # Extracting available project data
-                    project_data = {
-                        'id': project.id,
-                        'finished_tasks': project.num_tasks_with_annotations,
-                        'total_tasks': project.task_number,
-                        'tracked': project.id in webhooks_set,
-                        'title': project.title,
-                        'date_time_last_trained': '',
-                        'training_duration': '',
-                        'epochs': '',
-                        'locations_saved': '',
-                        'location_of_metrics': '',
-                        'class_acc_string': '',
-                        'latest_report': ''
-                    }
-
-                    writer.writerow(project_data)
-            
-    def update_csv_memory(self):
-        os.remove("project_tasks.csv")
-        with open("project_tasks.csv", "w", newline='') as file:
-                writer = csv.DictWriter(file, fieldnames=["id","finished_tasks","total_tasks","tracked","title","date_time_last_trained","training_duration","epochs","locations_saved","location_of_metrics","class_acc_string","latest_report"])
-                writer.writeheader()
-
-                projects = self.ls.projects.list()
-                webhooks_set = set([webhook.project for webhook in self.ls.webhooks.list()])
-                
-                for project in projects:
-                    # Extracting available project data
-                    local_project = self.projects[project.id]
-                    project_data = {
-                        'id': project.id,
-                        'finished_tasks': project.num_tasks_with_annotations,
-                        'total_tasks': project.task_number,
-                        'tracked': project.id in webhooks_set,
-                        'title': project.title,
-                        'date_time_last_trained': local_project['date_time_last_trained'],
-                        'training_duration': local_project['training_duration'],
-                        'epochs': local_project['epochs'],
-                        'locations_saved': local_project['locations_saved'],
-                        'location_of_metrics': local_project['location_of_metrics'],
-                        'class_acc_string': local_project['class_acc_string'],
-                        'latest_report': local_project['latest_report']
-                    }
-
-                    writer.writerow(project_data)
+        # Per-project state survives restarts in an embedded database, project_tasks.csv is imported once
+        self.store = ProjectStore(self.service.state_db_path)
+        migrated = self.store.import_csv("project_tasks.csv")
+        if migrated:
+            print(f"[INFO]: Imported {migrated} projects from project_tasks.csv")
+
+        stored = self.store.load()
+        for id, project in stored.items():
+            self.project_finished_tasks_dict[id] = int(project.pop('trained_tasks'))
+            state = project.pop('state')
+            self.projects[id] = project
+            if state >= 2:
+                print(f"[INFO]: Project {id} was {'training' if state == 3 else 'queued'} when the service stopped")
+
+        if not stored: # Load finished_task data from LabelStudio
+            self.refresh_from_label_studio()
+        # Reset states left over from a previous run
+        for id in self.store.ids_in_state(2, 3):
+            self.store.set_state(id, self.state_of(id))
+
+        # LabelStudio is only asked for project counts and webhooks on a schedule instead of on every save
+        self.__refresh_thread = Thread(target=self.__refresh_forever, args=(bool(stored),), name="label-studio-refresh", daemon=True)
+        self.__refresh_thread.start()
+
+        # Models and metrics staged by the training workers are replicated from this process
+        self.replicator = Replicator(self.service)
+        self.replicator.subscribe(self.__on_replication)
+        self.replicator.start()
+
+    def refresh_from_label_studio(self):
+        """ Pulls project counts, titles and tracking status from LabelStudio and persists them in one transaction """
+        fetched_at = time.monotonic()
+        projects = self.ls.projects.list()
+        webhooks_set = set([webhook.project for webhook in self.ls.webhooks.list()])
+        # Only the requests run in the refresh thread, the results are applied by the loop that owns the projects
+        self.runner.call(self.__apply_refresh, projects, webhooks_set, fetched_at).result()
+
+    def __apply_refresh(self, projects, webhooks_set:set, fetched_at:float):
+        refreshed = {}
+        for project in projects:
+            # Training results stay local, only LabelStudio's fields are refreshed
+            local_project = self.projects.get(project.id) or {
+                'date_time_last_trained': '',
+                'training_duration': '',
+                'epochs': '',
+                'locations_saved': '',
+                'location_of_metrics': '',
+                'class_acc_string': '',
+                'latest_report': ''
+            }
+            # A link or unlink made after the webhooks were fetched is newer than LabelStudio's answer
+            tracked = local_project.get('tracked') if self.tracking_changed_at.get(project.id, float('-inf')) > fetched_at \
+                      else project.id in webhooks_set
+            local_project.update({
+                'finished_tasks': project.num_tasks_with_annotations,
+                'total_tasks': project.task_number,
+                'tracked': tracked,
+                'title': project.title
+            })
+            refreshed[project.id] = local_project
+            self.project_finished_tasks_dict.setdefault(project.id, int(project.num_tasks_with_annotations or 0))
+
+        # Projects deleted from LabelStudio are forgotten unless they are still scheduled
+        current = self.projects
+        removed = [id for id in current if id not in refreshed and self.state_of(id) < 2]
+        refreshed.update({id: project for id, project in current.items() if id not in refreshed and id not in removed})
+        self.projects = refreshed
+        self.store.delete(removed)
+
+        self.store.save_many(
+            refreshed,
+            trained_tasks={id: self.project_finished_tasks_dict[id] for id in refreshed if id in self.project_finished_tasks_dict},
+            states={id: self.state_of(id) for id in refreshed})
+        self.persisted_states.update({id: self.state_of(id) for id in refreshed})
+
+    def __refresh_forever(self, refresh_now:bool):
+        if not refresh_now:
+            time.sleep(self.service.label_studio_refresh_minutes * 60)
+        while True:
+            try:
+                self.refresh_from_label_studio()
+            except Exception as e:
+                print(f"[INFO]: Refreshing projects from LabelStudio failed: {e}")
+            time.sleep(self.service.label_studio_refresh_minutes * 60)
+
+    def __on_replication(self, project_id, artifact_id, target, status, location):
+        self.publish('replication', project_id, artifact_id=artifact_id, target=target, status=status, location=location)
+        if status == 'done' and project_id in self.projects:
+            self.__update_locations(project_id)
+
+    def __update_locations(self, project_id:int):
+        """ Shows the targets that already hold the project's latest model and metrics """
+        locations = self.replicator.locations(project_id)
+        if not locations:
+            return
+        self.projects[project_id]['locations_saved'] = ", ".join(f"{target}: {os.path.join(location, 'weights')}" for target, location in locations.items())
+        self.projects[project_id]['location_of_metrics'] = ", ".join(f"{target}: {os.path.join(location, 'metrics')}" for target, location in locations.items())
+        self.save_project(project_id)
+
+    def save_project(self, project_id:int):
+        """ Persists one project's results, training baseline and state """
+        self.store.save(
+            project_id,
+            self.projects[project_id],
+            trained_tasks=self.project_finished_tasks_dict.get(project_id),
+            state=self.state_of(project_id))
+        self.persisted_states[project_id] = self.state_of(project_id)
     
+    def state_of(self, project_id)->int:
+        """ 3 training, 2 queued, 1 tracked, 0 not tracked """
+        return 3 if project_id in self.training_dict else \
+               2 if project_id in self.training_queue_set else \
+               1 if self.projects.get(project_id, {}).get('tracked') == True else \
+               0
+
+    def publish(self, event:str, project_id:int=None, **data):
+        """ Pushes a change to the dashboards, events about a project carry its current state """
+        if project_id is not None:
+            data = {'project_id': project_id, 'state': self.state_of(project_id), **data}
+            # Progress and metrics events arrive every second, the store is only written when the state changes
+            if self.persisted_states.get(project_id) != data['state']:
+                self.store.set_state(project_id, data['state'])
+                self.persisted_states[project_id] = data['state']
+        self.events.publish(event, data)
+
     async def stop_project_in_training(self, project_id):
         self.trainer_dict[project_id].will_cancel = True
+        self.executor.cancel(project_id)
+
+    async def stop_project(self, project_id:int)->str:
+        """ Removes a queued project or cancels its training, returns 'dequeued', 'cancelled' or 'not_found' """
+        if project_id in self.training_queue_set:
+            self.training_queue_set.remove(project_id)
+            self.training_queue.remove(project_id)
+            self.queue_info.pop(project_id, None)
+            self.publish('dequeued', project_id)
+            self.publish('queue', queue=list(self.training_queue))
+            return 'dequeued'
+        if project_id in self.training_dict:
+            await self.stop_project_in_training(project_id)
+            return 'cancelled'
+        return 'not_found'
+
+    def request_training(self, project_id:int):
+        """ Thread-safe, queues a manual training on the Scheduler's loop and returns a future of the decision """
+        return self.runner.submit(self.check_and_train(overrided_project=project_id))
+
+    def request_stop(self, project_id:int):
+        """ Thread-safe, returns a future of stop_project's outcome """
+        return self.runner.submit(self.stop_project(project_id))
+
+    def shutdown(self):
+        """ Cancels running trainings and stops the Scheduler's loop """
+        self.stopping = True
+        for project_id in list(self.training_dict):
+            self.executor.cancel(project_id)
+        self.runner.stop()
+
+    def set_tracked(self, project_id:int, tracked:bool):
+        """ Thread-safe, records a link or unlink on the Scheduler's loop and waits until it is persisted """
+        return self.runner.call(self.__set_tracked, project_id, tracked).result()
+
+    def __set_tracked(self, project_id:int, tracked:bool):
+        self.projects[project_id]['tracked'] = tracked
+        self.tracking_changed_at[project_id] = time.monotonic()
+        self.publish('linked' if tracked else 'unlinked', project_id)
+        self.save_project(project_id)
+
+    def record_webhook(self, payload:dict):
+        """ Thread-safe, hands a LabelStudio webhook to the Scheduler's loop without waiting for it """
+        self.runner.call(self.__record_webhook, payload)
+
+    def __record_webhook(self, payload:dict):
+        """ Updates annotation counts from a LabelStudio webhook and leaves the decision to train to the coalescer """
+        project_id = payload['project']['id']
+        num_annotations = int(payload['project']['num_tasks_with_annotations'])
+
+        if payload.get('action') == 'PROJECT_UPDATED':
+            # Labels or title may have changed, the next Trainer fetches them again
+            self.project_metadata.invalidate(project_id)
+
+        self.telemetry.inc('ml_workflow_webhooks_total', action=payload.get('action') or "")
+        self.latest_annotation_count[project_id] = num_annotations
+        self.project_tasks_dif[project_id] = abs(num_annotations - self.project_finished_tasks_dict[project_id])
+        print(project_id, num_annotations, self.project_finished_tasks_dict[project_id], self.project_tasks_dif[project_id])
+
+        self.coalescer.submit(project_id, {'action': payload.get('action'), 'num_annotations': num_annotations})
+
+    async def __on_annotations_settled(self, project_id, merged):
+        print(f"[INFO]: {merged['events']} webhook events for project {project_id} settled ({', '.join(sorted(merged['actions']))})")
+        self.telemetry.observe('ml_workflow_debounce_wait_seconds', time.monotonic() - merged['first_at'])
+        await self.check_and_train()
+
+    def __record_span(self, project_id:int, trace_id:str, message:dict):
+        """ Records a stage timed by the training worker """
+        attributes = message.get('attributes', {})
+        self.telemetry.record_span(message['stage'], message['seconds'], start=message.get('start'), project_id=project_id, trace_id=trace_id, attributes=attributes)
+        if message['stage'] == 'image_download' and 'bytes' in attributes:
+            self.telemetry.inc('ml_workflow_download_bytes_total', attributes['bytes'])
+            for result in ('downloaded', 'resumed', 'cached', 'failed'):
+                self.telemetry.inc('ml_workflow_download_images_total', attributes.get(result, 0), result=result)
+            self.telemetry.set('ml_workflow_download_bytes_per_second', attributes['bytes'] / max(attributes.get('seconds', 0), 1e-9), project_id=project_id)
+
+    def __finish_cycle(self, project_id:int, trace_id:str, started:float, outcome:str):
+        self.telemetry.inc('ml_workflow_trainings_total', outcome=outcome)
+        self.telemetry.record_span('training_cycle', time.time() - started, start=started, project_id=project_id, trace_id=trace_id, attributes={'outcome': outcome})
+
+    def __release(self, project_id:int, trainer:Trainer):
+        """ Frees the training slot and admission reservation held by trainer, safe to call more than once """
+        # A new training of the project may already have been admitted once this one finished
+        if self.trainer_dict.get(project_id, trainer) is not trainer:
+            return
+        self.training_dict.pop(project_id, None)
+        self.trainer_dict.pop(project_id, None)
+        self.admission.release(project_id)
+
+    async def __train_project(self, id, trainer:Trainer):
+        # Every stage of this cycle, in the worker or here, is traced under one id
+        trace_id = f"{id}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        cycle_started = time.time()
+        finished = set()
+
+        def finish(outcome:str):
+            # The cycle is counted once, even when its bookkeeping fails after the outcome was recorded
+            if not finished:
+                finished.add(outcome)
+                self.__finish_cycle(id, trace_id, cycle_started, outcome)
 
-    async def __listen_for_more_annotations_and_train(self, id, trainer:Trainer):
         try:
-            # Store last amount of annotations made
-            last_amount_annotated = self.project_finished_tasks_dict[id]
+            # Annotations made from here on count towards the next training
+            last_amount_annotated = self.latest_annotation_count.get(id, self.project_finished_tasks_dict[id])
 
-            # Wait 5-minutes before checking if the number of annotations has increased
-            await asyncio.sleep(self.service.minutes_to_wait_for_next_annotation*60)
+            GREEN = '\033[32m'
+            RESET = '\033[0m'
+            print(f"{GREEN}TRAINER {id} BEGAN TRAINING{RESET}")
+            def on_message(message):
+                data = {key: value for key, value in message.items() if key not in ('project_id', 'event')}
+                if message['event'] == 'span':
+                    self.__record_span(id, trace_id, data)
+                elif message['event'] in ('batch_metrics', 'epoch_metrics'):
+                    sample = self.metrics_bus.publish(id, message['event'].split('_')[0], **data)
+                    self.publish('metrics', id, **sample)
+                else:
+                    self.publish('progress', id, event=message['event'], **data)
 
-            # Check if there is the trainer has already began being trained
-            if trainer.is_active:
-                return
+            async def callback(id, train_output):
+                self.project_finished_tasks_dict[id] = last_amount_annotated
+                self.project_tasks_dif[id] = abs(self.latest_annotation_count.get(id, last_amount_annotated) - last_amount_annotated)
+                # Store train output in dict
+                self.projects[id]['epochs'] = train_output['epochs']
+                self.projects[id]['training_duration'] = train_output['training_duration']
+                self.projects[id]['class_acc_string'] = train_output['class_acc_string']
+                self.projects[id]['latest_report'] = train_output['latest_report']
+                self.projects[id]['locations_saved'] = train_output['locations_saved']
+                self.projects[id]['location_of_metrics'] = train_output['location_of_metrics']
+                # Uploads to fast targets may already be done
+                if train_output['locations_saved']:
+                    self.__update_locations(id)
 
-            # Start training if the number of annotations is the same
-            if self.project_finished_tasks_dict[id] > last_amount_annotated:
-                print("Listening for more annotations...")
-                self.training_dict[id] = self.project_finished_tasks_dict[id]
-                await self.__listen_for_more_annotations_and_train(id, trainer)
-                return
-            else:
-                GREEN = '\033[32m'
-                RESET = '\033[0m'
-                print(f"{GREEN}TRAINER {id} BEGAN TRAINING{RESET}")
-                async def callback(id, train_output):
-                    self.project_tasks_dif[id] = 0
-                    self.project_finished_tasks_dict[id] = last_amount_annotated
-                    # Store train output in dict
-                    self.projects[id]['epochs'] = train_output['epochs']
-                    self.projects[id]['training_duration'] = train_output['training_duration']
-                    self.projects[id]['class_acc_string'] = train_output['class_acc_string']
-                    self.projects[id]['latest_report'] = train_output['latest_report']
-                    self.projects[id]['locations_saved'] = train_output['locations_saved']
-                    self.projects[id]['location_of_metrics'] = train_output['location_of_metrics']
-
-                    self.training_dict.pop(id)
-                    self.trainer_dict.pop(id)
-                    self.update_csv_memory()
-                    await self.check_and_train()
-
-                self.train_calls += 1
-                self.projects[id]['date_time_last_trained'] = datetime.now()
-                await trainer.train(callback=callback)
+                self.__release(id, trainer)
+                # Nothing is stored when training or logging its results failed
+                self.publish('saved' if train_output['locations_saved'] else 'failed', id,
+                             epochs=train_output['epochs'],
+                             training_duration=train_output['training_duration'],
+                             locations_saved=train_output['locations_saved'],
+                             latest_report=train_output['latest_report'])
+                self.save_project(id)
+                finish('saved' if train_output['locations_saved'] else 'failed')
+                await self.check_and_train()
+
+            self.train_calls += 1
+            self.metrics_bus.clear(id)
+            self.projects[id]['date_time_last_trained'] = datetime.now()
+            self.publish('training', id, date_time_last_trained=self.projects[id]['date_time_last_trained'])
+            await self.executor.train(trainer, callback=callback, on_message=on_message)
         except asyncio.CancelledError:
             # Log the cancellation
             Logger().log_training_cancellation(trainer)
             self.projects[id]['latest_report'] = trainer.return_dict['latest_report']
-            self.update_csv_memory()
-            
-            self.training_dict.pop(id)
-            self.trainer_dict.pop(id)
+            self.__release(id, trainer)
+            self.save_project(id)
+            self.publish('cancelled', id, latest_report=self.projects[id]['latest_report'])
+            finish('cancelled')
             
             trainer.leave_gym()
             print(f"Training cancelled for {id}")
             await self.check_and_train()
             return
+        except Exception as e:
+            # The worker failed to start or the results could not be recorded, the project must not stay "training"
+            print(f"[ERROR]: Training of project {id} failed: {type(e).__name__}: {e}")
+            traceback.print_exc()
+            self.__release(id, trainer)
+            try:
+                self.save_project(id)
+            except Exception as save_error:
+                print(f"[ERROR]: Could not save the state of project {id}: {save_error}")
+            self.publish('failed', id, latest_report=f"Training failed: {type(e).__name__}: {e}")
+            finish('failed')
+            # Other queued projects can use the freed slot, in a job of their own so this failure does not repeat here
+            if not self.stopping:
+                self.runner.spawn(self.check_and_train())
+        finally:
+            self.__release(id, trainer)
 
 
+    def __enqueue(self, id, priority):
+        if id in self.training_queue_set:
+            # A manual request promotes a job that was queued automatically
+            self.queue_info[id]['priority'] = max(self.queue_info[id]['priority'], priority)
+            return
+        self.training_queue.append(id)
+        self.training_queue_set.add(id)
+        self.queue_info[id] = {
+            'project_id': id,
+            'priority': priority,
+            'enqueued_at': datetime.now()
+        }
+        self.publish('queued', id)
+
     async def check_and_train(self, overrided_project=None):        
+        if self.stopping:
+            return
         # Override
         if overrided_project is not None:
             id = overrided_project
-            if id not in self.training_queue_set and id not in self.training_dict:
-                    self.training_queue.append(id)
-                    self.training_queue_set.add(id)
+            if id not in self.training_dict:
+                    self.__enqueue(id, PRIORITY_MANUAL)
 
         for id, val in self.project_tasks_dif.items():
             if val >= self.service.batch_size_threshold and self.project_finished_tasks_dict[id] > self.service.minimum_annotations_required: # Condition to set for training
                 print('**',id, val, self.project_finished_tasks_dict[id])
+                # Projects still receiving annotations are queued once their webhook events settle
+                if self.coalescer.is_pending(id):
+                    continue
                 # Check if id is not already queued or if the id is training only add it back into the queue if a new batch of data one more batch was labeled while it was training
                 if id not in self.training_queue_set and (id not in self.training_dict or val - self.service.batch_size_threshold > self.service.batch_size_threshold):
-                    self.training_queue.append(id)
-                    self.training_queue_set.add(id)
+                    self.__enqueue(id, PRIORITY_AUTO)
             else:
                 print('-', id, val, self.project_finished_tasks_dict[id])
         
+        # Rank the queue by priority and waiting time, projects still training wait at the end
+        jobs = [{
+            **self.queue_info[id],
+            'num_tasks': int(self.project_finished_tasks_dict.get(id, 0))
+        } for id in self.training_queue if id not in self.training_dict]
+        previous_queue = self.training_queue
+        self.training_queue = [job['project_id'] for job in self.admission.rank(jobs)] + [id for id in self.training_queue if id in self.training_dict]
+        if self.training_queue != previous_queue:
+            self.publish('queue', queue=list(self.training_queue))
+
         print(self.training_queue)
         print("Training Q set size: ", len(self.training_queue_set))
         print("Training set size: ", len(self.training_dict.keys()))
         
-        # Place next item in training set and begin training
-        if len(self.training_dict.keys()) < self.service.async_processes_allowed and len(self.training_queue) > 0:
-            training_tasks = []
-            
-            while len(self.training_dict.keys()) < self.service.async_processes_allowed and len(self.training_queue) > 0:
-                id = self.training_queue[0]
+        # Start every queued job the machine has room for, trainings run as background jobs of the loop
+        admitted = []
+        if jobs and self.admission.has_room():
+            # nvidia-smi can take seconds, webhooks and progress keep being handled while the machine is measured
+            resources = await asyncio.get_running_loop().run_in_executor(None, self.admission.monitor.snapshot)
+            if self.stopping:
+                return
+            # Jobs may have been started or dequeued by another call in the meantime
+            jobs = [job for job in jobs if job['project_id'] in self.training_queue_set and job['project_id'] not in self.training_dict]
+            admitted = self.admission.admit(jobs, resources)
 
-                # If project already being trained don't create a trainer for it yet
-                if id in self.training_dict:
-                    continue
-                
-                self.training_dict[id] = self.project_finished_tasks_dict[id]
-                id = self.training_queue.pop(0)
-                self.training_queue_set.remove(id)
-                
-                self.project_to_time_of_threshold_reached[id] = datetime.now()
-                trainer = Trainer(id, self.ls, self.ls_client)
-                task = asyncio.create_task(self.__listen_for_more_annotations_and_train(id=trainer.project_id, trainer=trainer))
-                training_tasks.append(task)
-                self.trainer_dict[id] = trainer
+        started = False
+        for id, footprint in admitted:
+            self.training_queue.remove(id)
+            self.training_queue_set.remove(id)
+            job = self.queue_info.pop(id, None)
+            if job is not None:
+                self.telemetry.observe('ml_workflow_queue_wait_seconds', (datetime.now() - job['enqueued_at']).total_seconds())
             
             try:
-                await asyncio.gather(*training_tasks)
-            except asyncio.CancelledError:
-                print("CANCELLED HERE")
-                raise RuntimeError(f"Cancelled training")
-        
\ No newline at end of file
+                trainer = Trainer(id, self.ls, self.ls_client, metadata=self.project_metadata)
+            except Exception as e:
+                print(f"[ERROR]: Could not create trainer for project {id}: {e}")
+                self.admission.release(id)
+                self.publish('failed', id, latest_report=f"Could not create trainer: {e}")
+                continue
+            trainer.threads = footprint['threads']
+
+            self.training_dict[id] = self.project_finished_tasks_dict[id]
+            self.project_to_time_of_threshold_reached[id] = datetime.now()
+            self.trainer_dict[id] = trainer
+            self.runner.spawn(self.__train_project(id=trainer.project_id, trainer=trainer))
+            started = True
+
+        if started:
+            self.publish('queue', queue=list(self.training_queue))
@@ -10,6 +10,10 @@ class Service:
         return cls._instance
     
     def __init__(self):
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
         load_dotenv()
         
         # Configure LabelStudio
@@ -22,15 +26,74 @@ class Service:
         self.file_server_shared_folder = os.getenv('SHARED_FOLDER', '--')
         self.file_server_username = os.getenv('USERNAME')
         self.file_server_password = os.getenv('PASSWORD')
+        self.smb_buffer_mb = float(os.getenv('SMB_BUFFER_MB', 4))
+        self.smb_upload_workers = int(os.getenv('SMB_UPLOAD_WORKERS', 4))
+        self.smb_keepalive_seconds = float(os.getenv('SMB_KEEPALIVE_SECONDS', 60))
 
         # Configure USB device detection
         self.usb_key_file_name = os.getenv('USB_KEY_FILENAME', 'None Found')
 
+        # Seconds between background checks of the USB device and file server
+        self.storage_probe_seconds = float(os.getenv('STORAGE_PROBE_SECONDS', 5))
+
         # Configure auto training logic
         self.async_processes_allowed = int(os.getenv('ASYNC_PROCESSES_ALLOWED', 3))
         self.batch_size_threshold = int(os.getenv('BATCH_SIZE_THRESHOLD', 32))
         self.minutes_to_wait_for_next_annotation = float(os.getenv('MINUTES_TO_WAIT_FOR_NEXT_ANNOTATION', 5)) 
         self.minimum_annotations_required = int(os.getenv('MINIMUM_ANNOTATIONS_REQUIRED', 10))
+        self.training_executor = os.getenv('TRAINING_EXECUTOR', 'process')
+        self.admission_aging_minutes = float(os.getenv('ADMISSION_AGING_MINUTES', 5))
+
+        # Configure scheduler state
+        self.state_db_path = os.getenv('STATE_DB_PATH', './memory/state.db')
+        self.label_studio_refresh_minutes = float(os.getenv('LABEL_STUDIO_REFRESH_MINUTES', 10))
+        self.project_cache_seconds = float(os.getenv('PROJECT_CACHE_SECONDS', 300))
+        self.log_max_mb = float(os.getenv('LOG_MAX_MB', 10))
+
+        # Threads the ASGI entry point runs Flask views on, /events streams are served on the event loop instead
+        self.asgi_threads = int(os.getenv('ASGI_THREADS', 16))
+
+        # Configure telemetry, spans of every training cycle are appended to TRACE_PATH when it is set
+        self.trace_path = os.getenv('TRACE_PATH', '')
+
+        # Configure models
+        self.base_model = os.getenv('BASE_MODEL', './models/yolo11n.pt')
+        self.checkpoint_dir = os.getenv('CHECKPOINT_DIR', './checkpoints')
+        self.warm_start = os.getenv('WARM_START', 'True') == 'True'
+        self.cold_start_epochs = int(os.getenv('COLD_START_EPOCHS', 10))
+        self.warm_start_epochs = int(os.getenv('WARM_START_EPOCHS', 5))
+        self.image_size = int(os.getenv('IMAGE_SIZE', 640))
+
+        # Batch sizes picked by AutoBatch are reused per hardware, model variant and image size
+        self.batch_tuning_path = os.getenv('BATCH_TUNING_PATH', './memory/batch_tuning.json')
+
+        # Configure model replication
+        self.replication_targets = os.getenv('REPLICATION_TARGETS', 'usb,smb,local')
+        self.replication_staging_dir = os.getenv('REPLICATION_STAGING_DIR', './staging')
+        self.replication_workers = int(os.getenv('REPLICATION_WORKERS', 3))
+        self.replication_max_attempts = int(os.getenv('REPLICATION_MAX_ATTEMPTS', 10))
+
+        # Configure dataset downloads
+        self.download_workers = int(os.getenv('DOWNLOAD_WORKERS', 8))
+        self.download_retries = int(os.getenv('DOWNLOAD_RETRIES', 3))
+        self.image_cache_dir = os.getenv('IMAGE_CACHE_DIR', './cache/images')
+        self.image_cache_max_gb = float(os.getenv('IMAGE_CACHE_MAX_GB', 20))
+
+        # Configure dataset format, 'packed' stages every split as a few tar shards instead of one file per image
+        self.dataset_format = os.getenv('DATASET_FORMAT', 'files')
+        self.shard_tasks = int(os.getenv('SHARD_TASKS', 512))
+
+        # Configure ingest preprocessing, images are resized to IMAGE_SIZE once when they enter the gym
+        self.ingest_resize = os.getenv('INGEST_RESIZE', 'False') == 'True'
+        self.ingest_quality = int(os.getenv('INGEST_QUALITY', 95))
+        self.preprocess_workers = int(os.getenv('PREPROCESS_WORKERS', os.cpu_count() or 1))
+
+        # Configure train/test/val split
+        self.split_train_ratio = float(os.getenv('SPLIT_TRAIN_RATIO', 0.8))
+        self.split_test_ratio = float(os.getenv('SPLIT_TEST_RATIO', 0.1))
+        self.split_val_ratio = float(os.getenv('SPLIT_VAL_RATIO', 0.1))
+        self.split_stratify = os.getenv('SPLIT_STRATIFY', 'True') == 'True'
+        self.keep_gym = os.getenv('KEEP_GYM', 'True') == 'True'
 
         # Dark mode
         self.dark_mode = os.getenv('DARK_MODE', 'False') == 'True'
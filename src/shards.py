@@ -0,0 +1,166 @@
+import os
+import io
+import json
+import mmap
+import hashlib
+import tarfile
+
+from PIL import Image
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# EXIF orientations that rotate the image by 90 degrees, decoders swap its width and height
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+class ShardPacker:
+    def __init__(self, root:str, shard_tasks:int=512):
+        """
+        Parameters:
+            root: directory of the packed dataset, every split gets a subdirectory of shards.
+            shard_tasks: range of task ids packed into one shard.
+
+        Packs the images and YOLO labels of a split into a few uncompressed tar shards, each with a JSON index of
+        the byte offsets of its images, so staging a project writes a handful of files sequentially instead of two
+        files per task. Tasks are grouped into shards by id range and every shard is named after a hash of its
+        content, so shards whose tasks, images and labels did not change are kept from the previous run.
+        """
+        self.root = root
+        self.shard_tasks = max(1, shard_tasks)
+
+    @staticmethod
+    def __shape(image_path:str)->Optional[Tuple[int, int]]:
+        """ (height, width) read from the image header as the decoder will see it, None for unreadable images """
+        try:
+            with Image.open(image_path) as image:
+                width, height = image.size
+                if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+                    width, height = height, width
+            return height, width
+        except Exception:
+            return None
+
+    @staticmethod
+    def __key(samples:List[Tuple[int, str, str, str]])->str:
+        digest = hashlib.sha1()
+        for task_id, image_id, _, label in samples:
+            digest.update(f"{task_id}\t{image_id}\t{label}\n".encode())
+        return digest.hexdigest()[:20]
+
+    def __write_shard(self, split_dir:str, key:str, samples:List[Tuple[int, str, str, str]])->int:
+        tar_path = os.path.join(split_dir, f"{key}.tar")
+        tmp_path = tar_path + ".tmp"
+        entries = []
+        with tarfile.open(tmp_path, "w", format=tarfile.GNU_FORMAT, dereference=True) as tar:
+            for task_id, _, image_path, label in samples:
+                shape = self.__shape(image_path)
+                if shape is None:
+                    print(f"[WARN]: Skipped unreadable image of task {task_id}: {image_path}")
+                    continue
+                tar.add(image_path, arcname=f"{task_id}.jpg", recursive=False)
+                data = label.encode()
+                info = tarfile.TarInfo(f"{task_id}.txt")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                entries.append({'name': f"{task_id}.jpg", 'label': label, 'shape': shape})
+
+        # Offsets are only known once the headers are written, reading them back skips over the image data
+        offsets = {}
+        with tarfile.open(tmp_path, "r") as tar:
+            for member in tar:
+                offsets[member.name] = (member.offset_data, member.size)
+        for entry in entries:
+            entry['offset'], entry['size'] = offsets[entry['name']]
+
+        index_path = os.path.join(split_dir, f"{key}.json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump({'samples': entries}, f)
+        os.replace(tmp_path, tar_path)
+        os.replace(index_path + ".tmp", index_path)
+        return len(entries)
+
+    def pack(self, split:str, samples:Iterable[Tuple[int, str, str, str]])->dict:
+        """
+        Parameters:
+            split: 'train', 'test' or 'val'.
+            samples: (task id, image identity, image path, YOLO label text) of every task in the split. The image
+                identity is anything that changes with the image content, such as its cache hash.
+
+        Returns a report with the number of shards written and reused and the number of samples packed.
+        """
+        split_dir = os.path.join(self.root, split)
+        os.makedirs(split_dir, exist_ok=True)
+
+        groups = {}
+        for sample in sorted(samples, key=lambda sample: sample[0]):
+            groups.setdefault(sample[0] // self.shard_tasks, []).append(sample)
+
+        report = {'written': 0, 'reused': 0, 'samples': 0}
+        keys = []
+        for _, group in sorted(groups.items()):
+            key = self.__key(group)
+            keys.append(key)
+            if os.path.exists(os.path.join(split_dir, f"{key}.tar")) and os.path.exists(os.path.join(split_dir, f"{key}.json")):
+                report['reused'] += 1
+                continue
+            report['samples'] += self.__write_shard(split_dir, key, group)
+            report['written'] += 1
+
+        manifest_path = os.path.join(split_dir, "index.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({'shards': keys}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        # Shards of task ranges that changed since the previous run
+        for file in os.listdir(split_dir):
+            if file.split(".")[0] not in keys and file != "index.json":
+                os.remove(os.path.join(split_dir, file))
+        return report
+
+class ShardReader:
+    def __init__(self, split_dir:str):
+        """
+        Parameters:
+            split_dir: directory of one split written by ShardPacker.
+
+        Random access to the images of a packed split through memory maps of its shards. The maps are opened lazily
+        in every process, so the reader can be handed to forked or spawned dataloader workers.
+        """
+        self.split_dir = split_dir
+        with open(os.path.join(split_dir, "index.json")) as f:
+            keys = json.load(f)['shards']
+
+        self.samples: Dict[str, dict] = {}
+        for key in keys:
+            with open(os.path.join(split_dir, f"{key}.json")) as f:
+                for sample in json.load(f)['samples']:
+                    sample['shard'] = key
+                    self.samples[self.path_of(key, sample['name'])] = sample
+        self.__maps = {}
+        self.__pid = os.getpid()
+
+    def path_of(self, key:str, name:str)->str:
+        """ Path a sample is known by, it only exists inside its shard """
+        return os.path.join(self.split_dir, f"{key}.tar", name)
+
+    def files(self)->List[str]:
+        return list(self.samples)
+
+    def __map(self, key:str)->mmap.mmap:
+        if os.getpid() != self.__pid:
+            # Maps of the parent are not shared with worker processes
+            self.__maps = {}
+            self.__pid = os.getpid()
+        if key not in self.__maps:
+            with open(os.path.join(self.split_dir, f"{key}.tar"), "rb") as f:
+                self.__maps[key] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__maps[key]
+
+    def read(self, path:str)->memoryview:
+        """ Encoded image of a sample, without copying it out of the page cache """
+        sample = self.samples[path]
+        return memoryview(self.__map(sample['shard']))[sample['offset']:sample['offset'] + sample['size']]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_ShardReader__maps'] = {}
+        return state
@@ -0,0 +1,106 @@
+import time
+import threading
+import smbclient
+from smbprotocol.exceptions import SMBConnectionClosed
+
+from typing import Callable
+from service import Service
+
+class SmbSessionPool:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(SmbSessionPool, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, service:Service=None):
+        """
+        Parameters:
+            service: shared service configuration (file server credentials, SMB_BUFFER_MB, SMB_UPLOAD_WORKERS,
+                SMB_KEEPALIVE_SECONDS).
+
+        Long-lived SMB session of the process. The session is registered once and kept alive by a background thread,
+        instead of being registered again for every saved file. Directories already created on the share are
+        remembered, and a dropped connection is re-established once before an operation fails. smbclient multiplexes
+        the open files of all threads over the one connection, so the Replicator keeps several files in flight
+        with large write buffers.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.service = service if service is not None else Service()
+        self.buffer_size = int(self.service.smb_buffer_mb * 1024**2)
+        self.upload_workers = self.service.smb_upload_workers
+        self.__lock = threading.Lock()
+        self.__registered = False
+        self.__directories = set()
+        self.__thread = None
+
+    def share_root(self)->str:
+        return f"//{self.service.file_server_ip}/{self.service.file_server_shared_folder}"
+
+    def __register(self):
+        smbclient.register_session(self.service.file_server_ip, username=self.service.file_server_username, password=self.service.file_server_password)
+        self.__registered = True
+
+    def session(self)->str:
+        """ Registers the session on first use and returns the root of the shared folder """
+        with self.__lock:
+            if not self.__registered:
+                self.__register()
+                print("[SUCCESS]: File server session registered")
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__keepalive_forever, name="smb-keepalive", daemon=True)
+                self.__thread.start()
+        return self.share_root()
+
+    def reconnect(self):
+        """ Drops the cached connection and registers a new session """
+        with self.__lock:
+            self.__registered = False
+            self.__directories.clear()
+            try:
+                smbclient.reset_connection_cache()
+            except Exception as e:
+                print(f"[INFO]: Closing the file server connection failed: {e}")
+            self.__register()
+        print("[INFO]: Reconnected to the file server")
+
+    def __with_reconnect(self, operation:Callable):
+        self.session()
+        try:
+            return operation()
+        except (SMBConnectionClosed, ConnectionError):
+            self.reconnect()
+            return operation()
+
+    def __keepalive_forever(self):
+        while True:
+            time.sleep(self.service.smb_keepalive_seconds)
+            if not self.__registered:
+                continue
+            # A cheap request keeps idle servers from closing the connection, and notices when they did
+            try:
+                smbclient.stat(self.share_root())
+            except Exception as e:
+                print(f"[INFO]: File server keepalive failed, reconnecting: {e}")
+                try:
+                    self.reconnect()
+                except Exception as e:
+                    print(f"[INFO]: Could not reconnect to the file server: {e}")
+
+    def makedirs(self, path:str):
+        """ Creates a remote directory, once per session """
+        if path in self.__directories:
+            return
+        self.__with_reconnect(lambda: smbclient.makedirs(path, exist_ok=True))
+        with self.__lock:
+            self.__directories.add(path)
+
+    def open(self, path:str, mode:str):
+        return self.__with_reconnect(lambda: smbclient.open_file(path, mode=mode, buffering=self.buffer_size))
+
+    def replace(self, source:str, destination:str):
+        self.__with_reconnect(lambda: smbclient.replace(source, destination))
@@ -0,0 +1,92 @@
+import hashlib
+from collections import Counter, defaultdict
+
+from typing import Dict, List
+
+SPLITS = ('train', 'test', 'val')
+
+def task_hash(task_id:int, salt:str='')->float:
+    """ Maps a task id to a stable number in [0, 1) """
+    digest = hashlib.sha1(f"{salt}:{task_id}".encode()).hexdigest()
+    return int(digest[:15], 16) / 16**15
+
+def task_classes(result:list)->List[str]:
+    """ Class names used by a LabelStudio annotation result, whatever the control type """
+    classes = []
+    for obj in result:
+        for key, value in obj.get('value', {}).items():
+            if key.endswith('labels') and isinstance(value, list):
+                classes.extend(value)
+    return classes
+
+class StableSplitter:
+    def __init__(self, train_ratio=0.8, test_ratio=0.1, val_ratio=0.1, stratify=True, salt=''):
+        """
+        Parameters:
+            train_ratio, test_ratio, val_ratio: target share of tasks in each split, must sum to 1.
+            stratify: balance each class across the splits instead of relying on the hash alone.
+            salt: changes every assignment at once, e.g. to draw a new validation set on purpose.
+
+        Assigns tasks to train/test/val deterministically from a hash of their id. Tasks keep the split they
+        were given before, so new annotations only add files to the existing splits.
+        """
+        if not (0 <= train_ratio <= 1 and 0 <= test_ratio <= 1 and 0 <= val_ratio <= 1):
+            raise ValueError("Ratios must be between 0 and 1")
+        if abs((train_ratio + test_ratio + val_ratio) - 1.0) > 1e-6:
+            raise ValueError("Ratios must sum to 1")
+
+        self.ratios = {'train': train_ratio, 'test': test_ratio, 'val': val_ratio}
+        self.stratify = stratify
+        self.salt = salt
+
+    def bucket(self, task_id:int)->str:
+        """ Split a task falls into from its hash alone """
+        h = task_hash(task_id, self.salt)
+        edge = 0
+        for split in SPLITS:
+            edge += self.ratios[split]
+            if h < edge:
+                return split
+        return SPLITS[-1]
+
+    def assign(self, tasks:list, previous:Dict[int, str]=None)->Dict[int, str]:
+        """
+        Parameters:
+            tasks: compact tasks from the TaskIndex ('id' and 'result').
+            previous: earlier assignments, kept as they are for tasks that still exist.
+
+        Returns the split of every task.
+        """
+        previous = previous or {}
+        assignment = {task['id']: previous[task['id']] for task in tasks if previous.get(task['id']) in SPLITS}
+        new_tasks = sorted(
+            (task for task in tasks if task['id'] not in assignment),
+            key=lambda task: task_hash(task['id'], self.salt))
+
+        if not self.stratify:
+            for task in new_tasks:
+                assignment[task['id']] = self.bucket(task['id'])
+            return assignment
+
+        # Each task is stratified by its rarest class so small classes still reach the val and test sets
+        frequency = Counter(name for task in tasks for name in set(task_classes(task['result'])))
+        def stratum(task):
+            classes = set(task_classes(task['result']))
+            return min(classes, key=lambda name: (frequency[name], name)) if classes else ''
+
+        counts = defaultdict(Counter)
+        for task in tasks:
+            if task['id'] in assignment:
+                counts[stratum(task)][assignment[task['id']]] += 1
+
+        for task in new_tasks:
+            group = counts[stratum(task)]
+            total = sum(group.values()) + 1
+            preferred = self.bucket(task['id'])
+            split = max(SPLITS, key=lambda split: (
+                self.ratios[split] * total - group[split],
+                split == preferred,
+                -SPLITS.index(split)))
+            group[split] += 1
+            assignment[task['id']] = split
+        return assignment
@@ -0,0 +1,183 @@
+import os
+import time
+from contextlib import contextmanager
+
+from downloader import DatasetDownloader
+from cache import ImageCache
+from taskIndex import TaskIndex
+from split import StableSplitter
+from converter import YoloConverter
+from shards import ShardPacker
+from preprocess import ImagePreprocessor
+from service import Service
+
+from typing import Callable, Dict, List
+
+SPLITS = ('train', 'test', 'val')
+
+@contextmanager
+def untimed(stage:str, **attributes):
+    """ Default span of stage_dataset, stages run without being measured """
+    yield attributes
+
+def stage_dataset(project_id:int, project_client, labels:List[str], service:Service, span:Callable=untimed,
+                  should_stop:Callable[[], bool]=None, threads:int=None)->dict:
+    """
+    Parameters:
+        project_id: the id associated with the LabelStudio project.
+        project_client: LabelStudio SDK project the tasks are fetched from.
+        labels: class names of the project, in YOLO class id order.
+        service: configuration of the split, dataset format, downloads, image cache and ingest preprocessing.
+        span: context manager factory timing each stage, called with the stage name and its attributes and
+            yielding the attributes so stages can add to them.
+        should_stop: polled during the download, a True return stops it early.
+        threads: CPU threads granted to the training, bounds the image preprocessing when set.
+
+    Brings the project's gym up to date for training: syncs the task index, assigns splits, removes stale gym
+    files, writes the labels and downloads the images, optionally resizes them and packs them into shards.
+    Needs no torch, the benchmarks stage datasets through the same steps a training does.
+
+    Returns the task counts per split, the task index changes and the download report.
+    """
+    gym = f"./gym/project_{project_id}"
+    task_index = TaskIndex(project_id)
+    with span('task_fetch'):
+        changes = task_index.sync(project_client)
+    tasks = task_index.tasks()
+
+    splits = task_index.assign_splits(StableSplitter(
+        service.split_train_ratio,
+        service.split_test_ratio,
+        service.split_val_ratio,
+        stratify=service.split_stratify))
+    groups = {split: [] for split in SPLITS}
+    for task in tasks:
+        groups[splits[task['id']]].append(task)
+
+    counts = {
+        "total":len(tasks),
+        "train":len(groups['train']),
+        "test":len(groups['test']),
+        "val":len(groups['val'])
+    }
+    print(f"[INFO]: Split tasks into train/test/val sets: {counts}")
+    prune_gym(gym, splits)
+
+    packed = service.dataset_format == 'packed'
+    resize = service.ingest_resize
+    jobs = []
+    label_files = []
+    gym_images = []
+    for group_type, group in groups.items():
+        if not packed:
+            for folder in ("images", "labels"):
+                os.makedirs(f"{gym}/{folder}/{group_type}", exist_ok=True)
+        for task in group:
+            if packed:
+                # Images stay in the cache until they are packed into shards
+                jobs.append((service.label_studio_url+task['image'], None))
+                continue
+            # Name files after the task so resumed downloads land on the same paths
+            img_path = os.path.join(f"{gym}/images/{group_type}", f"{task['id']}.jpg")
+            label_path = os.path.join(f"{gym}/labels/{group_type}", f"{task['id']}.txt")
+            # Resized images are linked into the gym after preprocessing instead of the downloads
+            jobs.append((service.label_studio_url+task['image'], None if resize else img_path))
+            label_files.append((label_path, task['result']))
+            gym_images.append((service.label_studio_url+task['image'], img_path, label_path))
+
+    converter = YoloConverter(labels)
+    if not packed:
+        with span('label_conversion', labels=len(label_files)):
+            converter.write_many(label_files)
+
+    cache = ImageCache(
+        service.image_cache_dir,
+        max_bytes=int(service.image_cache_max_gb * 1024**3))
+    downloader = DatasetDownloader(
+        service.label_studio_api_key,
+        workers=service.download_workers,
+        retries=service.download_retries,
+        cache=cache)
+    preprocessor = ImagePreprocessor(
+        os.path.join(service.image_cache_dir, "resized"),
+        service.image_size,
+        workers=threads or service.preprocess_workers,
+        quality=service.ingest_quality)
+    sync_start = time.time()
+    try:
+        with span('image_download', images=len(jobs)) as attributes:
+            download_report = downloader.download_all(
+                jobs,
+                manifest_path=f"{gym}/downloads.tsv",
+                should_stop=should_stop)
+            attributes.update(download_report)
+        images = None
+        if resize:
+            with span('preprocess_images', images=len(jobs)) as attributes:
+                images, report = preprocess_images(preprocessor, [url for url, _ in jobs], cache)
+                attributes.update({key: report[key] for key in ('resized', 'kept', 'reused', 'corrupt')})
+            download_report['corrupt'] = report['corrupt']
+            if not packed:
+                link_images(gym_images, images)
+        if packed:
+            with span('pack_dataset'):
+                pack_dataset(f"{gym}/shards", service.shard_tasks, groups, converter, cache, service.label_studio_url, images)
+        # Images linked into this gym are kept, everything else competes for the size cap
+        if cache.evict(keep_since=sync_start) and resize:
+            preprocessor.prune(lambda name: os.path.exists(cache.blob_path(name)))
+    finally:
+        downloader.close()
+        cache.close()
+    if converter.skipped:
+        print(f"[WARN]: Skipped {converter.skipped} regions with labels missing from the project config")
+    return {'counts': counts, 'changes': changes, 'download': download_report}
+
+def preprocess_images(preprocessor:ImagePreprocessor, urls:list, cache:ImageCache)->tuple:
+    """ Resizes the cached images of urls to the training size, returns the image of every url (None for corrupt or missing ones) and the report """
+    sources = {url: cache.lookup(url) for url in urls}
+    processed, report = preprocessor.prepare([path for path in sources.values() if path is not None])
+    images = {url: processed.get(path) if path is not None else None for url, path in sources.items()}
+    if report['corrupt']:
+        corrupt = [url for url, path in sources.items() if path is not None and processed.get(path) is None]
+        print(f"[WARN]: Skipped {report['corrupt']} corrupt images: {', '.join(corrupt[:10])}{' ...' if len(corrupt) > 10 else ''}")
+    return images, report
+
+def link_images(gym_images:list, images:dict):
+    """ Places the resized images in the gym, tasks without a usable image lose their label file too """
+    for url, img_path, label_path in gym_images:
+        if images.get(url) is not None:
+            ImageCache.link(images[url], img_path)
+            continue
+        for path in (img_path, label_path):
+            if os.path.lexists(path):
+                os.remove(path)
+
+def pack_dataset(root:str, shard_tasks:int, groups:Dict[str, list], converter:YoloConverter, cache:ImageCache, label_studio_url:str, images:dict=None):
+    """
+    Packs every split into shards, shards of unchanged task ranges are reused from the previous run. images maps
+    urls to preprocessed images, without it the cached downloads are packed.
+    """
+    packer = ShardPacker(root, shard_tasks)
+    for split, group in groups.items():
+        labels = converter.convert_many(task['result'] for task in group)
+        samples = []
+        for task, label in zip(group, labels):
+            url = label_studio_url+task['image']
+            image_path = images.get(url) if images is not None else cache.lookup(url)
+            # Failed downloads and corrupt images were already reported
+            if image_path is not None:
+                samples.append((task['id'], os.path.basename(image_path), image_path, label))
+        report = packer.pack(split, samples)
+        print(f"[INFO]: Packed {split} split: {report['written']} shards written ({report['samples']} images), {report['reused']} reused")
+
+def prune_gym(gym:str, splits:dict):
+    """ Removes files of a kept gym whose task was deleted or is not in that split """
+    for kind in ("images", "labels"):
+        for split in SPLITS:
+            folder = f"{gym}/{kind}/{split}"
+            if not os.path.isdir(folder):
+                continue
+            for file in os.listdir(folder):
+                stem = file.split(".")[0]
+                if not stem.isdigit() or splits.get(int(stem)) != split:
+                    os.remove(os.path.join(folder, file))
@@ -0,0 +1,127 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+
+from label_studio_sdk.data_manager import Filters, Column, Operator, Type
+
+from split import StableSplitter
+
+class TaskIndex:
+    # Tasks touched shortly before the last sync are fetched again in case LabelStudio's clock runs behind ours
+    SYNC_OVERLAP = timedelta(minutes=1)
+
+    def __init__(self, project_id:int, memory_path:str=None):
+        """
+        Parameters:
+            project_id: the id associated with the LabelStudio project.
+            memory_path: folder holding the index, defaults to the project's service memory.
+
+        Local copy of the labeled tasks of a project (image url and annotation result only). Each sync only asks
+        LabelStudio for tasks created or updated since the previous one.
+        """
+        self.project_id = project_id
+        self.memory_path = memory_path or f'./memory/project-{project_id}'
+        self.index_path = os.path.join(self.memory_path, 'task_index.json')
+        self.last_sync = None
+        self.__tasks = {}
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                stored = json.load(f)
+            self.last_sync = datetime.fromisoformat(stored['last_sync']) if stored['last_sync'] else None
+            self.__tasks = {int(id): task for id, task in stored['tasks'].items()}
+
+    def __save(self):
+        os.makedirs(self.memory_path, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+                'tasks': self.__tasks
+            }, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def compact(task:dict):
+        """ Keeps only what training needs from a LabelStudio task, None if it has no annotation """
+        annotations = task.get('annotations') or []
+        if not annotations:
+            return None
+        return {
+            'id': task['id'],
+            'image': task['data']['image'],
+            'result': annotations[0]['result'],
+            'updated_at': task.get('updated_at')
+        }
+
+    def sync(self, project_client)->dict:
+        """
+        Parameters:
+            project_client: LabelStudio project to pull changes from.
+
+        Brings the index up to date and returns the number of added, updated and removed tasks.
+        """
+        sync_started = datetime.now(timezone.utc)
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+
+        # Only ids are listed in full, which also catches deleted tasks and tasks whose annotations were all deleted
+        labeled_ids = set(project_client.get_labeled_tasks_ids())
+        for id in [id for id in self.__tasks if id not in labeled_ids]:
+            self.__tasks.pop(id)
+            changes['removed'] += 1
+
+        if self.last_sync is None:
+            print(f"[INFO]: Full task sync for project {self.project_id}")
+            tasks = project_client.get_labeled_tasks()
+        else:
+            since = Filters.datetime(self.last_sync - self.SYNC_OVERLAP)
+            filters = Filters.create(Filters.OR, [
+                Filters.item(Column.updated_at, Operator.GREATER_OR_EQUAL, Type.Datetime, Filters.value(since)),
+                Filters.item(Column.completed_at, Operator.GREATER_OR_EQUAL, Type.Datetime, Filters.value(since)),
+            ])
+            tasks = project_client.get_tasks(filters=filters)
+            print(f"[INFO]: Incremental task sync for project {self.project_id}: {len(tasks)} changed tasks")
+
+        for task in tasks:
+            entry = self.compact(task)
+            if entry is None or entry['id'] not in labeled_ids:
+                if self.__tasks.pop(task['id'], None) is not None:
+                    changes['removed'] += 1
+                continue
+            if entry['id'] in self.__tasks:
+                # Updated tasks stay in the split they were assigned to
+                entry['split'] = self.__tasks[entry['id']].get('split')
+                changes['updated'] += 1
+            else:
+                changes['added'] += 1
+            self.__tasks[entry['id']] = entry
+
+        # Tasks labeled in the meantime but missed by the filter are fetched by id
+        missing = [id for id in labeled_ids if id not in self.__tasks]
+        if missing:
+            for task in project_client.get_tasks(selected_ids=missing):
+                entry = self.compact(task)
+                if entry is not None:
+                    self.__tasks[entry['id']] = entry
+                    changes['added'] += 1
+
+        self.last_sync = sync_started
+        self.__save()
+        print(f"[INFO]: Task index for project {self.project_id}: {len(self.__tasks)} tasks ({changes})")
+        return changes
+
+    def assign_splits(self, splitter:StableSplitter)->dict:
+        """ Gives every task without a split one and returns the split of every task """
+        previous = {id: task.get('split') for id, task in self.__tasks.items()}
+        assignment = splitter.assign(self.tasks(), previous)
+        if any(previous[id] != split for id, split in assignment.items()):
+            for id, split in assignment.items():
+                self.__tasks[id]['split'] = split
+            self.__save()
+        return assignment
+
+    def tasks(self)->list:
+        return sorted(self.__tasks.values(), key=lambda task: task['id'])
+
+    def __len__(self):
+        return len(self.__tasks)
@@ -0,0 +1,133 @@
+import os
+import json
+import math
+import time
+import threading
+from datetime import datetime
+
+from typing import Dict, Tuple
+
+# Upper bounds (seconds) of histogram buckets, from a quick label conversion up to a long training
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, math.inf)
+
+# name: (type, help, label names)
+METRICS = {
+    'ml_workflow_webhooks_total': ('counter', "LabelStudio webhooks received", ('action',)),
+    'ml_workflow_debounce_wait_seconds': ('histogram', "Time from a project's first webhook until its events settled", ()),
+    'ml_workflow_queue_wait_seconds': ('histogram', "Time a project waited in the training queue", ()),
+    'ml_workflow_stage_seconds': ('histogram', "Duration of the stages of a training cycle", ('stage',)),
+    'ml_workflow_trainings_total': ('counter', "Finished training cycles by outcome", ('outcome',)),
+    'ml_workflow_download_bytes_total': ('counter', "Image bytes downloaded from LabelStudio", ()),
+    'ml_workflow_download_images_total': ('counter', "Images staged for training by source", ('result',)),
+    'ml_workflow_download_bytes_per_second': ('gauge', "Download rate of a project's latest sync", ('project_id',)),
+    'ml_workflow_replication_seconds': ('histogram', "Time to copy an artifact to a target", ('target', 'status')),
+    'ml_workflow_replication_bytes_total': ('counter', "Artifact bytes copied to each target", ('target',)),
+    'ml_workflow_replication_outbox': ('gauge', "Artifact copies in the replication outbox by status", ('status',)),
+    'ml_workflow_queue_length': ('gauge', "Projects waiting in the training queue", ()),
+    'ml_workflow_trainings_running': ('gauge', "Trainings currently running", ()),
+}
+
+def escape_label_value(value:str)->str:
+    """ Label values can come from webhook payloads, a quote or newline in one must not break the exposition format """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Telemetry:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(Telemetry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self, trace_path:str=None):
+        """
+        Parameters:
+            trace_path: JSON lines file every recorded span is appended to, None keeps spans as metrics only.
+
+        Counters, gauges and histograms of the training pipeline, rendered in the Prometheus text format for the
+        /metrics endpoint. Stages measured in a training worker reach the scheduler's process as 'span' messages
+        and are recorded here, so one endpoint covers the whole cycle.
+        """
+        if hasattr(self, '_initialized') and self._initialized:
+            return
+        self._initialized = True
+
+        self.trace_path = trace_path
+        self.__lock = threading.Lock()
+        self.__values: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self.__histograms: Dict[Tuple[str, Tuple[str, ...]], dict] = {}
+
+    @staticmethod
+    def __key(name:str, labels:dict)->Tuple[str, Tuple[str, ...]]:
+        return name, tuple(str(labels.get(label, "")) for label in METRICS[name][2])
+
+    def inc(self, name:str, value:float=1, **labels):
+        key = self.__key(name, labels)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + value
+
+    def set(self, name:str, value:float, **labels):
+        with self.__lock:
+            self.__values[self.__key(name, labels)] = value
+
+    def observe(self, name:str, value:float, **labels):
+        key = self.__key(name, labels)
+        with self.__lock:
+            histogram = self.__histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record_span(self, stage:str, seconds:float, start:float=None, project_id:int=None, trace_id:str=None, attributes:dict=None):
+        """ Records a timed stage of a training cycle, and traces it when a trace file is configured """
+        self.observe('ml_workflow_stage_seconds', seconds, stage=stage)
+        if self.trace_path is None:
+            return
+        span = {
+            'trace_id': trace_id,
+            'stage': stage,
+            'project_id': project_id,
+            'start': datetime.fromtimestamp(start if start is not None else time.time() - seconds).isoformat(timespec="milliseconds"),
+            'seconds': seconds,
+            'attributes': attributes or {}
+        }
+        line = json.dumps(span, default=str) + "\n"
+        with self.__lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+            with open(self.trace_path, "a") as f:
+                f.write(line)
+
+    @staticmethod
+    def __labels(name:str, values:Tuple[str, ...], extra:str="")->str:
+        pairs = [f'{label}="{escape_label_value(value)}"' for label, value in zip(METRICS[name][2], values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self)->str:
+        """ Every metric in the Prometheus text exposition format """
+        with self.__lock:
+            values = dict(self.__values)
+            histograms = {key: {**histogram, 'buckets': list(histogram['buckets'])} for key, histogram in self.__histograms.items()}
+
+        lines = []
+        for name, (kind, help, _) in METRICS.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (metric, label_values), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(BUCKETS, histogram['buckets']):
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        bucket = 'le="' + le + '"'
+                        lines.append(f"{name}_bucket{self.__labels(name, label_values, bucket)} {count}")
+                    lines.append(f"{name}_sum{self.__labels(name, label_values)} {histogram['sum']}")
+                    lines.append(f"{name}_count{self.__labels(name, label_values)} {histogram['count']}")
+            else:
+                for (metric, label_values), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self.__labels(name, label_values)} {value}")
+        return "\n".join(lines) + "\n"
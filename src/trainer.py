@@ -1,22 +1,27 @@
 import yaml
 import os
 
-import requests
 import shutil
 import asyncio
-from tqdm import tqdm
-import random
+import time
+import resource
 from datetime import datetime
 import pandas as pd
 
 import torch
 import traceback
-from ultralytics import YOLO
+from contextlib import contextmanager
 
 from label_studio_sdk.client import LabelStudio
 from label_studio_sdk import Client
 
 from transporter import ModelTransporter
+from staging import stage_dataset
+from packedDataset import PackedDetectionTrainer
+from checkpoints import CheckpointRegistry, ModelCache
+from batchTuning import BatchTuningCache
+from projectCache import ProjectMetadataCache
+from service import Service
 from logger import Logger
 
 LABEL_STUDIO_URL = os.getenv("LABEL_STUDIO_URL")
@@ -24,26 +29,38 @@ API_KEY = os.getenv("API_KEY")
 USB_KEY_FILENAME = os.getenv("USB_KEY_FILENAME")
 
 class Trainer:
-    def __init__(self, project_id:int, ls:LabelStudio, ls_client:Client):
+    def __init__(self, project_id:int, ls:LabelStudio, ls_client:Client, service:Service=None, metadata:ProjectMetadataCache=None):
         """
         Parameters:
             project_id: the id associated with the LabelStudio project.
 
+            service: shared service configuration, defaults to the Service singleton.
+
+            metadata: cache of LabelStudio project details shared with the Scheduler, a private one is made when None.
+
         Handles creating the yaml file, loading in images and labels into train, validate, and test, and training on the best model for the project. 
+        Creating a Trainer is cheap: project details are fetched on first use and the model and gym are prepared once training begins.
         """
-        print(f"[INFO]: Created trainer for project {project_id}: {ls.projects.get(project_id).title}")
+        print(f"[INFO]: Created trainer for project {project_id}")
         
-        self.project_client = ls_client.get_project(id=project_id)
         self.project_id = project_id
-        self.project = ls.projects.get(id=project_id)
         
         self.ls_client = ls_client
         self.ls = ls
+        self.service = service if service is not None else Service()
+        self.metadata = metadata if metadata is not None else ProjectMetadataCache(ls, ls_client, self.service.project_cache_seconds)
+
+        # Title and labels as the training began, reports written after a long model.train make no LabelStudio
+        # request. Recorded by prepare(), worker processes receive them from the Scheduler's cache instead.
+        self.project_details = None
         
-        self.labels = list(list(ls.projects.get(project_id).get_label_interface().labels)[0].keys())
-        self.data_count_map = {}
+        self.data_count_map = {"total": 0, "train": 0, "test": 0, "val": 0}
+        self.download_report = {}
 
-        self.model = YOLO("./models/yolo11n.pt")
+        # Fine-tune the project's last best weights when its labels did not change since, resolved in prepare()
+        self.checkpoints = CheckpointRegistry(self.service.checkpoint_dir)
+        self.warm_start_path = None
+        self.model = None
         self.return_dict = {
             "epochs": None,
             "training_duration": None,
@@ -54,28 +71,109 @@ class Trainer:
         }
         self.save_folder = f"project_{project_id}"
 
+        # Batch size and throughput the run actually trained with, -1 until AutoBatch or the tuning cache decided
+        self.tuning = {'batch_size': -1, 'image_size': self.service.image_size, 'images_per_second': None, 'cached': False}
+
         self.is_active = False
 
         self.will_cancel = False
 
+        # Progress reporting, set by the TrainingExecutor when training runs in a worker process
+        self.on_event = None
+        self.progress = {}
+
+        # CPU threads granted by the scheduler's admission control, None lets torch decide
+        self.threads = None
+
+    @property
+    def project(self):
+        return self.metadata.project(self.project_id)
+
+    @property
+    def labels(self)->list:
+        if self.project_details is not None:
+            return self.project_details['labels']
+        return self.metadata.labels(self.project_id)
+
+    @property
+    def title(self)->str:
+        if self.project_details is not None:
+            return self.project_details['title']
+        return self.project.title
+
+    def record_project_details(self)->dict:
+        """ Fixes the title and labels for the rest of the training and returns them """
+        if self.project_details is None:
+            self.project_details = {'title': self.project.title, 'labels': self.metadata.labels(self.project_id)}
+        return self.project_details
+
+    @property
+    def project_client(self):
+        return self.metadata.project_client(self.project_id)
+
+    @property
+    def model_name(self)->str:
+        return self.warm_start_path or self.service.base_model
+
+    def prepare(self):
+        """ Creates the gym directories and loads the model, only done once training begins """
+        if self.model is not None:
+            return
+        self.record_project_details()
         try:
-            os.makedirs(f"./gym/project_{project_id}/images/train",exist_ok=True)
-            os.makedirs(f"./gym/project_{project_id}/images/test",exist_ok=True)
-            os.makedirs(f"./gym/project_{project_id}/images/val",exist_ok=True)
-            os.makedirs(f"./gym/project_{project_id}/labels/train",exist_ok=True)
-            os.makedirs(f"./gym/project_{project_id}/labels/test",exist_ok=True)
-            os.makedirs(f"./gym/project_{project_id}/labels/val",exist_ok=True)
+            os.makedirs(f"./gym/project_{self.project_id}", exist_ok=True)
+            # Packed datasets are staged as shards only
+            if self.service.dataset_format != 'packed':
+                for folder in ("images", "labels"):
+                    for split in ("train", "test", "val"):
+                        os.makedirs(f"./gym/project_{self.project_id}/{folder}/{split}", exist_ok=True)
         except Exception as e:
             print("[ERROR]: There was an issue creating the directories to train the model:")
             print(e)
             raise Exception("Could not initiate training!")
 
+        if self.service.warm_start:
+            self.warm_start_path = self.checkpoints.warm_start(self.project_id, self.labels, self.service.base_model)
+        self.model = ModelCache().load(self.model_name)
+
+    def emit(self, event, **data):
+        if event != 'span':
+            self.progress = {'event': event, 'project_id': self.project_id, **data}
+        if self.on_event is not None:
+            self.on_event(event, **data)
+
+    @contextmanager
+    def span(self, stage:str, **attributes):
+        """ Times a stage of the training cycle, the scheduler records it as a metric and a trace span """
+        start = time.time()
+        try:
+            # Stages may add attributes, such as byte counts, while they run
+            yield attributes
+        finally:
+            self.emit('span', stage=stage, start=start, seconds=time.time() - start, attributes=attributes)
+
+    def export_state(self)->dict:
+        """ Results of a run that are sent back from a worker process """
+        return {
+            'return_dict': self.return_dict,
+            'data_count_map': self.data_count_map,
+            'download_report': self.download_report,
+            'warm_start_path': self.warm_start_path,
+            'tuning': self.tuning
+        }
+
+    def import_state(self, state:dict):
+        for key, value in state.items():
+            setattr(self, key, value)
+
     def create_yaml(self):
+        # Packed splits are read by PackedDetectionTrainer from their shard directories
+        folder = "shards" if self.service.dataset_format == 'packed' else "images"
         yaml_data = {
-            'train': "images/train",
-            'test': "images/test",
-            'val': "images/val",
-            'nc':len(self.project.parsed_label_config["label"]["labels"]),
+            'train': f"{folder}/train",
+            'test': f"{folder}/test",
+            'val': f"{folder}/val",
+            'nc':len(self.labels),
             'names':self.labels
         }
 
@@ -83,89 +181,19 @@ class Trainer:
             yaml.dump(yaml_data, file)
     
     def get_and_organize_data(self):
-        tasks = self.project_client.get_tasks()
-
-        def download_file(url, output_path):
-            headers = {"Authorization": f"Token {API_KEY}"}  # Add authentication header
-            response = requests.get(url, headers=headers, stream=True)
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    shutil.copyfileobj(response.raw, f)
-            else:
-                print(f"Failed to download {url}: {response.status_code}, {response.text}")
-        
-        def convert_to_yolo(annotation):
-            """ Convert Label Studio bbox annotation to YOLO format """
-            yolo_annotations = []
-            for obj in annotation:
-                obj = obj['value']
-                if "rectanglelabels" in obj:
-                    label = self.labels.index(obj["rectanglelabels"][0])
-                    x, y, w, h = obj["x"], obj["y"], obj["width"], obj["height"]
-                    x_center, y_center = (x + w / 2) / 100, (y + h / 2) / 100
-                    w, h = w / 100, h / 100
-                    yolo_annotations.append(f"{label} {x_center} {y_center} {w} {h}\n")
-            return yolo_annotations
-        
-        def save_img_label_pair(i, task, group_type):
-            img_url = task['data']['image']
-            annotations = task['annotations']
-            
-            if not annotations:
-                return
-            
-            annotations = annotations[0]['result']
-            
-            img_filename = f"{i}.jpg"
-            img_path = os.path.join(f"./gym/project_{self.project_id}/images/{group_type}", img_filename)
-            label_path = os.path.join(f"./gym/project_{self.project_id}/labels/{group_type}", f"{i}.txt")
-            
-            download_file(LABEL_STUDIO_URL+img_url, img_path)
-            with open(label_path, "w") as f:
-                yolo_data = convert_to_yolo(annotations)
-                f.writelines(yolo_data)
-            
-        def split_list(data, train_ratio=0.8, test_ratio=0.1, val_ratio=0.1, seed=None):
-            print("[INFO]: Splitting tasks into train/test/val sets.")
-            if not (0 <= train_ratio <= 1 and 0 <= test_ratio <= 1 and 0 <= val_ratio <= 1):
-                raise ValueError("Ratios must be between 0 and 1")
-            if abs((train_ratio + test_ratio + val_ratio) - 1.0) > 1e-6:
-                raise ValueError("Ratios must sum to 1")
-            
-            if seed is not None:
-                random.seed(seed)
-            
-            random.shuffle(data)
-            
-            train_end = int(len(data) * train_ratio)
-            test_end = train_end + int(len(data) * test_ratio)
-            
-            train_set = data[:train_end]
-            test_set = data[train_end:test_end]
-            val_set = data[test_end:]
-
-            self.data_count_map = {
-                "total":len(tasks),
-                "train":len(train_set),
-                "test":len(test_set),
-                "val":len(val_set)
-            }
-            
-            return train_set, test_set, val_set
-
-        train, test, val = split_list(tasks)
-        
-        for i, task in enumerate(tqdm(train)):
-            save_img_label_pair(i, task, 'train')
-        
-        for i, task in enumerate(tqdm(test)):
-            save_img_label_pair(i, task, 'test')
-              
-        for i, task in enumerate(tqdm(val)):
-            save_img_label_pair(i, task, 'val')
+        staged = stage_dataset(
+            self.project_id,
+            self.project_client,
+            self.labels,
+            self.service,
+            span=self.span,
+            should_stop=lambda: self.will_cancel,
+            threads=self.threads)
+        self.data_count_map = staged['counts']
+        self.download_report = staged['download']
 
     def __store_model(self, metrics_path)->str:
-        log_msg, locations = ModelTransporter(self.save_folder).full_save(
+        log_msg, locations = ModelTransporter(self.save_folder, self.service).full_save(
             self.model, 
             f"project_{self.project_id}.pt", 
             metrics_path,
@@ -181,6 +209,17 @@ class Trainer:
         self.return_dict["epochs"] = num_epochs
 
 
+    @staticmethod
+    def __as_floats(metrics:dict)->dict:
+        return {name: float(value) for name, value in metrics.items()}
+
+    @staticmethod
+    def __memory_used()->dict:
+        if torch.cuda.is_available():
+            return {'gpu': torch.cuda.memory_reserved()}
+        # Peak resident memory of the training process, ru_maxrss is in kilobytes on Linux
+        return {'ram_peak': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
     async def begin_training(self):
         cwd = os.getcwd()
         print("Current working directory:", cwd)
@@ -190,55 +229,147 @@ class Trainer:
             print("Path does not exist...")
             return
         
+        tuning_cache = BatchTuningCache(self.service.batch_tuning_path)
         # Keep on training until no improvement is seen in ten epochs
         try:
             def check_for_cancellation(data):
                 if self.will_cancel:
                     raise asyncio.CancelledError("Training Cancelled")
-                
+                self.emit('epoch', epoch=data.epoch + 1, epochs=data.epochs)
+
+            # Live metrics for the dashboards, sent over the same channel as the progress events
+            live = {'batch': 0, 'images': 0, 'since': time.monotonic(), 'epoch_started': time.monotonic(), 'trained_images': 0, 'train_seconds': 0.0}
+
+            def start_epoch_metrics(data):
+                live.update(batch=0, images=0, since=time.monotonic(), epoch_started=time.monotonic())
+
+            def report_batch_metrics(data):
+                live['batch'] += 1
+                live['images'] += data.batch_size
+                live['trained_images'] += data.batch_size
+                elapsed = time.monotonic() - live['since']
+                # Batches finish far more often than a chart can show, one sample per second is enough
+                if elapsed < 1:
+                    return
+                losses = data.label_loss_items(data.tloss, prefix="train") if data.tloss is not None else {}
+                self.emit('batch_metrics',
+                          epoch=data.epoch + 1,
+                          batch=live['batch'],
+                          batches=len(data.train_loader),
+                          metrics=self.__as_floats(losses),
+                          images_per_second=live['images'] / elapsed,
+                          memory=self.__memory_used())
+                live.update(images=0, since=time.monotonic())
+
+            def measure_throughput(data):
+                # Training batches only, validation runs after on_train_epoch_end
+                live['train_seconds'] += time.monotonic() - live['epoch_started']
+
+            def report_epoch_metrics(data):
+                losses = data.label_loss_items(data.tloss, prefix="train") if data.tloss is not None else {}
+                self.emit('epoch_metrics',
+                          epoch=data.epoch + 1,
+                          epochs=data.epochs,
+                          metrics=self.__as_floats({**losses, **(data.metrics or {}), **(data.lr or {})}),
+                          epoch_time=time.monotonic() - live['epoch_started'],
+                          memory=self.__memory_used())
+
             start = datetime.now()
+            self.model.add_callback("on_train_epoch_start", start_epoch_metrics)
+            self.model.add_callback("on_train_batch_end", report_batch_metrics)
+            self.model.add_callback("on_train_epoch_end", measure_throughput)
             self.model.add_callback("on_train_epoch_end", check_for_cancellation)
-            results = self.model.train(
-                data = path,
-                epochs = 10,
-                patience = 5,
-                batch = -1,
-                device = "cuda" if torch.cuda.is_available() else "cpu",
-                project = cwd + f"/gym/project_{self.project_id}/runs"
-            )
+            self.model.add_callback("on_fit_epoch_end", report_epoch_metrics)
+            train_args = {}
+            if self.threads:
+                train_args["workers"] = self.threads
+            if self.service.dataset_format == 'packed':
+                train_args["trainer"] = PackedDetectionTrainer
+            if self.warm_start_path:
+                # Fine-tuning weights that already fit the dataset needs no warmup and fewer epochs
+                epochs = self.service.warm_start_epochs
+                train_args["warmup_epochs"] = 0
+            else:
+                epochs = self.service.cold_start_epochs
+            # AutoBatch profiles memory before every training, a batch size tuned on this hardware skips that
+            imgsz = self.service.image_size
+            tuned = tuning_cache.lookup(self.service.base_model, imgsz)
+            self.tuning.update(batch_size=tuned['batch_size'] if tuned else -1, image_size=imgsz, cached=tuned is not None)
+            with self.span('model_train', epochs=epochs, warm_start=self.warm_start_path is not None, batch=self.tuning['batch_size']) as attributes:
+                results = self.model.train(
+                    data = path,
+                    epochs = epochs,
+                    patience = min(5, epochs),
+                    batch = self.tuning['batch_size'],
+                    imgsz = imgsz,
+                    device = "cuda" if torch.cuda.is_available() else "cpu",
+                    project = cwd + f"/gym/project_{self.project_id}/runs",
+                    **train_args
+                )
+                self.tuning.update(
+                    batch_size=self.model.trainer.batch_size,
+                    images_per_second=live['trained_images'] / live['train_seconds'] if live['train_seconds'] else None)
+                attributes.update(self.tuning)
+            tuning_cache.store(self.service.base_model, imgsz, self.tuning['batch_size'], self.tuning['images_per_second'])
             duration =  datetime.now() - start
             self.return_dict["training_duration"] = str(duration)
             self.__record_num_epochs(results.save_dir / "results.csv")
             # Save the model to some location
-            storing_output = self.__store_model(results.save_dir)
+            with self.span('stage_artifact'):
+                storing_output = self.__store_model(results.save_dir)
+            # Keep the best weights for the next cycle, the runs directory is deleted when leaving the gym
+            best_path = results.save_dir / "weights" / "best.pt"
+            if best_path.exists():
+                self.checkpoints.record(self.project_id, str(best_path), self.labels, self.service.base_model, results.results_dict)
 
             # Log the training session
             Logger().log_training_success(results, self, storing_output)
         except Exception as e:
+            if self.tuning['cached'] and isinstance(e, torch.cuda.OutOfMemoryError):
+                # The tuned batch no longer fits, e.g. another training shares the GPU now; AutoBatch decides next time
+                tuning_cache.invalidate(self.service.base_model, self.tuning['image_size'])
             print("LOGGING ERROR")
             Logger().log_training_error(e, self)
         
-    def leave_gym(self):
+    def leave_gym(self, keep_dataset:bool=None):
+        """
+        Parameters:
+            keep_dataset: keep images and labels for the next cycle and only delete the runs, defaults to KEEP_GYM.
+        """
         base_path = f"./gym/project_{self.project_id}"
-        if os.path.exists(base_path):
+        keep_dataset = self.service.keep_gym if keep_dataset is None else keep_dataset
+        if keep_dataset:
+            runs_path = os.path.join(base_path, "runs")
+            if os.path.exists(runs_path):
+                shutil.rmtree(runs_path)
+                print(f"\nDeleted training runs at {runs_path}")
+        elif os.path.exists(base_path):
             shutil.rmtree(base_path)  # Delete the entire project directory
             print(f"\nDeleted project directories at {base_path}")
 
     async def train(self, callback = None):
         self.is_active = True
         try:
+            print("[INFO]: Preparing the gym and loading the model")
+            with self.span('prepare'):
+                self.prepare()
+
             print("[INFO]: Creating yaml file for training")
-            self.create_yaml()
+            with self.span('create_yaml'):
+                self.create_yaml()
 
             print("[INFO]: Downloading and organizing data from LabelStudio...")
+            self.emit('syncing')
             self.get_and_organize_data()
 
             #TODO: When a training session finishes remove the project id from the training set
             print("[INFO]: Training model on tiny...")
+            self.emit('training', data_count_map=self.data_count_map)
             await self.begin_training()
 
             print("[INFO]: Cleaning up project directory from the gym...")
-            self.leave_gym()
+            with self.span('leave_gym'):
+                self.leave_gym()
         except Exception as e:
             print(f"[ERROR]: {e}")
             print(traceback.print_exc())
@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SEGMENT_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.jsonl$")
+
+class TrainingLog:
+    def __init__(self, root:str="./logs", max_bytes:int=10 * 1024**2):
+        """
+        Parameters:
+            root: directory holding the log segments.
+            max_bytes: size after which a day's segment rolls over to a new part.
+
+        Append-only log of training sessions stored as JSON lines. Segments rotate daily and by size as
+        YYYY-MM-DD.jsonl, YYYY-MM-DD.1.jsonl, ... Next to every segment a .idx file records the offset, length,
+        time, project and outcome of each entry, so reads page and filter without parsing the whole segment.
+        Appends are serialized with a file lock since training workers write from their own processes.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.__lock = threading.Lock()
+
+    def segments(self)->List[str]:
+        """ Segment names, newest first """
+        found = []
+        for name in os.listdir(self.root):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                found.append((match.group(1), int(match.group(2) or 0), name))
+        return [name for _, _, name in sorted(found, reverse=True)]
+
+    def __segment_path(self, day:str, part:int)->str:
+        return os.path.join(self.root, f"{day}.jsonl" if part == 0 else f"{day}.{part}.jsonl")
+
+    def __current_segment(self, day:str)->str:
+        part = 0
+        while os.path.exists(self.__segment_path(day, part + 1)):
+            part += 1
+        path = self.__segment_path(day, part)
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            path = self.__segment_path(day, part + 1)
+        return path
+
+    def append(self, entry:dict)->str:
+        """ Writes an entry, it needs a 'time' in ISO format. Returns the entry's id """
+        line = (json.dumps(entry, default=str) + "\n").encode()
+        lock_path = os.path.join(self.root, ".lock")
+        with self.__lock, open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                path = self.__current_segment(entry['time'][:10])
+                with open(path, "ab") as f:
+                    offset = f.tell()
+                    f.write(line)
+                with open(path[:-len(".jsonl")] + ".idx", "a") as index:
+                    index.write(f"{offset}\t{len(line)}\t{entry['time']}\t{entry.get('project_id', '')}\t{entry.get('outcome', '')}\n")
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return f"{os.path.basename(path)}:{offset}"
+
+    def __index(self, segment:str)->List[tuple]:
+        path = os.path.join(self.root, segment[:-len(".jsonl")] + ".idx")
+        if not os.path.exists(path):
+            return []
+        rows = []
+        with open(path) as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 5:
+                    rows.append((segment, int(fields[0]), int(fields[1]), fields[2], fields[3], fields[4]))
+        return rows
+
+    def read(self, segment:str=None, project_id:int=None, outcome:str=None, since:datetime=None, until:datetime=None,
+             offset:int=0, limit:int=50)->Tuple[List[dict], int]:
+        """
+        Parameters:
+            segment: only read this segment, all segments when None.
+            project_id, outcome: only entries of this project / with this outcome ('success', 'error', 'cancelled').
+            since, until: only entries logged in this time range.
+            offset, limit: page of the matching entries, newest first.
+
+        Returns the page of entries, each with its 'id', and the number of matching entries.
+        """
+        since = since.isoformat(timespec="seconds") if since else None
+        until = until.isoformat(timespec="seconds") if until else None
+        segments = [segment] if segment else self.segments()
+
+        matches = []
+        for name in segments:
+            if SEGMENT_PATTERN.match(name) is None:
+                raise ValueError(f"Not a log segment: {name}")
+            # Segments are named by day, whole days outside the range are skipped without reading their index
+            day = name[:10]
+            if (since and day < since[:10]) or (until and day > until[:10]):
+                continue
+            for row in reversed(self.__index(name)):
+                if project_id is not None and row[4] != str(project_id):
+                    continue
+                if outcome is not None and row[5] != outcome:
+                    continue
+                if (since and row[3] < since) or (until and row[3] > until):
+                    continue
+                matches.append(row)
+
+        page = []
+        handles = {}
+        try:
+            for name, position, length, _, _, _ in matches[offset:offset + limit]:
+                if name not in handles:
+                    handles[name] = open(os.path.join(self.root, name), "rb")
+                handles[name].seek(position)
+                entry = json.loads(handles[name].read(length))
+                entry['id'] = f"{name}:{position}"
+                page.append(entry)
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return page, len(matches)
+
+    def get(self, entry_id:str)->Optional[dict]:
+        segment, position = entry_id.rsplit(":", 1)
+        if SEGMENT_PATTERN.match(segment) is None:
+            raise ValueError(f"Not a log segment: {segment}")
+        for row in self.__index(segment):
+            if row[1] == int(position):
+                with open(os.path.join(self.root, segment), "rb") as f:
+                    f.seek(row[1])
+                    entry = json.loads(f.read(row[2]))
+                entry['id'] = entry_id
+                return entry
+        return None
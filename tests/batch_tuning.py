@@ -0,0 +1,35 @@
+import json
+
+from src.batchTuning import BatchTuningCache
+
+def test_batch_tuning_cache_reuses_and_invalidates(tmp_path):
+    path = str(tmp_path / "batch_tuning.json")
+    cache = BatchTuningCache(path)
+    assert cache.lookup("./models/yolo11n.pt", 640) is None
+
+    cache.store("./models/yolo11n.pt", 640, 24, images_per_second=120.5)
+
+    # Entries are per model variant and image size, and survive a restart
+    tuned = BatchTuningCache(path).lookup("yolo11n.pt", 640)
+    assert tuned['batch_size'] == 24
+    assert tuned['images_per_second'] == 120.5
+    assert cache.lookup("./models/yolo11n.pt", 320) is None
+    assert cache.lookup("./models/yolo11s.pt", 640) is None
+
+    # Tunings measured on other hardware are dropped
+    moved = BatchTuningCache(path)
+    moved.fingerprint = {**moved.fingerprint, 'device': "other"}
+    assert moved.lookup("./models/yolo11n.pt", 640) is None
+    moved.store("./models/yolo11n.pt", 320, 8)
+    with open(path) as f:
+        assert len(json.load(f)['entries']) == 1
+
+    # An out of memory batch is forgotten
+    cache.store("./models/yolo11n.pt", 640, 24)
+    cache.invalidate("./models/yolo11n.pt", 640)
+    assert cache.lookup("./models/yolo11n.pt", 640) is None
+
+    # An unreadable file means profiling again, not a failed training
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert cache.lookup("./models/yolo11n.pt", 640) is None
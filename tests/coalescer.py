@@ -0,0 +1,77 @@
+import time
+import threading
+
+from src.jobs import JobRunner
+from src.coalescer import WebhookCoalescer
+
+class Recorder:
+    """ on_settled of a test, keeps every call with the time it was made """
+
+    def __init__(self):
+        self.calls = []
+        self.settled = threading.Event()
+
+    async def __call__(self, project_id, merged):
+        self.calls.append((project_id, merged, time.monotonic()))
+        self.settled.set()
+
+def wait_for(condition, timeout:float=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "The coalescer did not settle in time"
+        time.sleep(0.02)
+
+def is_pending(coalescer:WebhookCoalescer, project_id:int)->bool:
+    # Pending projects belong to the loop, they are read there like the Scheduler does
+    return coalescer.runner.call(coalescer.is_pending, project_id).result()
+
+def test_burst_settles_once_with_merged_events():
+    runner = JobRunner("test-coalescer")
+    recorder = Recorder()
+    coalescer = WebhookCoalescer(recorder, window_seconds=0.2, runner=runner)
+    try:
+        for action in ['ANNOTATION_CREATED', 'ANNOTATION_CREATED', 'ANNOTATIONS_DELETED', 'ANNOTATION_CREATED']:
+            coalescer.submit(1, {'action': action, 'num_annotations': 10})
+            time.sleep(0.05)
+        coalescer.submit(2, {'action': 'PROJECT_UPDATED', 'num_annotations': 3})
+        assert is_pending(coalescer, 1) and is_pending(coalescer, 2)
+
+        # Both projects settle after their quiet period, each exactly once
+        wait_for(lambda: len(recorder.calls) >= 2)
+        time.sleep(0.4)
+        assert len(recorder.calls) == 2
+        merged = {project_id: events for project_id, events, _ in recorder.calls}
+        assert sorted(project_id for project_id, _, _ in recorder.calls) == [1, 2]
+        assert merged[1]['events'] == 4
+        assert merged[1]['actions'] == {'ANNOTATION_CREATED', 'ANNOTATIONS_DELETED'}
+        assert merged[1]['last_event'] == {'action': 'ANNOTATION_CREATED', 'num_annotations': 10}
+        assert (merged[2]['events'], merged[2]['actions']) == (1, {'PROJECT_UPDATED'})
+        assert not is_pending(coalescer, 1) and not is_pending(coalescer, 2)
+    finally:
+        runner.stop()
+
+def test_max_wait_settles_continuous_stream():
+    runner = JobRunner("test-coalescer")
+    recorder = Recorder()
+    coalescer = WebhookCoalescer(recorder, window_seconds=0.3, max_wait_seconds=0.5, runner=runner)
+    try:
+        # Events keep arriving faster than the window, only max_wait_seconds ends the burst
+        started = time.monotonic()
+        coalescer.submit(1, {'action': 'ANNOTATION_CREATED'})
+        assert is_pending(coalescer, 1)
+        while not recorder.settled.wait(timeout=0.05) and time.monotonic() - started < 3:
+            coalescer.submit(1, {'action': 'ANNOTATION_CREATED'})
+
+        assert recorder.settled.is_set()
+        _, merged, settled_at = recorder.calls[0]
+        assert 0.5 <= settled_at - started < 1.0
+        assert merged['events'] > 1
+
+        # A project that was quiet in the meantime is not held back by the stream's max wait
+        coalescer.submit(2, {'action': 'ANNOTATIONS_DELETED'})
+        assert is_pending(coalescer, 2)
+        wait_for(lambda: any(project_id == 2 for project_id, _, _ in recorder.calls))
+        assert [merged['actions'] for project_id, merged, _ in recorder.calls if project_id == 2] == [{'ANNOTATIONS_DELETED'}]
+        assert not is_pending(coalescer, 2)
+    finally:
+        runner.stop()
@@ -12,15 +12,21 @@ def test_create_training_directories():
         f"{base_path}/labels/test",
         f"{base_path}/labels/val",
     ]
+    existed = os.path.exists(base_path)
     
     # Create trainer and set up gym
     current_dir = os.getcwd()
     
+    # Constructing a Trainer is free of side effects, the gym is only made once training begins
+    trainer = Trainer(pytest.PROJECT_ID,pytest.ls,pytest.ls_client)
+    assert os.path.exists(base_path) == existed, "Constructing a Trainer created the gym"
+    assert trainer.model is None
+
     # Method being tested
-    Trainer(pytest.PROJECT_ID,pytest.ls,pytest.ls_client)
+    trainer.prepare()
     
     try:
         for path in paths:
             assert os.path.isdir(path), f"Directory {path} was not created"
     finally:
-        os.chdir(current_dir)
\ No newline at end of file
+        os.chdir(current_dir)
@@ -6,6 +6,8 @@ from src.trainer import Trainer
 
 def test_create_yaml():
     trainer = Trainer(pytest.PROJECT_ID,pytest.ls,pytest.ls_client)
+    # The gym is created when training begins, not with the Trainer
+    trainer.prepare()
     trainer.create_yaml()
     yaml_path = f"./gym/project_{pytest.PROJECT_ID}/data.yaml"
     assert os.path.exists(f"./gym/project_{pytest.PROJECT_ID}/data.yaml")
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from src.events import EventBus
+
+def test_slow_client_is_dropped_and_catches_up():
+    bus = EventBus(history=16, subscriber_buffer=2)
+    stream = bus.stream()
+    assert next(stream) == "retry: 3000\n\n"
+
+    bus.publish('queued', {'project_id': 1})
+    first = next(stream)
+    assert first.startswith("id: 1\nevent: queued\n")
+
+    # The client stops reading and its buffer overflows
+    for i in range(3):
+        bus.publish('epoch', {'project_id': 1, 'epoch': i + 1})
+
+    # Its stream ends after what is left of its buffer instead of sending keep-alives forever
+    received = [int(message.split("\n")[0][len("id: "):]) for message in stream]
+    assert len(received) < 3
+
+    # Reconnecting with the Last-Event-ID replays everything that was missed
+    last_event_id = received[-1] if received else 1
+    reconnected = bus.stream(last_event_id=last_event_id)
+    assert next(reconnected) == "retry: 3000\n\n"
+    replayed = [next(reconnected).split("\n")[0] for _ in range(4 - last_event_id)]
+    assert replayed == [f"id: {id}" for id in range(last_event_id + 1, 5)]
+    reconnected.close()
+
+def test_async_stream_is_woken_from_other_threads():
+    bus = EventBus(history=16, subscriber_buffer=2)
+
+    async def read():
+        stream = bus.stream_async(project_id=1, heartbeat=5)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        # Published from a thread like the Scheduler's loop and training callbacks do
+        threading.Thread(target=lambda: [bus.publish('queued', {'project_id': id}) for id in (2, 1)]).start()
+        message = await asyncio.wait_for(stream.__anext__(), 5)
+        await stream.aclose()
+        return message
+
+    assert asyncio.run(read()).startswith("id: 2\nevent: queued\n")
+
+def test_slow_async_client_is_dropped():
+    bus = EventBus(history=16, subscriber_buffer=2)
+
+    async def read():
+        stream = bus.stream_async(heartbeat=5)
+        await stream.__anext__()
+        for i in range(5):
+            bus.publish('epoch', {'project_id': 1, 'epoch': i + 1})
+        return [message async for message in stream]
+
+    assert len(asyncio.run(asyncio.wait_for(read(), 5))) < 3
@@ -0,0 +1,30 @@
+import os
+import time
+
+from src.cache import ImageCache
+
+def test_image_cache_links_and_evicts(tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=16)
+    gym = tmp_path / "gym"
+    gym.mkdir()
+
+    # Store three 8 byte images, two of them with the same content
+    for url, content in (("/img/a.jpg", b"a" * 8), ("/img/b.jpg", b"b" * 8), ("/img/c.jpg", b"a" * 8)):
+        staging_path = cache.staging_path(url)
+        with open(staging_path, "wb") as f:
+            f.write(content)
+        cache.put(url, staging_path)
+        time.sleep(0.01)
+
+    # Identical content is only stored once
+    assert cache.lookup("/img/a.jpg") == cache.lookup("/img/c.jpg")
+    assert cache.size() == 16
+
+    cache.link(cache.lookup("/img/a.jpg"), str(gym / "1.jpg"))
+    assert (gym / "1.jpg").read_bytes() == b"a" * 8
+
+    # Least recently used image is evicted first
+    assert cache.evict(max_bytes=8) == 8
+    assert cache.lookup("/img/b.jpg") is None
+    assert cache.lookup("/img/a.jpg") is not None
+    cache.close()
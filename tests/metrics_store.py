@@ -0,0 +1,69 @@
+import multiprocessing
+import threading
+
+from src.metricsStore import MetricsStore
+
+def write_results(path, epochs, columns):
+    # YOLO pads its column names with spaces
+    header = ["epoch"] + list(columns)
+    with open(path, "w") as f:
+        f.write(",".join(f"{name:>20}" for name in header) + "\n")
+        for epoch in range(1, epochs + 1):
+            f.write(",".join([str(epoch)] + [str(values(epoch)) for values in columns.values()]) + "\n")
+    return str(path)
+
+def fresh_store(root)->MetricsStore:
+    MetricsStore._instance = None
+    return MetricsStore(str(root))
+
+def test_metrics_store_appends_and_queries(tmp_path):
+    store = fresh_store(tmp_path / "memory")
+    first = write_results(tmp_path / "first.csv", 10, {'metrics/mAP50(B)': lambda epoch: epoch / 10})
+    second = write_results(tmp_path / "second.csv", 3, {'metrics/mAP50(B)': lambda epoch: 0.5, 'lr/pg0': lambda epoch: 0.01})
+
+    assert store.append_run(1, first) == 1
+    assert store.append_run(1, second) == 2
+    assert [(run['run'], run['start'], run['end']) for run in store.runs(1)] == [(1, 0, 10), (2, 10, 13)]
+
+    # The latest run by default, metrics added later are empty for earlier runs
+    assert store.query(1) == [{'epoch': epoch, 'metrics/mAP50(B)': 0.5, 'lr/pg0': 0.01} for epoch in (1, 2, 3)]
+    assert store.query(1, run=1, end=1) == [{'epoch': 1, 'metrics/mAP50(B)': 0.1, 'lr/pg0': None}]
+    assert [record['run'] for record in store.query(1, run="all", columns=['lr/pg0'], start=3)] == [1] * 8 + [2]
+
+    # Downsampling keeps the first and last epoch
+    sampled = store.query(1, run=1, columns=[], max_points=4)
+    assert [record['epoch'] for record in sampled] == [1, 4, 7, 10]
+    assert store.query(2) == []
+
+def test_metrics_store_imports_legacy_results_once(tmp_path):
+    store = fresh_store(tmp_path / "memory")
+    (tmp_path / "memory" / "project-3").mkdir(parents=True)
+    write_results(tmp_path / "memory" / "project-3" / "results.csv", 4, {'metrics/mAP50(B)': lambda epoch: 0.2})
+
+    # Dashboard requests are served from a thread pool, the first reads arrive together
+    barrier = threading.Barrier(4)
+    def read():
+        barrier.wait()
+        store.runs(3)
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [(run['run'], run['start'], run['end']) for run in store.runs(3)] == [(1, 0, 4)]
+
+def test_metrics_store_serializes_appends_of_processes(tmp_path):
+    store = fresh_store(tmp_path / "memory")
+    results = write_results(tmp_path / "results.csv", 5, {'metrics/mAP50(B)': lambda epoch: 0.3})
+
+    # Training workers append from their own processes
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=store.append_run, args=(4, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [(run['run'], run['start']) for run in store.runs(4)] == [(run, (run - 1) * 5) for run in range(1, 5)]
+    assert len(store.query(4, run="all")) == 20
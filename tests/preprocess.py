@@ -0,0 +1,54 @@
+import os
+
+from PIL import Image
+
+from src.preprocess import ImagePreprocessor
+
+def write_image(path, size, format="JPEG", orientation=None):
+    image = Image.new("RGB", size, (200, 40, 40))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    image.save(path, format=format, exif=exif)
+    return str(path)
+
+def test_preprocessor_resizes_keeps_and_flags(tmp_path):
+    # Sources are named like image cache blobs, without an extension
+    sources = tmp_path / "blobs"
+    sources.mkdir()
+    large = write_image(sources / "large", (640, 640))
+    small = write_image(sources / "small", (200, 100))
+    png = write_image(sources / "png", (100, 100), format="PNG")
+    rotated = write_image(sources / "rotated", (200, 100), orientation=6)
+    corrupt = str(sources / "corrupt")
+    with open(large, "rb") as f, open(corrupt, "wb") as out:
+        out.write(f.read()[:300])
+
+    preprocessor = ImagePreprocessor(str(tmp_path / "resized"), imgsz=320, workers=2)
+    images, report = preprocessor.prepare([large, small, png, rotated, corrupt])
+    assert {key: report[key] for key in ('resized', 'kept', 'reused', 'corrupt')} == {'resized': 3, 'kept': 1, 'reused': 0, 'corrupt': 1}
+
+    # Drafted JPEGs are still re-encoded at imgsz instead of passing the full size source through
+    with Image.open(images[large]) as image:
+        assert image.size == (320, 320)
+    # Small upright JPEGs are trained on as they are
+    assert images[small] == small
+    # Other formats are re-encoded as JPEG
+    with Image.open(images[png]) as image:
+        assert image.format == "JPEG" and image.size == (100, 100)
+    # EXIF rotation is applied to the pixels
+    with Image.open(images[rotated]) as image:
+        assert image.size == (100, 200)
+    assert images[corrupt] is None
+    assert corrupt in report['errors']
+
+    # A later run reuses every result and remembers the corrupt image without decoding it again
+    images_again, report = preprocessor.prepare([large, small, png, rotated, corrupt])
+    assert images_again == images
+    assert {key: report[key] for key in ('resized', 'kept', 'reused', 'corrupt')} == {'resized': 0, 'kept': 0, 'reused': 4, 'corrupt': 1}
+    assert corrupt in report['errors']
+
+    # Results of sources that left the cache are removed
+    assert preprocessor.prune(lambda name: name != "large") == 1
+    assert not os.path.exists(images[large])
+    assert os.path.exists(images[png])
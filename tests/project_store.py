@@ -0,0 +1,65 @@
+import os
+import csv
+
+from src.projectStore import ProjectStore, COLUMNS
+
+def project(**fields)->dict:
+    return {**{column: '' for column in COLUMNS}, 'finished_tasks': 0, 'total_tasks': 0, 'tracked': False, **fields}
+
+def test_project_store_imports_legacy_csv_once(tmp_path):
+    legacy = tmp_path / "project_tasks.csv"
+    with open(legacy, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["id"] + COLUMNS)
+        writer.writeheader()
+        writer.writerow({**project(finished_tasks=12, total_tasks=40, tracked=True, title="Cars", epochs="30"), 'id': 3})
+        writer.writerow({**project(finished_tasks=5, total_tasks=5, title="Birds"), 'id': 4})
+
+    store = ProjectStore(str(tmp_path / "memory" / "state.db"))
+    assert store.import_csv(str(legacy)) == 2
+    assert not os.path.exists(legacy)
+    assert os.path.exists(str(legacy) + ".migrated")
+
+    projects = store.load()
+    assert projects[3]['tracked'] is True and projects[4]['tracked'] is False
+    assert (projects[3]['title'], projects[3]['epochs'], projects[3]['total_tasks']) == ("Cars", "30", 40)
+    # The legacy annotation count becomes the training baseline
+    assert projects[3]['trained_tasks'] == 12
+    assert store.tracked_ids() == [3]
+
+    # The renamed file is not imported again
+    assert store.import_csv(str(legacy)) == 0
+
+def test_project_store_upsert_keeps_fields_not_given(tmp_path):
+    store = ProjectStore(str(tmp_path / "state.db"))
+    store.save(1, project(finished_tasks=10, tracked=True, title="Cars"), trained_tasks=10, state=3)
+
+    # Refreshes update counts without knowing the baseline or the state
+    store.save(1, project(finished_tasks=25, tracked=True, title="Cars v2"))
+    stored = store.load()[1]
+    assert (stored['finished_tasks'], stored['title']) == (25, "Cars v2")
+    assert (stored['trained_tasks'], stored['state']) == (10, 3)
+
+    store.save_many({1: project(finished_tasks=30, tracked=True), 2: project(finished_tasks=7)}, trained_tasks={2: 7}, states={2: 0})
+    projects = store.load()
+    assert (projects[1]['trained_tasks'], projects[1]['state']) == (10, 3)
+    assert (projects[2]['trained_tasks'], projects[2]['state']) == (7, 0)
+
+    store.save(1, project(finished_tasks=30, tracked=True), trained_tasks=30, state=1)
+    assert (store.load()[1]['trained_tasks'], store.load()[1]['state']) == (30, 1)
+
+def test_project_store_ids_in_state(tmp_path):
+    store = ProjectStore(str(tmp_path / "state.db"))
+    for project_id, state in {1: 0, 2: 1, 3: 2, 4: 3, 5: 2}.items():
+        store.save(project_id, project(tracked=state > 0), state=state)
+
+    assert sorted(store.ids_in_state(2, 3)) == [3, 4, 5]
+    assert store.ids_in_state(1) == [2]
+    store.set_state(4, 1)
+    assert sorted(store.ids_in_state(1)) == [2, 4]
+
+    # A store opened again, like after a restart, sees the same states
+    store.close()
+    reopened = ProjectStore(str(tmp_path / "state.db"))
+    assert sorted(reopened.ids_in_state(2, 3)) == [3, 5]
+    reopened.delete([3])
+    assert reopened.ids_in_state(2, 3) == [5]
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+
+from src.service import Service
+from src.replication import Replicator, LocalTarget
+
+def make_replicator(tmp_path, monkeypatch, max_attempts:int=3)->Replicator:
+    service = Service()
+    monkeypatch.setattr(service, 'replication_staging_dir', str(tmp_path / "staging"))
+    monkeypatch.setattr(service, 'replication_targets', "local")
+    monkeypatch.setattr(service, 'replication_max_attempts', max_attempts)
+    # Every test starts from a fresh outbox, like a new service process
+    Replicator._instance = None
+    replicator = Replicator(service)
+    replicator.targets['local'] = LocalTarget(service, str(tmp_path / "saves"))
+    return replicator
+
+def training_run(tmp_path):
+    run = tmp_path / "run"
+    (run / "weights").mkdir(parents=True)
+    (run / "weights" / "best.pt").write_bytes(b"weights" * 1000)
+    (run / "results.csv").write_text("epoch,metrics/mAP50(B)\n1,0.5\n")
+    (run / "results.png").write_bytes(b"png")
+    return run
+
+def outbox(replicator:Replicator)->dict:
+    """ Local copy of the only artifact of a test """
+    return replicator.status()[0]['targets']['local']
+
+def wait_for(condition, timeout:float=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Replication did not get there in time"
+        time.sleep(0.05)
+
+def set_outbox(replicator:Replicator, artifact_id:str, **columns):
+    with sqlite3.connect(os.path.join(replicator.staging_dir, "outbox.db")) as db:
+        db.execute(f"UPDATE outbox SET {', '.join(f'{name} = ?' for name in columns)} WHERE artifact_id = ?", (*columns.values(), artifact_id))
+
+def test_stage_records_manifest(tmp_path, monkeypatch):
+    replicator = make_replicator(tmp_path, monkeypatch)
+    run = training_run(tmp_path)
+    artifact_id = replicator.stage(7, "project_7", None, "best.pt", str(run), str(run / "weights" / "best.pt"))
+
+    with sqlite3.connect(os.path.join(replicator.staging_dir, "outbox.db")) as db:
+        project_id, manifest = db.execute("SELECT project_id, manifest FROM artifacts WHERE artifact_id = ?", (artifact_id,)).fetchone()
+    manifest = json.loads(manifest)
+    assert project_id == 7
+    assert manifest['save_folder'] == "project_7"
+    assert set(manifest['files']) == {"weights/best.pt", "metrics/results.csv", "metrics/results.png"}
+    for relative_path, info in manifest['files'].items():
+        staged = os.path.join(replicator.staging_dir, artifact_id, relative_path)
+        with open(staged, "rb") as f:
+            content = f.read()
+        assert info == {'size': len(content), 'sha256': hashlib.sha256(content).hexdigest()}
+    assert outbox(replicator)['status'] == 'pending'
+
+def test_checksum_mismatch_backs_off_fails_and_retries(tmp_path, monkeypatch):
+    replicator = make_replicator(tmp_path, monkeypatch, max_attempts=2)
+    # Plain copies are read back, linked ones share the staged bytes and are not
+    def copy(source, destination):
+        shutil.copyfile(source, destination)
+        return 'copy'
+    monkeypatch.setattr(replicator.publisher, 'copy', copy)
+    run = training_run(tmp_path)
+    artifact_id = replicator.stage(7, "project_7", None, "best.pt", str(run), str(run / "weights" / "best.pt"))
+
+    # The staged weights no longer match their manifest
+    staged_weights = os.path.join(replicator.staging_dir, artifact_id, "weights", "best.pt")
+    with open(staged_weights, "rb") as f:
+        original = f.read()
+    with open(staged_weights, "wb") as f:
+        f.write(b"damaged")
+
+    replicator.start()
+    wait_for(lambda: outbox(replicator)['attempts'] == 1)
+    first = outbox(replicator)
+    assert first['status'] == 'pending'
+    assert "Checksum mismatch" in first['last_error']
+    # Retried with backoff, not right away
+    assert first['next_attempt_at'] is not None and first['next_attempt_at'] > time.strftime("%Y-%m-%dT%H:%M:%S")
+    assert not os.path.exists(tmp_path / "saves" / "project_7" / "weights" / "best.pt")
+
+    # The last allowed attempt marks the copy failed
+    set_outbox(replicator, artifact_id, next_attempt_at=time.time())
+    wait_for(lambda: outbox(replicator)['status'] == 'failed')
+    assert outbox(replicator)['attempts'] == 2
+
+    # A retry after the cause is fixed replicates the artifact and releases the staged copy
+    with open(staged_weights, "wb") as f:
+        f.write(original)
+    replicator.retry(artifact_id)
+    wait_for(lambda: outbox(replicator)['status'] == 'done')
+    assert (tmp_path / "saves" / "project_7" / "weights" / "best.pt").read_bytes() == original
+    assert replicator.locations(7) == {'local': str(tmp_path / "saves" / "project_7")}
+    assert not os.path.exists(os.path.join(replicator.staging_dir, artifact_id))
+
+def test_start_resumes_interrupted_uploads(tmp_path, monkeypatch):
+    replicator = make_replicator(tmp_path, monkeypatch)
+    run = training_run(tmp_path)
+    artifact_id = replicator.stage(7, "project_7", None, "best.pt", str(run), str(run / "weights" / "best.pt"))
+    # The previous process died while uploading
+    set_outbox(replicator, artifact_id, status='uploading')
+
+    restarted = make_replicator(tmp_path, monkeypatch)
+    restarted.start()
+    wait_for(lambda: outbox(restarted)['status'] == 'done')
+    assert (tmp_path / "saves" / "project_7" / "metrics" / "results.csv").exists()
@@ -0,0 +1,54 @@
+import os
+import pickle
+
+from PIL import Image
+
+from src.shards import ShardPacker, ShardReader
+
+def make_image(path, color, size=(32, 24)):
+    Image.new("RGB", size, color).save(path, format="JPEG")
+    return str(path)
+
+def test_shards_round_trip_reuse_and_cleanup(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    samples = [(task_id, f"img-{task_id}", make_image(images / f"{task_id}.jpg", (task_id, 0, 0)), f"0 0.5 0.5 0.1 0.{task_id}\n")
+               for task_id in range(1, 7)]
+    with open(images / "broken.jpg", "wb") as f:
+        f.write(b"not an image")
+    packer = ShardPacker(str(tmp_path / "shards"), shard_tasks=4)
+
+    # Tasks 1-3 and 4-7 land in two shards, the unreadable image is left out
+    report = packer.pack("train", samples + [(7, "img-7", str(images / "broken.jpg"), "0 0.5 0.5 0.1 0.1\n")])
+    assert report == {'written': 2, 'reused': 0, 'samples': 6}
+
+    reader = ShardReader(str(tmp_path / "shards" / "train"))
+    assert len(reader.files()) == 6
+    for path in reader.files():
+        sample = reader.samples[path]
+        task_id = int(sample['name'].split(".")[0])
+        assert bytes(reader.read(path)) == open(images / f"{task_id}.jpg", "rb").read()
+        assert sample['label'] == f"0 0.5 0.5 0.1 0.{task_id}\n"
+        assert sample['shape'] == [24, 32]
+
+    # Readers are pickled into dataloader workers and map their shards again there
+    copy = pickle.loads(pickle.dumps(reader))
+    assert bytes(copy.read(copy.files()[0])) == bytes(reader.read(copy.files()[0]))
+
+    split_dir = tmp_path / "shards" / "train"
+    before = set(os.listdir(split_dir))
+
+    # A changed label rewrites only its shard, the shard it replaced is removed
+    changed = samples[:4] + [(5, "img-5", samples[4][2], "1 0.5 0.5 0.2 0.2\n"), samples[5]]
+    report = packer.pack("train", changed)
+    assert report == {'written': 1, 'reused': 1, 'samples': 3}
+    after = set(os.listdir(split_dir))
+    assert len(before - after) == 2 and len(after - before) == 2
+    assert len([file for file in after if file.endswith(".tar")]) == 2
+
+    reader = ShardReader(str(split_dir))
+    labels = {reader.samples[path]['name']: reader.samples[path]['label'] for path in reader.files()}
+    assert labels["5.jpg"] == "1 0.5 0.5 0.2 0.2\n"
+
+    # Packing the same samples again writes nothing
+    assert packer.pack("train", changed) == {'written': 0, 'reused': 2, 'samples': 0}
@@ -0,0 +1,23 @@
+from collections import Counter
+
+from src.split import StableSplitter
+
+def make_task(task_id, class_name):
+    return {'id': task_id, 'result': [{'value': {'rectanglelabels': [class_name]}}]}
+
+def test_split_is_stable_and_stratified():
+    tasks = [make_task(i, 'rare' if i % 20 == 0 else 'common') for i in range(200)]
+    splitter = StableSplitter(0.8, 0.1, 0.1)
+
+    first = splitter.assign(tasks)
+    assert Counter(first.values()) == {'train': 160, 'test': 20, 'val': 20}
+    assert splitter.assign(list(reversed(tasks))) == first
+
+    # Every split gets a share of the rare class
+    rare_splits = Counter(first[task['id']] for task in tasks if task['id'] % 20 == 0)
+    assert set(rare_splits) == {'train', 'test', 'val'}
+
+    # New annotations never move the tasks that were already assigned
+    second = splitter.assign(tasks + [make_task(i, 'common') for i in range(200, 232)], first)
+    assert all(second[task_id] == split for task_id, split in first.items())
+    assert len(second) == 232
@@ -0,0 +1,8 @@
+from src.telemetry import Telemetry
+
+def test_label_values_are_escaped():
+    telemetry = Telemetry()
+    # The action of a webhook is whatever its sender put in the payload
+    telemetry.inc('ml_workflow_webhooks_total', action='A"B\\C\nml_workflow_trainings_total 1')
+    lines = [line for line in telemetry.render().splitlines() if line.startswith('ml_workflow_webhooks_total{')]
+    assert lines == ['ml_workflow_webhooks_total{action="A\\"B\\\\C\\nml_workflow_trainings_total 1"} 1']
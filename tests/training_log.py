@@ -0,0 +1,63 @@
+import pytest
+
+from datetime import datetime
+
+from src.trainingLog import TrainingLog
+
+def entry(time:str, project_id:int, outcome:str="success", **fields)->dict:
+    return {'time': time, 'project_id': project_id, 'outcome': outcome, **fields}
+
+def test_training_log_rotates_by_day_and_size(tmp_path):
+    # Each padded entry is about 200 bytes
+    log = TrainingLog(str(tmp_path / "logs"), max_bytes=300)
+    padding = "x" * 120
+
+    first = log.append(entry("2025-03-01T10:00:00", 1, note=padding))
+    second = log.append(entry("2025-03-01T11:00:00", 1, note=padding))
+    # The segment is past max_bytes, the next entry of the day starts a new part
+    third = log.append(entry("2025-03-01T12:00:00", 2))
+    fourth = log.append(entry("2025-03-02T09:00:00", 2))
+
+    assert first == "2025-03-01.jsonl:0"
+    assert second.startswith("2025-03-01.jsonl:") and second != first
+    assert third == "2025-03-01.1.jsonl:0"
+    assert fourth == "2025-03-02.jsonl:0"
+    assert log.segments() == ["2025-03-02.jsonl", "2025-03-01.1.jsonl", "2025-03-01.jsonl"]
+    # Every segment has its index
+    assert sorted(path.name for path in (tmp_path / "logs").glob("*.idx")) == ["2025-03-01.1.idx", "2025-03-01.idx", "2025-03-02.idx"]
+
+def test_training_log_reads_pages_and_filters(tmp_path):
+    log = TrainingLog(str(tmp_path / "logs"), max_bytes=150)
+    times = ["2025-03-01T10:00:00", "2025-03-01T11:00:00", "2025-03-01T12:00:00", "2025-03-02T09:00:00", "2025-03-03T08:00:00"]
+    outcomes = ["success", "error", "success", "cancelled", "success"]
+    for i, (time, outcome) in enumerate(zip(times, outcomes)):
+        log.append(entry(time, 1 if i % 2 == 0 else 2, outcome, number=i))
+
+    # Newest first across segments and parts
+    entries, total = log.read()
+    assert total == 5
+    assert [entry['number'] for entry in entries] == [4, 3, 2, 1, 0]
+    assert all(log.get(entry['id']) == entry for entry in entries)
+
+    entries, total = log.read(offset=1, limit=2)
+    assert total == 5
+    assert [entry['number'] for entry in entries] == [3, 2]
+
+    assert [entry['number'] for entry in log.read(project_id=1)[0]] == [4, 2, 0]
+    assert [entry['number'] for entry in log.read(outcome="success", project_id=1, limit=1)[0]] == [4]
+    assert log.read(outcome="success")[1] == 3
+    assert [entry['number'] for entry in log.read(since=datetime(2025, 3, 1, 11), until=datetime(2025, 3, 2, 9))[0]] == [3, 2, 1]
+    assert [entry['number'] for entry in log.read(segment="2025-03-02.jsonl")[0]] == [3]
+
+def test_training_log_get(tmp_path):
+    log = TrainingLog(str(tmp_path / "logs"))
+    log.append(entry("2025-03-01T10:00:00", 1))
+    entry_id = log.append(entry("2025-03-01T11:00:00", 2, "error", error={'type': "KeyError"}))
+
+    found = log.get(entry_id)
+    assert found == {**entry("2025-03-01T11:00:00", 2, "error", error={'type': "KeyError"}), 'id': entry_id}
+    # Offsets that do not start an entry are not read
+    assert log.get("2025-03-01.jsonl:1") is None
+    assert log.get("2025-03-05.jsonl:0") is None
+    with pytest.raises(ValueError):
+        log.get("../secrets.jsonl:0")